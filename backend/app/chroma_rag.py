@@ -12,6 +12,10 @@ from langchain_community.document_loaders import DirectoryLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma # Updated import
 from langchain_community.embeddings import SentenceTransformerEmbeddings
+from decouple import config
+
+from app.core.cache.ttlCache import TTLCache
+from app.core.sharedState import cache_version, bump_cache_version
 
 # Define the directory where the text documents are stored
 DOC_DIR = "./docs"
@@ -19,6 +23,25 @@ DOC_DIR = "./docs"
 CHROMA_DB_DIR = "./chroma_db"
 # Define the ChromaDB collection name
 COLLECTION_NAME = "local_docs"
+# Local SentenceTransformer model shared by RAG and the semantic caches
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Repeated questions reuse the last retrieval until the TTL passes; off unless set (e.g. 600)
+RAG_CACHE_TTL = config("RAG_CACHE_TTL", default=0, cast=int)
+
+_shared_embeddings = None
+_retrieval_cache = TTLCache("rag", max_entries=512, ttl_s=RAG_CACHE_TTL)
+
+
+def get_embeddings() -> SentenceTransformerEmbeddings:
+    """
+    Returns a process-wide embedding model so callers on the request path
+    don't reload MiniLM for every query.
+    """
+    global _shared_embeddings
+    if _shared_embeddings is None:
+        _shared_embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+    return _shared_embeddings
 
 
 def init_rag_system():
@@ -61,7 +84,7 @@ def init_rag_system():
 
     # 3. Create a ChromaDB collection with a local SentenceTransformer model
     # The model 'all-MiniLM-L6-v2' will be downloaded automatically the first time.
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    embeddings = get_embeddings()
 
     Chroma.from_documents(
         docs,
@@ -70,6 +93,8 @@ def init_rag_system():
         persist_directory=CHROMA_DB_DIR
     )
     print(f"Documents stored in ChromaDB at '{CHROMA_DB_DIR}'.")
+    # Retrievals cached by any worker point at the old index
+    bump_cache_version("rag")
     
 
 def query_rag_db(query: str, k: int = 4) -> Optional[List[str]]:
@@ -89,8 +114,13 @@ def query_rag_db(query: str, k: int = 4) -> Optional[List[str]]:
         print("ChromaDB not initialized. Please run `init_rag_system()` first.")
         return None
 
+    cache_key = (cache_version("rag"), query, k)
+    cached = _retrieval_cache.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
     # Use the same local embedding model as used for indexing
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    embeddings = get_embeddings()
     vectorstore = Chroma(
         collection_name=COLLECTION_NAME,
         embedding_function=embeddings,
@@ -105,6 +135,7 @@ def query_rag_db(query: str, k: int = 4) -> Optional[List[str]]:
     
     # Extract the content from the retrieved documents
     relevant_docs = [doc.page_content for doc in results]
+    _retrieval_cache.set(cache_key, tuple(relevant_docs))
     
     return relevant_docs
 
@@ -0,0 +1,263 @@
+import asyncio
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Generator, Iterator, List, Optional, Set
+
+from decouple import config
+
+from app.core.sharedState import SharedState, shared_state
+
+GEN_MAX_IN_FLIGHT = config("GEN_MAX_IN_FLIGHT", default=16, cast=int)
+GEN_MAX_PER_USER = config("GEN_MAX_PER_USER", default=2, cast=int)
+# Queued requests each hold a thread of their own (see acquire_async), not one of the
+# threadpool's workers that serve sync routes and stream responses
+GEN_MAX_QUEUE = config("GEN_MAX_QUEUE", default=32, cast=int)
+GEN_QUEUE_TIMEOUT = config("GEN_QUEUE_TIMEOUT", default=15.0, cast=float)
+# Shared leases are kept alive by their worker's heartbeat (every third of this);
+# a crashed worker's slots are freed this long after its last beat
+ADMISSION_LEASE_TTL = config("ADMISSION_LEASE_TTL", default=30.0, cast=float)
+# Releases in other workers don't wake our waiters, so queued requests re-check this often
+ADMISSION_POLL_S = 0.05
+
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MAX_RETRY_AFTER = 60
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lease:
+    """One admitted generation. release() is idempotent and also runs on garbage collection,
+    so a stream that is never iterated cannot leak its slot."""
+
+    def __init__(self, controller: "AdmissionController", user_id: int, token: str):
+        self._controller = controller
+        self.user_id = user_id
+        self.token = token
+        self.started_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+    def __del__(self):
+        self.release()
+
+
+class AdmissionController:
+    """
+    Caps concurrent generations globally and per user. Requests over the global cap
+    wait FIFO in a bounded queue up to `queue_timeout_s`; anything that can't be
+    admitted raises AdmissionRejected with a Retry-After estimate.
+
+    With a shared `state` the caps hold across worker processes: slots and per-user
+    reservations are members of shared lease sets, while each worker keeps its own
+    FIFO of waiters. A heartbeat thread refreshes this worker's leases, so only
+    those of a worker that stopped beating expire (after `lease_ttl_s`).
+
+    Async routes use acquire_async(): the wait runs on a small executor sized to the
+    queue, so a full queue can't starve the event loop's threadpool.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = GEN_MAX_IN_FLIGHT,
+        max_per_user: int = GEN_MAX_PER_USER,
+        max_queue: int = GEN_MAX_QUEUE,
+        queue_timeout_s: float = GEN_QUEUE_TIMEOUT,
+        state: Optional[SharedState] = None,
+        lease_ttl_s: float = ADMISSION_LEASE_TTL,
+    ):
+        self._state = state
+        self.lease_ttl_s = lease_ttl_s
+        # this worker's shared leases, for the heartbeat: token -> user id, and tokens holding a slot
+        self._user_leases: Dict[str, int] = {}
+        self._slot_leases: Set[str] = set()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._per_user: Dict[int, int] = {}
+        self._waiting: Deque[object] = deque()
+        # EWMA of how long an admitted generation holds its slot, for Retry-After
+        self._avg_hold_s = 5.0
+
+        self._admitted = 0
+        self._rejected: Dict[str, int] = {"per_user": 0, "queue_full": 0, "timeout": 0}
+        self._wait_count = 0
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+        self._wait_buckets = [0] * len(WAIT_BUCKETS)
+        # one thread per queued waiter plus one for the immediate path; threads start on demand
+        self._waiters_pool = ThreadPoolExecutor(max_workers=max_queue + 1, thread_name_prefix="admission")
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiting) + 1
+        estimate = self._avg_hold_s * backlog / max(1, self.max_in_flight)
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(estimate)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self._rejected[reason] += 1
+        return AdmissionRejected(reason, self._retry_after())
+
+    def _observe_wait(self, waited: float) -> None:
+        self._wait_count += 1
+        self._wait_sum += waited
+        self._wait_max = max(self._wait_max, waited)
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if waited <= bound:
+                self._wait_buckets[i] += 1
+
+    def _reserve_user(self, user_id: int, token: str) -> bool:
+        if self._state is not None:
+            if not self._state.lease_acquire(f"admission:user:{user_id}", token, self.lease_ttl_s, self.max_per_user):
+                return False
+            self._user_leases[token] = user_id
+        elif self._per_user.get(user_id, 0) >= self.max_per_user:
+            return False
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        return True
+
+    def _take_slot(self, token: str) -> bool:
+        if self._state is None:
+            return self._in_flight < self.max_in_flight
+        if not self._state.lease_acquire("admission:in_flight", token, self.lease_ttl_s, self.max_in_flight):
+            return False
+        self._slot_leases.add(token)
+        return True
+
+    def _start_heartbeat(self) -> None:
+        if self._state is not None and self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._beat, name="admission-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self) -> None:
+        while not self._stopped.wait(self.lease_ttl_s / 3):
+            with self._cond:
+                slots = list(self._slot_leases)
+                users: Dict[int, List[str]] = {}
+                for token, user_id in self._user_leases.items():
+                    users.setdefault(user_id, []).append(token)
+            try:
+                if slots:
+                    self._state.lease_refresh("admission:in_flight", slots, self.lease_ttl_s)
+                for user_id, tokens in users.items():
+                    self._state.lease_refresh(f"admission:user:{user_id}", tokens, self.lease_ttl_s)
+            except Exception as e:
+                print(f"admission heartbeat failed: {e}")
+
+    def stop(self) -> None:
+        """Stops the heartbeat; what this worker still holds then expires like a crashed worker's."""
+        self._stopped.set()
+
+    def acquire(self, user_id: int) -> Lease:
+        start = time.monotonic()
+        # unique across workers, so shared lease sets can tell holders apart
+        token = f"{os.getpid()}:{uuid.uuid4().hex}"
+        with self._cond:
+            self._start_heartbeat()
+            # the per-user reservation is also held while queued
+            if not self._reserve_user(user_id, token):
+                raise self._reject("per_user")
+
+            if self._waiting or not self._take_slot(token):
+                if len(self._waiting) >= self.max_queue:
+                    self._drop_user(user_id, token)
+                    raise self._reject("queue_full")
+                ticket = object()
+                self._waiting.append(ticket)
+                deadline = start + self.queue_timeout_s
+                try:
+                    while self._waiting[0] is not ticket or not self._take_slot(token):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject("timeout")
+                        self._cond.wait(remaining if self._state is None else min(remaining, ADMISSION_POLL_S))
+                except AdmissionRejected:
+                    self._waiting.remove(ticket)
+                    self._drop_user(user_id, token)
+                    self._cond.notify_all()
+                    raise
+                self._waiting.popleft()
+                self._cond.notify_all()
+
+            self._in_flight += 1
+            self._admitted += 1
+            self._observe_wait(time.monotonic() - start)
+        return Lease(self, user_id, token)
+
+    async def acquire_async(self, user_id: int) -> Lease:
+        """
+        acquire() without tying up the caller's threadpool. If the request is cancelled
+        while queued, the lease it may still get is dropped and released by Lease.__del__.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._waiters_pool, self.acquire, user_id)
+
+    def _drop_user(self, user_id: int, token: str) -> None:
+        if self._state is not None:
+            self._state.lease_release(f"admission:user:{user_id}", token)
+            self._user_leases.pop(token, None)
+        left = self._per_user.get(user_id, 0) - 1
+        if left > 0:
+            self._per_user[user_id] = left
+        else:
+            self._per_user.pop(user_id, None)
+
+    def _release(self, lease: Lease) -> None:
+        held = time.monotonic() - lease.started_at
+        with self._cond:
+            self._in_flight -= 1
+            if self._state is not None:
+                self._state.lease_release("admission:in_flight", lease.token)
+                self._slot_leases.discard(lease.token)
+            self._drop_user(lease.user_id, lease.token)
+            self._avg_hold_s = 0.8 * self._avg_hold_s + 0.2 * held
+            self._cond.notify_all()
+
+    def guard(self, lease: Lease, stream: Iterator[str]) -> Generator[str, None, None]:
+        """Wrap a response stream so the slot is freed when the stream ends or is closed."""
+        try:
+            yield from stream
+        finally:
+            lease.release()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            cluster = {}
+            if self._state is not None:
+                cluster = {"cluster_in_flight": self._state.lease_count("admission:in_flight")}
+            return {
+                **cluster,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiting),
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "admitted_total": self._admitted,
+                "rejected_total": dict(self._rejected),
+                "wait_seconds": {
+                    "count": self._wait_count,
+                    "sum": self._wait_sum,
+                    "max": self._wait_max,
+                    "buckets": dict(zip(WAIT_BUCKETS, self._wait_buckets)),
+                },
+            }
+
+
+admission = AdmissionController(state=shared_state if shared_state.shared else None)
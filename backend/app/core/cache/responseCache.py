@@ -0,0 +1,176 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Generator, List, Optional, Tuple
+
+from decouple import config
+
+from app.core.metrics import record_cache
+
+RESPONSE_CACHE_ENABLED = config("RESPONSE_CACHE_ENABLED", default=False, cast=bool)
+RESPONSE_CACHE_SIZE = config("RESPONSE_CACHE_SIZE", default=512, cast=int)
+RESPONSE_CACHE_TTL = config("RESPONSE_CACHE_TTL", default=86400, cast=int)
+# Empty path disables the persistent tier
+RESPONSE_CACHE_PATH = config("RESPONSE_CACHE_PATH", default="./response_cache.sqlite3")
+
+REPLAY_CHUNK_WORDS = 3
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_messages(messages: List[Dict]) -> List[Dict[str, str]]:
+    """Keep only role/content and collapse whitespace so trivially different prompts hash alike."""
+    normalized = []
+    for m in messages:
+        content = _WHITESPACE.sub(" ", (m.get("content") or "")).strip()
+        normalized.append({"role": m.get("role", ""), "content": content})
+    return normalized
+
+
+def make_cache_key(model: str, mode: int, messages: List[Dict], sampling: Dict) -> str:
+    """sha256 over (model, mode, normalized messages, sampling params)."""
+    material = json.dumps(
+        {
+            "model": model,
+            "mode": mode,
+            "messages": normalize_messages(messages),
+            "sampling": sampling,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(temperature: Optional[float], cacheable: bool) -> bool:
+    """Only deterministic (temperature 0) or explicitly opted-in requests may be served from cache."""
+    return cacheable or temperature == 0
+
+
+def replay_as_sse(text: str, chunk_words: int = REPLAY_CHUNK_WORDS) -> Generator[str, None, None]:
+    """Re-emit a stored answer in the same `data:` frames a live generation would produce."""
+    words = re.findall(r"\S+\s*", text)
+    for i in range(0, len(words), chunk_words):
+        yield f"data:{''.join(words[i:i + chunk_words])}\n\n"
+
+
+class _MemoryTier:
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class _SqliteTier:
+    """One autocommit connection per thread (as in SqliteState), kept open for the process."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time():
+            conn.execute("DELETE FROM response_cache WHERE key = ? AND expires_at = ?", (key, row[1]))
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at),
+        )
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM response_cache")
+
+
+class ResponseCache:
+    """
+    Exact-match cache of final robot answers.
+    Lookups go LRU memory tier -> persistent SQLite tier; persistent hits are promoted.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        ttl_s: int = RESPONSE_CACHE_TTL,
+        path: str = RESPONSE_CACHE_PATH,
+    ):
+        self.enabled = enabled
+        self._ttl_s = ttl_s
+        self._memory = _MemoryTier(max_entries=max_entries)
+        self._persistent = _SqliteTier(path) if (enabled and path) else None
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        value = self._memory.get(key)
+        if value is None and self._persistent is not None:
+            row = self._persistent.get(key)
+            if row is not None:
+                self._memory.set(key, row[0], row[1])
+                value = row[0]
+        record_cache("response", value is not None)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        if not self.enabled or not value:
+            return
+        expires_at = time.time() + self._ttl_s
+        self._memory.set(key, value, expires_at)
+        if self._persistent is not None:
+            self._persistent.set(key, value, expires_at)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._persistent is not None:
+            self._persistent.clear()
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,181 @@
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from decouple import config
+
+from app.core.metrics import record_cache
+
+SEMANTIC_CACHE_ENABLED = config("SEMANTIC_CACHE_ENABLED", default=False, cast=bool)
+# Cosine similarity a stored question must reach to be served
+SEMANTIC_CACHE_THRESHOLD = config("SEMANTIC_CACHE_THRESHOLD", default=0.92, cast=float)
+SEMANTIC_CACHE_MAX_ENTRIES = config("SEMANTIC_CACHE_MAX_ENTRIES", default=2000, cast=int)
+SEMANTIC_CACHE_TTL = config("SEMANTIC_CACHE_TTL", default=7 * 86400, cast=int)
+# Kept apart from ./chroma_db, which init_rag_system() wipes on every rebuild.
+# An embedded Chroma store: not supported with several worker processes
+SEMANTIC_CACHE_DIR = config("SEMANTIC_CACHE_DIR", default="./chroma_cache")
+SEMANTIC_CACHE_COLLECTION = "semantic_cache"
+
+# Run the eviction sweep once every N stores per namespace instead of on every write
+EVICT_EVERY = 50
+
+
+def _default_client():
+    import chromadb
+    return chromadb.PersistentClient(path=SEMANTIC_CACHE_DIR)
+
+
+def _default_embed(text: str) -> List[float]:
+    from app.chroma_rag import get_embeddings
+    return get_embeddings().embed_query(text)
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour answer cache over MiniLM embeddings of the user's question.
+    Entries are partitioned by namespace (model + mode) via collection metadata.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_s: int = SEMANTIC_CACHE_TTL,
+        collection_name: str = SEMANTIC_CACHE_COLLECTION,
+        client_factory: Callable = _default_client,
+        embed_fn: Callable[[str], List[float]] = _default_embed,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self._collection_name = collection_name
+        self._client_factory = client_factory
+        self._embed_fn = embed_fn
+        self._collection = None
+        self._lock = threading.Lock()
+        self._stores_since_evict: Dict[str, int] = {}
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    @staticmethod
+    def namespace(model: str, mode: int) -> str:
+        return f"{model}:mode{mode}"
+
+    def _get_collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    client = self._client_factory()
+                    self._collection = client.get_or_create_collection(
+                        name=self._collection_name,
+                        metadata={"hnsw:space": "cosine"},
+                        embedding_function=None,
+                    )
+        return self._collection
+
+    def _count(self, counter: Dict[str, int], namespace: str) -> None:
+        with self._lock:
+            counter[namespace] = counter.get(namespace, 0) + 1
+        record_cache("semantic", counter is self._hits)
+
+    def lookup(self, namespace: str, text: str) -> Optional[str]:
+        """Returns the stored answer of the closest question above the threshold, or None."""
+        if not self.enabled or not text.strip():
+            return None
+        try:
+            collection = self._get_collection()
+            result = collection.query(
+                query_embeddings=[self._embed_fn(text)],
+                n_results=1,
+                where={"namespace": namespace},
+                include=["metadatas", "distances"],
+            )
+        except Exception as e:
+            print(f"semantic cache lookup failed: {e}")
+            self._count(self._misses, namespace)
+            return None
+
+        ids = result["ids"][0] if result.get("ids") else []
+        if ids:
+            meta = result["metadatas"][0][0]
+            similarity = 1.0 - result["distances"][0][0]
+            fresh = meta.get("created_at", 0) + self._ttl_s >= time.time()
+            if similarity >= self.threshold and fresh:
+                meta["last_hit_at"] = time.time()
+                try:
+                    collection.update(ids=[ids[0]], metadatas=[meta])
+                except Exception:
+                    pass
+                self._count(self._hits, namespace)
+                return meta.get("answer")
+
+        self._count(self._misses, namespace)
+        return None
+
+    def store(self, namespace: str, text: str, answer: str) -> None:
+        if not self.enabled or not text.strip() or not answer:
+            return
+        now = time.time()
+        entry_id = hashlib.sha256(f"{namespace}\n{text.strip()}".encode("utf-8")).hexdigest()
+        try:
+            collection = self._get_collection()
+            collection.upsert(
+                ids=[entry_id],
+                embeddings=[self._embed_fn(text)],
+                documents=[text],
+                metadatas=[{
+                    "namespace": namespace,
+                    "answer": answer,
+                    "created_at": now,
+                    "last_hit_at": now,
+                }],
+            )
+        except Exception as e:
+            print(f"semantic cache store failed: {e}")
+            return
+
+        with self._lock:
+            pending = self._stores_since_evict.get(namespace, 0) + 1
+            self._stores_since_evict[namespace] = 0 if pending >= EVICT_EVERY else pending
+        if pending >= EVICT_EVERY:
+            self.evict(namespace)
+
+    def evict(self, namespace: str) -> int:
+        """Drops expired entries, then the least recently hit ones above max_entries."""
+        collection = self._get_collection()
+        rows = collection.get(where={"namespace": namespace}, include=["metadatas"])
+        now = time.time()
+        entries = list(zip(rows["ids"], rows["metadatas"]))
+
+        expired = {i for i, m in entries if m.get("created_at", 0) + self._ttl_s < now}
+        live = sorted(
+            ((i, m) for i, m in entries if i not in expired),
+            key=lambda item: item[1].get("last_hit_at", 0),
+        )
+        overflow = [i for i, _ in live[: max(0, len(live) - self._max_entries)]]
+
+        doomed = list(expired) + overflow
+        if doomed:
+            collection.delete(ids=doomed)
+        return len(doomed)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            namespaces = set(self._hits) | set(self._misses)
+            out = {}
+            for ns in sorted(namespaces):
+                hits = self._hits.get(ns, 0)
+                misses = self._misses.get(ns, 0)
+                total = hits + misses
+                out[ns] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / total if total else 0.0,
+                }
+            return out
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,67 @@
+from typing import Optional
+
+from decouple import config
+
+from app.core.cache.ttlCache import TTLCache
+from app.core.sharedState import SharedState, shared_state, cache_version, bump_cache_version
+
+# A session's owner never changes, so ownership checks are served from memory;
+# the TTL only bounds how long a deleted session's id is remembered
+SESSION_OWNER_CACHE_TTL = config("SESSION_OWNER_CACHE_TTL", default=3600, cast=int)
+SESSION_OWNER_CACHE_MAX_SESSIONS = config("SESSION_OWNER_CACHE_MAX_SESSIONS", default=50000, cast=int)
+
+
+class SessionOwnerCache:
+    """
+    session id -> owning user id, for authorizing per-session routes without a query.
+
+    The only change an owner can see is the session being deleted. With a shared
+    `state`, a delete bumps a per-session version every worker checks, so a
+    session deleted through another worker stops being reported as existing
+    (the same scheme as SessionWindowCache).
+    """
+
+    def __init__(
+        self,
+        ttl_s: float = SESSION_OWNER_CACHE_TTL,
+        max_sessions: int = SESSION_OWNER_CACHE_MAX_SESSIONS,
+        state: Optional[SharedState] = None,
+    ):
+        self._state = state
+        self._entries = TTLCache("session_owner", max_entries=max_sessions, ttl_s=ttl_s)
+
+    def version(self, session_id: int) -> int:
+        """Shared invalidation counter of a session (always 0 without shared state)."""
+        if self._state is None:
+            return 0
+        return cache_version(f"session_owner:{session_id}", self._state)
+
+    def get(self, session_id: int) -> Optional[int]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        owner, version = entry
+        if version != self.version(session_id):
+            self._entries.invalidate(session_id)
+            return None
+        return owner
+
+    def set(self, session_id: int, owner: int, version: Optional[int] = None) -> None:
+        """`version` is version() as read before the DB read, so a racing delete isn't lost."""
+        if version is None:
+            version = self.version(session_id)
+        self._entries.set(session_id, (owner, version))
+
+    def invalidate(self, session_id: int) -> None:
+        if self._state is not None:
+            bump_cache_version(f"session_owner:{session_id}", self._state)
+        self._entries.invalidate(session_id)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+session_owners = SessionOwnerCache(state=shared_state if shared_state.shared else None)
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from decouple import config
+
+from app.core.metrics import record_cache
+from app.core.sharedState import SharedState, shared_state, cache_version, bump_cache_version
+from app.service.promptBuilder import HISTORY_WINDOW
+
+SESSION_WINDOW_CACHE_ENABLED = config("SESSION_WINDOW_CACHE_ENABLED", default=True, cast=bool)
+SESSION_WINDOW_CACHE_MAX_SESSIONS = config("SESSION_WINDOW_CACHE_MAX_SESSIONS", default=2000, cast=int)
+SESSION_WINDOW_CACHE_MAX_MB = config("SESSION_WINDOW_CACHE_MAX_MB", default=64, cast=float)
+# Bounds how long an edit made by another worker process can go unnoticed
+SESSION_WINDOW_CACHE_TTL = config("SESSION_WINDOW_CACHE_TTL", default=1800, cast=int)
+
+# Rough per-message cost beyond the text itself (tuple, ints, datetime)
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+class CachedMessage(NamedTuple):
+    id: int
+    role: str
+    content: str
+    create_date: Optional[datetime]
+
+    @classmethod
+    def of(cls, msg) -> "CachedMessage":
+        # PromptBuilder only needs .role/.content; id/create_date are informational
+        return cls(getattr(msg, "id", None), msg.role, msg.content, getattr(msg, "create_date", None))
+
+
+class _Window:
+    __slots__ = ("messages", "total", "last_message_at", "size", "expires_at", "version")
+
+    def __init__(self, messages: List[CachedMessage], total: int, last_message_at, expires_at: float, version: int):
+        self.version = version
+        self.messages = messages
+        self.total = total
+        self.last_message_at = last_message_at
+        self.size = sum(_message_bytes(m) for m in messages)
+        self.expires_at = expires_at
+
+
+def _message_bytes(msg: CachedMessage) -> int:
+    return len(msg.content or "") + MESSAGE_OVERHEAD_BYTES
+
+
+class SessionWindowCache:
+    """
+    Write-through LRU of each active session's newest messages, so building the
+    prompt history of the next turn doesn't re-read them.
+
+    An entry remembers the session's message_count / last_message_at it matches;
+    readers pass the current values (one primary-key lookup) and a mismatch,
+    e.g. a write made by another worker process, counts as a miss. With a shared
+    `state`, invalidations also bump a per-session version every worker checks,
+    which catches in-place edits the counters can't see. Capped by number of
+    sessions and by approximate memory.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = SESSION_WINDOW_CACHE_ENABLED,
+        window: int = HISTORY_WINDOW,
+        max_sessions: int = SESSION_WINDOW_CACHE_MAX_SESSIONS,
+        max_bytes: int = int(SESSION_WINDOW_CACHE_MAX_MB * 1024 * 1024),
+        ttl_s: float = SESSION_WINDOW_CACHE_TTL,
+        state: Optional[SharedState] = None,
+    ):
+        self._state = state
+        self.enabled = enabled and max_sessions > 0 and max_bytes > 0
+        self.window = window
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[int, _Window]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def version(self, session_id: int) -> int:
+        """Shared invalidation counter of a session (always 0 without shared state)."""
+        if self._state is None:
+            return 0
+        return cache_version(f"session_window:{session_id}", self._state)
+
+    def get(self, session_id: int, total: int, last_message_at) -> Optional[List[CachedMessage]]:
+        """The newest min(total, window) messages, oldest first, if the entry is current."""
+        if not self.enabled:
+            return None
+        version = self.version(session_id) if session_id in self._entries else 0
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and (
+                entry.expires_at < time.time()
+                or entry.total != total
+                or entry.last_message_at != last_message_at
+                or entry.version != version
+            ):
+                self._drop(session_id)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(session_id)
+                messages = list(entry.messages)
+        record_cache("session_window", entry is not None)
+        return messages if entry is not None else None
+
+    def put(
+        self, session_id: int, total: int, last_message_at, messages: List[CachedMessage],
+        version: Optional[int] = None,
+    ) -> None:
+        """
+        Stores the newest messages of a session read from the DB (oldest first).
+        `version` is version() as read before the DB read, so an invalidation racing
+        with it isn't lost.
+        """
+        if not self.enabled:
+            return
+        if version is None:
+            version = self.version(session_id)
+        entry = _Window(list(messages[-self.window:]), total, last_message_at, time.time() + self.ttl_s, version)
+        with self._lock:
+            self._drop(session_id)
+            self._entries[session_id] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def append(self, session_id: int, msg) -> None:
+        """Write-through for a committed insert; sessions not cached are left alone."""
+        if not self.enabled:
+            return
+        cached = CachedMessage.of(msg)
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            entry.messages.append(cached)
+            entry.total += 1
+            entry.last_message_at = cached.create_date
+            entry.size += _message_bytes(cached)
+            self._bytes += _message_bytes(cached)
+            while len(entry.messages) > self.window:
+                dropped = entry.messages.pop(0)
+                entry.size -= _message_bytes(dropped)
+                self._bytes -= _message_bytes(dropped)
+            self._entries.move_to_end(session_id)
+            self._evict()
+
+    def invalidate(self, session_id: int) -> None:
+        if self._state is not None:
+            bump_cache_version(f"session_window:{session_id}", self._state)
+        with self._lock:
+            self._drop(session_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, session_id: int) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_sessions or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._entries), "bytes": self._bytes}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+session_window_cache = SessionWindowCache(state=shared_state if shared_state.shared else None)
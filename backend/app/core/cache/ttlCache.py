@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from app.core.metrics import record_cache
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU with per-entry expiry for hot request-path lookups
+    (web search results, RAG retrievals, verified tokens). Every get() is
+    reported to the cache_lookups_total metric under `name`.
+    ttl_s <= 0 disables the cache.
+    """
+
+    def __init__(self, name: str, max_entries: int = 256, ttl_s: float = 300.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_s > 0 and self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[1] < now:
+                del self._entries[key]
+                item = None
+            if item is not None:
+                self._entries.move_to_end(key)
+        record_cache(self.name, item is not None)
+        return item[0] if item is not None else None
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        """expires_at caps the entry's lifetime below the cache TTL (e.g. a token's exp)."""
+        if not self.enabled:
+            return
+        deadline = time.time() + self.ttl_s
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._entries[key] = (value, deadline)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,345 @@
+"""
+Semantic index over users' own chat history (MiniLM embeddings in Chroma).
+
+    python -m app.core.historyIndex                 # index every existing session
+    python -m app.core.historyIndex --user-id 7     # only one user's sessions
+
+Off by default (HISTORY_INDEX_ENABLED). When enabled, ORM session events collect
+the ids of messages and sessions that were written, and after the commit a
+background thread loads those rows, embeds them in batches and upserts them
+into one collection, filtered per user through metadata. Nothing on the
+request path waits for an embedding.
+"""
+import argparse
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from decouple import config
+from sqlalchemy import event, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from app.db.models.chat import ChatSession, Message
+
+HISTORY_INDEX_ENABLED = config("HISTORY_INDEX_ENABLED", default=False, cast=bool)
+# Kept apart from ./chroma_db, which init_rag_system() wipes on every rebuild.
+# An embedded Chroma store: not supported with several worker processes
+HISTORY_INDEX_DIR = config("HISTORY_INDEX_DIR", default="./chroma_history")
+HISTORY_INDEX_COLLECTION = "chat_history"
+# Messages embedded per model call
+HISTORY_INDEX_BATCH = config("HISTORY_INDEX_BATCH", default=64, cast=int)
+# Pending jobs beyond this are dropped (and counted) rather than blocking writers
+HISTORY_INDEX_QUEUE_MAX = config("HISTORY_INDEX_QUEUE_MAX", default=10000, cast=int)
+# MiniLM only reads the first ~256 tokens anyway
+HISTORY_INDEX_MAX_CHARS = 2000
+
+_PENDING_KEY = "history_index_pending"
+
+# Job kinds
+UPSERT_MESSAGES = "upsert_messages"
+REINDEX_SESSION = "reindex_session"
+DELETE_MESSAGES = "delete_messages"
+DELETE_SESSION = "delete_session"
+
+
+def _default_client():
+    import chromadb
+    return chromadb.PersistentClient(path=HISTORY_INDEX_DIR)
+
+
+def _default_embed(texts: List[str]) -> List[List[float]]:
+    from app.chroma_rag import get_embeddings
+    return get_embeddings().embed_documents(texts)
+
+
+def _default_session_factory() -> Session:
+    from app.core.database import SessionLocal
+    return SessionLocal()
+
+
+def _doc_id(message_id: int) -> str:
+    return f"msg-{message_id}"
+
+
+class HistoryIndex:
+    def __init__(
+        self,
+        enabled: bool = HISTORY_INDEX_ENABLED,
+        batch_size: int = HISTORY_INDEX_BATCH,
+        queue_max: int = HISTORY_INDEX_QUEUE_MAX,
+        collection_name: str = HISTORY_INDEX_COLLECTION,
+        client_factory: Callable = _default_client,
+        embed_fn: Callable[[List[str]], List[List[float]]] = _default_embed,
+        session_factory: Callable[[], Session] = _default_session_factory,
+    ):
+        self.enabled = enabled
+        self._batch_size = batch_size
+        self._collection_name = collection_name
+        self._client_factory = client_factory
+        self._embed_fn = embed_fn
+        self._session_factory = session_factory
+        self._collection = None
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Tuple[str, object]]]" = queue.Queue(maxsize=queue_max)
+        self._thread: Optional[threading.Thread] = None
+        self._indexed = 0
+        self._dropped = 0
+        self._failed = 0
+
+    def _get_collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    client = self._client_factory()
+                    self._collection = client.get_or_create_collection(
+                        name=self._collection_name,
+                        metadata={"hnsw:space": "cosine"},
+                        embedding_function=None,
+                    )
+        return self._collection
+
+    # --- Change capture ---
+    def watch(self, target=Session) -> None:
+        """Collects message/session writes made through `target` (a Session class or instance)."""
+        event.listen(target, "after_flush", self._after_flush)
+        event.listen(target, "after_commit", self._after_commit)
+        event.listen(target, "after_soft_rollback", self._after_rollback)
+
+    def unwatch(self, target=Session) -> None:
+        event.remove(target, "after_flush", self._after_flush)
+        event.remove(target, "after_commit", self._after_commit)
+        event.remove(target, "after_soft_rollback", self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        pending = session.info.setdefault(_PENDING_KEY, [])
+        upserts = [obj.id for obj in session.new if isinstance(obj, Message)]
+        upserts += [
+            obj.id for obj in session.dirty
+            if isinstance(obj, Message) and inspect(obj).attrs.content.history.has_changes()
+        ]
+        deletes = [obj.id for obj in session.deleted if isinstance(obj, Message)]
+        if upserts:
+            pending.append((UPSERT_MESSAGES, upserts))
+        if deletes:
+            pending.append((DELETE_MESSAGES, deletes))
+        for obj in session.deleted:
+            if isinstance(obj, ChatSession):
+                pending.append((DELETE_SESSION, obj.id))
+
+    def _after_commit(self, session):
+        for kind, payload in session.info.pop(_PENDING_KEY, []):
+            self.enqueue(kind, payload)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(_PENDING_KEY, None)
+
+    def enqueue(self, kind: str, payload) -> None:
+        """
+        Schedules an index update. Core inserts (bulk import) don't go through the
+        ORM, so their callers enqueue REINDEX_SESSION themselves.
+        """
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait((kind, payload))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    # --- Worker ---
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self.watch()
+        self._thread = threading.Thread(target=self._run, name="history-index", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self.unwatch()
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            jobs = [job]
+            # Coalesce whatever else is already waiting into the same pass
+            while len(jobs) < self._batch_size:
+                try:
+                    extra = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is None:
+                    self._queue.put(None)
+                    self._queue.task_done()
+                    break
+                jobs.append(extra)
+            try:
+                self._process(jobs)
+            finally:
+                for _ in jobs:
+                    self._queue.task_done()
+
+    def run_pending(self) -> int:
+        """Processes queued jobs in the calling thread (tests, CLI). Returns how many ran."""
+        jobs = []
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            if job is not None:
+                jobs.append(job)
+        if jobs:
+            self._process(jobs)
+        return len(jobs)
+
+    def flush(self) -> None:
+        """Blocks until the worker has handled everything queued so far."""
+        self._queue.join()
+
+    def _process(self, jobs: List[Tuple[str, object]]) -> None:
+        message_ids: List[int] = []
+        session_ids: List[int] = []
+        for kind, payload in jobs:
+            try:
+                if kind == UPSERT_MESSAGES:
+                    message_ids.extend(payload)
+                    continue
+                if kind == REINDEX_SESSION:
+                    session_ids.append(payload)
+                    continue
+                # Apply pending upserts first so a later delete wins
+                self._upsert(message_ids, session_ids)
+                message_ids, session_ids = [], []
+                if kind == DELETE_MESSAGES:
+                    self._get_collection().delete(ids=[_doc_id(i) for i in payload])
+                elif kind == DELETE_SESSION:
+                    self._get_collection().delete(where={"session_id": payload})
+            except Exception as e:
+                print(f"history index {kind} failed: {e}")
+                with self._lock:
+                    self._failed += 1
+        try:
+            self._upsert(message_ids, session_ids)
+        except Exception as e:
+            print(f"history index upsert failed: {e}")
+            with self._lock:
+                self._failed += 1
+
+    def _upsert(self, message_ids: List[int], session_ids: List[int]) -> None:
+        if not message_ids and not session_ids:
+            return
+        conditions = []
+        if message_ids:
+            conditions.append(Message.id.in_(set(message_ids)))
+        if session_ids:
+            conditions.append(Message.session_id.in_(set(session_ids)))
+        stmt = (
+            select(Message.id, Message.session_id, Message.role, Message.content,
+                   Message.create_date, ChatSession.user_id)
+            .join(ChatSession, ChatSession.id == Message.session_id)
+            .where(or_(*conditions))
+            .order_by(Message.id)
+        )
+        with self._session_factory() as db:
+            rows = db.execute(stmt).all()
+        # rows whose message was deleted in the meantime simply aren't there
+        for lo in range(0, len(rows), self._batch_size):
+            self._upsert_rows(rows[lo:lo + self._batch_size])
+
+    def _upsert_rows(self, rows) -> None:
+        rows = [row for row in rows if row.content and row.content.strip()]
+        if not rows:
+            return
+        documents = [row.content[:HISTORY_INDEX_MAX_CHARS] for row in rows]
+        self._get_collection().upsert(
+            ids=[_doc_id(row.id) for row in rows],
+            embeddings=self._embed_fn(documents),
+            documents=documents,
+            metadatas=[{
+                "user_id": row.user_id,
+                "session_id": row.session_id,
+                "message_id": row.id,
+                "role": row.role,
+                "created_at": row.create_date.timestamp() if row.create_date else time.time(),
+            } for row in rows],
+        )
+        with self._lock:
+            self._indexed += len(rows)
+
+    # --- Query ---
+    def search(self, user_id: int, q: str, k: int = 10, session_id: Optional[int] = None) -> List[Dict]:
+        """
+        The user's k nearest messages to `q`, most similar first, as dicts with
+        message_id, session_id, role, content, create_date (epoch s) and similarity.
+        """
+        if not q.strip():
+            return []
+        where = {"user_id": user_id}
+        if session_id is not None:
+            where = {"$and": [{"user_id": user_id}, {"session_id": session_id}]}
+        result = self._get_collection().query(
+            query_embeddings=self._embed_fn([q]),
+            n_results=k,
+            where=where,
+            include=["metadatas", "documents", "distances"],
+        )
+        if not result.get("ids") or not result["ids"][0]:
+            return []
+        return [
+            {
+                "message_id": meta["message_id"],
+                "session_id": meta["session_id"],
+                "role": meta["role"],
+                "content": document,
+                "create_date": meta["created_at"],
+                "similarity": 1.0 - distance,
+            }
+            for meta, document, distance in zip(
+                result["metadatas"][0], result["documents"][0], result["distances"][0]
+            )
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "queued": self._queue.qsize(),
+                "indexed_total": self._indexed,
+                "dropped_total": self._dropped,
+                "failed_total": self._failed,
+            }
+
+
+history_index = HistoryIndex()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, help="only index this user's sessions")
+    args = parser.parse_args(argv)
+
+    index = HistoryIndex(enabled=True)
+    with _default_session_factory() as db:
+        stmt = select(ChatSession.id).order_by(ChatSession.id)
+        if args.user_id is not None:
+            stmt = stmt.where(ChatSession.user_id == args.user_id)
+        session_ids = list(db.execute(stmt).scalars())
+    for lo in range(0, len(session_ids), index._batch_size):
+        for session_id in session_ids[lo:lo + index._batch_size]:
+            index.enqueue(REINDEX_SESSION, session_id)
+        index.run_pending()
+    print(f"indexed {index.stats()['indexed_total']} message(s) from {len(session_ids)} session(s)")
+
+
+if __name__ == "__main__":
+    main()
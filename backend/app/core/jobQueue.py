@@ -0,0 +1,329 @@
+"""
+In-process queue for work that doesn't need to finish before the response
+(persisting the assistant message, auto-titles, cache writes).
+
+Asyncio workers run on their own event-loop thread; handlers are plain sync
+functions run with asyncio.to_thread, so request threads submit without
+touching the loop. The queue is bounded; callers fall back to doing the
+work inline when it is full or not running. Failed jobs are retried with
+exponential backoff. With JOB_QUEUE_DB set, every job is written to a SQLite
+file first and replayed on the next start if the process died before
+finishing it. Several worker processes may share that file: each job records
+the pid that owns it, and a starting process only replays jobs whose owner
+is no longer alive.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from decouple import config
+
+from app.core import metrics
+
+JOB_QUEUE_ENABLED = config("JOB_QUEUE_ENABLED", default=True, cast=bool)
+JOB_QUEUE_WORKERS = config("JOB_QUEUE_WORKERS", default=2, cast=int)
+JOB_QUEUE_MAX = config("JOB_QUEUE_MAX", default=1000, cast=int)
+JOB_MAX_ATTEMPTS = config("JOB_MAX_ATTEMPTS", default=3, cast=int)
+JOB_RETRY_BASE_S = config("JOB_RETRY_BASE_S", default=0.5, cast=float)
+# Path of the durable job log (e.g. ./jobs.sqlite3); empty keeps jobs in memory only
+JOB_QUEUE_DB = config("JOB_QUEUE_DB", default="")
+# How long a request waits for earlier jobs of the same key (see drain())
+JOB_DRAIN_TIMEOUT = config("JOB_DRAIN_TIMEOUT", default=5.0, cast=float)
+
+job_latency = metrics.registry.histogram(
+    "job_queue_latency_seconds", "Time from submit to job completion by job name.", ("job",)
+)
+job_runs = metrics.registry.counter(
+    "job_queue_runs_total", "Job attempts by job name and result (ok|retry|failed).", ("job", "result")
+)
+
+
+class _Job:
+    __slots__ = ("name", "payload", "key", "enqueued_at", "durable_id")
+
+    def __init__(self, name: str, payload: Dict, key: Optional[str], durable_id: Optional[int] = None):
+        self.name = name
+        self.payload = payload
+        self.key = key
+        self.enqueued_at = time.perf_counter()
+        self.durable_id = durable_id
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _DurableLog:
+    """Jobs written before they are queued and deleted once done; failed ones are kept."""
+
+    def __init__(self, path: str, pid: Optional[int] = None, alive: Callable[[int], bool] = _pid_alive):
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._pid = pid or os.getpid()
+        self._alive = alive
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, payload TEXT NOT NULL,"
+            " job_key TEXT, status TEXT NOT NULL DEFAULT 'pending', error TEXT, created_at REAL NOT NULL,"
+            " owner_pid INTEGER)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "owner_pid" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner_pid INTEGER")
+
+    def add(self, name: str, payload: Dict, key: Optional[str]) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO jobs (name, payload, job_key, created_at, owner_pid) VALUES (?, ?, ?, ?, ?)",
+                (name, json.dumps(payload), key, time.time(), self._pid),
+            )
+            return cur.lastrowid
+
+    def done(self, job_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def failed(self, job_id: int, error: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = 'failed', error = ? WHERE id = ?", (error[:1000], job_id))
+
+    def claim_orphans(self):
+        """
+        Takes over the pending jobs of dead processes and returns them, oldest first.
+        Called before this process adds anything, so rows already carrying our pid
+        are from an earlier process that got the same one (e.g. pid 1 in a container).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, name, payload, job_key, owner_pid FROM jobs WHERE status = 'pending' ORDER BY id"
+                ).fetchall()
+                rows = [row for row in rows if row[4] == self._pid or not self._alive(row[4])]
+                self._conn.executemany(
+                    "UPDATE jobs SET owner_pid = ? WHERE id = ?", [(self._pid, row[0]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(job_id, name, json.loads(payload), key) for job_id, name, payload, key, _ in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    def __init__(
+        self,
+        enabled: bool = JOB_QUEUE_ENABLED,
+        workers: int = JOB_QUEUE_WORKERS,
+        max_size: int = JOB_QUEUE_MAX,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_base_s: float = JOB_RETRY_BASE_S,
+        durable_path: str = JOB_QUEUE_DB,
+    ):
+        self.enabled = enabled
+        self._workers = workers
+        self._max_size = max_size
+        self._max_attempts = max_attempts
+        self._retry_base_s = retry_base_s
+        self._durable_path = durable_path
+        self._handlers: Dict[str, Callable[[Dict], Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._log: Optional[_DurableLog] = None
+        self._cond = threading.Condition()
+        self._depth = 0
+        self._pending_by_key: Dict[str, int] = {}
+        self._completed = 0
+        self._failed = 0
+        self._retried = 0
+        self._rejected = 0
+
+    def handler(self, name: str):
+        """Registers a sync function taking the job's JSON-serializable payload dict."""
+        def decorator(fn):
+            self._handlers[name] = fn
+            return fn
+        return decorator
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    # --- Lifecycle ---
+    def start(self) -> None:
+        if not self.enabled or self.running:
+            return
+        ready = threading.Event()
+        loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            self._queue = asyncio.Queue()
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self._workers)]
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        if self._durable_path:
+            self._log = _DurableLog(self._durable_path)
+        self._thread = threading.Thread(target=run, name="job-queue", daemon=True)
+        self._thread.start()
+        ready.wait()
+        self._loop = loop
+        if self._log is not None:
+            for job_id, name, payload, key in self._log.claim_orphans():
+                self._enqueue(_Job(name, payload, key, durable_id=job_id))
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Lets queued jobs finish (up to `timeout`), then stops the workers."""
+        if not self.running:
+            return
+        loop = self._loop
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._depth and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+        self._loop = None
+
+        async def shutdown():
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop)
+        self._thread.join(timeout)
+        loop.close()
+        self._thread = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    # --- Submitting ---
+    def submit(self, name: str, payload: Dict, key: Optional[str] = None) -> bool:
+        """
+        Queues a job. Returns False when the queue isn't running or is full, in which
+        case the caller should do the work inline. `key` groups jobs for drain().
+        """
+        if name not in self._handlers:
+            raise KeyError(f"no job handler registered for {name!r}")
+        if not self.running:
+            return False
+        with self._cond:
+            if self._depth >= self._max_size:
+                self._rejected += 1
+                return False
+        durable_id = self._log.add(name, payload, key) if self._log is not None else None
+        self._enqueue(_Job(name, payload, key, durable_id))
+        return True
+
+    def _enqueue(self, job: _Job) -> None:
+        with self._cond:
+            self._depth += 1
+            if job.key is not None:
+                self._pending_by_key[job.key] = self._pending_by_key.get(job.key, 0) + 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+
+    def drain(self, key: str, timeout: float = JOB_DRAIN_TIMEOUT) -> bool:
+        """
+        Waits until no job with this key is queued or running, e.g. so a session's
+        next turn sees the previous answer. Returns False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending_by_key.get(key):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def join(self, timeout: float = JOB_DRAIN_TIMEOUT) -> bool:
+        """Waits until every queued job has finished. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._depth:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # --- Workers ---
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+                self._finish(job)
+
+    async def _run(self, job: _Job) -> None:
+        fn = self._handlers[job.name]
+        for attempt in range(1, self._max_attempts + 1):
+            try:
+                await asyncio.to_thread(fn, job.payload)
+            except Exception as e:
+                if attempt < self._max_attempts:
+                    job_runs.inc(job=job.name, result="retry")
+                    with self._cond:
+                        self._retried += 1
+                    await asyncio.sleep(self._retry_base_s * 2 ** (attempt - 1))
+                    continue
+                print(f"job {job.name} failed after {attempt} attempt(s): {e}")
+                job_runs.inc(job=job.name, result="failed")
+                with self._cond:
+                    self._failed += 1
+                if job.durable_id is not None:
+                    self._log.failed(job.durable_id, str(e))
+                return
+            job_runs.inc(job=job.name, result="ok")
+            with self._cond:
+                self._completed += 1
+            if job.durable_id is not None:
+                self._log.done(job.durable_id)
+            return
+
+    def _finish(self, job: _Job) -> None:
+        job_latency.observe(time.perf_counter() - job.enqueued_at, job=job.name)
+        with self._cond:
+            self._depth -= 1
+            if job.key is not None:
+                left = self._pending_by_key.get(job.key, 1) - 1
+                if left:
+                    self._pending_by_key[job.key] = left
+                else:
+                    self._pending_by_key.pop(job.key, None)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "running": self.running,
+                "depth": self._depth,
+                "completed_total": self._completed,
+                "failed_total": self._failed,
+                "retried_total": self._retried,
+                "rejected_total": self._rejected,
+            }
+
+
+job_queue = JobQueue()
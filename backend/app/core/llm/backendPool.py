@@ -0,0 +1,251 @@
+import re
+import threading
+import time
+from typing import Dict, Generator, List, Optional, Set, Tuple
+
+import httpx
+from decouple import config, Csv
+
+# Comma-separated OpenAI-compatible chat completion URLs; empty = the single ROBOT_ENDPOINT
+LLM_BACKENDS = config("LLM_BACKENDS", default="", cast=Csv())
+LLM_CONNECT_TIMEOUT = config("LLM_CONNECT_TIMEOUT", default=5.0, cast=float)
+LLM_CIRCUIT_FAILURES = config("LLM_CIRCUIT_FAILURES", default=3, cast=int)
+LLM_CIRCUIT_COOLDOWN = config("LLM_CIRCUIT_COOLDOWN", default=30.0, cast=float)
+LLM_HEALTH_INTERVAL = config("LLM_HEALTH_INTERVAL", default=10.0, cast=float)
+
+CHAT_COMPLETIONS_PATH = "/v1/chat/completions"
+# vLLM gauges used for queue-depth-aware balancing
+QUEUE_METRICS = ("vllm:num_requests_waiting",)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class NoBackendAvailable(Exception):
+    pass
+
+
+class UpstreamRejected(Exception):
+    """A 4xx (other than 429) from a backend: the request itself is bad, so it isn't retried."""
+
+    def __init__(self, status_code: int, detail: str = ""):
+        super().__init__(f"upstream rejected the request with {status_code}: {detail}".rstrip(": "))
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"upstream returned {status_code}")
+        self.status_code = status_code
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url
+        self.base_url = url[: -len(CHAT_COMPLETIONS_PATH)] if url.endswith(CHAT_COMPLETIONS_PATH) else url.rstrip("/")
+        self.outstanding = 0
+        self.queue_depth = 0.0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    def state(self, cooldown_s: float, now: float) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if now - self.opened_at >= cooldown_s:
+            return HALF_OPEN
+        return OPEN
+
+    def load(self) -> float:
+        return self.outstanding + self.queue_depth
+
+    def snapshot(self, cooldown_s: float) -> Dict:
+        return {
+            "url": self.url,
+            "state": self.state(cooldown_s, time.time()),
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "queue_depth": self.queue_depth,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class BackendPool:
+    """
+    Least-loaded routing over several OpenAI-compatible servers.
+    Load = requests we have outstanding + the server's own waiting queue (from /metrics).
+    A backend that fails `failure_threshold` times in a row is skipped for `cooldown_s`,
+    then gets a single trial request. A stream that dies before its first data line is
+    retried on the next backend; once content has reached the caller it is not.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[str],
+        failure_threshold: int = LLM_CIRCUIT_FAILURES,
+        cooldown_s: float = LLM_CIRCUIT_COOLDOWN,
+        connect_timeout_s: float = LLM_CONNECT_TIMEOUT,
+        client: Optional[httpx.Client] = None,
+    ):
+        if not endpoints:
+            raise ValueError("BackendPool needs at least one endpoint")
+        self.backends = [Backend(url) for url in endpoints]
+        self._failure_threshold = failure_threshold
+        self._cooldown_s = cooldown_s
+        self._client = client or httpx.Client(timeout=httpx.Timeout(None, connect=connect_timeout_s))
+        self._lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # --- selection ---
+    def _acquire(self, exclude: Set[str]) -> Optional[Tuple[Backend, bool]]:
+        """Pick a backend; the flag says whether this request is its half-open trial."""
+        now = time.time()
+        with self._lock:
+            usable = []
+            for b in self.backends:
+                if b.url in exclude:
+                    continue
+                state = b.state(self._cooldown_s, now)
+                if state == OPEN or (state == HALF_OPEN and b.trial_in_flight):
+                    continue
+                usable.append(b)
+            if not usable:
+                return None
+            # Health checks only rank; if every usable backend looks down, still try one.
+            healthy = [b for b in usable if b.healthy] or usable
+            chosen = min(healthy, key=lambda b: b.load())
+            is_trial = chosen.state(self._cooldown_s, now) == HALF_OPEN
+            if is_trial:
+                chosen.trial_in_flight = True
+            chosen.outstanding += 1
+            return chosen, is_trial
+
+    def _release(self, backend: Backend, ok: Optional[bool], is_trial: bool = False) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+            # A request started before the circuit opened must not end the trial.
+            if is_trial:
+                backend.trial_in_flight = False
+            if ok is None:
+                return
+            if ok:
+                backend.consecutive_failures = 0
+                backend.opened_at = None
+            else:
+                backend.consecutive_failures += 1
+                if backend.consecutive_failures >= self._failure_threshold or backend.opened_at is not None:
+                    backend.opened_at = time.time()
+
+    # --- requests ---
+    def stream_lines(self, payload: Dict) -> Generator[str, None, None]:
+        """POST a streaming completion and yield raw SSE lines."""
+        tried: Set[str] = set()
+        last_error: Optional[Exception] = None
+        while True:
+            picked = self._acquire(exclude=tried)
+            if picked is None:
+                raise NoBackendAvailable(f"no LLM backend available (last error: {last_error})")
+            backend, is_trial = picked
+            tried.add(backend.url)
+
+            started = False
+            ok: Optional[bool] = False
+            try:
+                with self._client.stream("POST", backend.url, json=payload) as r:
+                    if r.status_code == 429 or r.status_code >= 500:
+                        raise _RetryableStatus(r.status_code)
+                    if r.status_code >= 400:
+                        # The request itself is bad; another backend would reject it too.
+                        ok = None
+                        raise UpstreamRejected(r.status_code, r.read().decode(errors="replace")[:200])
+                    for line in r.iter_lines():
+                        # blank keep-alives and comments carry no content, so a failure
+                        # after them can still go to another backend
+                        if not started and line.startswith("data:"):
+                            started = True
+                        yield line
+                ok = True
+                return
+            except (httpx.TransportError, _RetryableStatus) as e:
+                if started:
+                    raise
+                last_error = e
+            except GeneratorExit:
+                # Caller stopped reading; not the backend's fault.
+                ok = None
+                raise
+            finally:
+                self._release(backend, ok, is_trial)
+
+    def complete(self, payload: Dict, timeout_s: float = 30.0) -> Dict:
+        """Non-streaming completion with the same routing and failover."""
+        tried: Set[str] = set()
+        last_error: Optional[Exception] = None
+        while True:
+            picked = self._acquire(exclude=tried)
+            if picked is None:
+                raise NoBackendAvailable(f"no LLM backend available (last error: {last_error})")
+            backend, is_trial = picked
+            tried.add(backend.url)
+            ok: Optional[bool] = False
+            try:
+                r = self._client.post(backend.url, json={**payload, "stream": False}, timeout=timeout_s)
+                if r.status_code == 429 or r.status_code >= 500:
+                    raise _RetryableStatus(r.status_code)
+                if r.status_code >= 400:
+                    ok = None
+                    raise UpstreamRejected(r.status_code, r.text[:200])
+                ok = True
+                return r.json()
+            except (httpx.TransportError, _RetryableStatus) as e:
+                last_error = e
+            finally:
+                self._release(backend, ok, is_trial)
+
+    # --- health ---
+    def check_health(self) -> None:
+        for b in self.backends:
+            try:
+                r = self._client.get(f"{b.base_url}/health", timeout=2.0)
+                b.healthy = r.status_code == 200
+            except httpx.HTTPError:
+                b.healthy = False
+                continue
+            if b.healthy:
+                b.queue_depth = self._scrape_queue_depth(b)
+
+    def _scrape_queue_depth(self, backend: Backend) -> float:
+        try:
+            r = self._client.get(f"{backend.base_url}/metrics", timeout=2.0)
+            if r.status_code != 200:
+                return 0.0
+        except httpx.HTTPError:
+            return 0.0
+        depth = 0.0
+        for line in r.text.splitlines():
+            m = re.match(r"^([a-zA-Z_:]+)(?:\{[^}]*\})?\s+([0-9.eE+-]+)$", line)
+            if m and m.group(1) in QUEUE_METRICS:
+                depth += float(m.group(2))
+        return depth
+
+    def start_health_checks(self, interval_s: float = LLM_HEALTH_INTERVAL) -> None:
+        if interval_s <= 0 or self._health_thread is not None:
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.wait(interval_s):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=_loop, name="llm-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self) -> None:
+        self._stop.set()
+        self._health_thread = None
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [b.snapshot(self._cooldown_s) for b in self.backends]
@@ -0,0 +1,120 @@
+import threading
+from typing import Callable, Dict, Generator, Iterator, List, Optional
+
+from decouple import config
+
+# Only requests whose caller passes shared=True (deterministic ones) are ever merged
+COALESCE_ENABLED = config("COALESCE_ENABLED", default=True, cast=bool)
+
+
+class _Flight:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks: List[str] = []
+        self.done = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+
+
+class StreamCoalescer:
+    """
+    Single-flight for streamed generations: concurrent callers with the same key share
+    one upstream stream. The upstream runs on its own thread and buffers its chunks, so
+    late joiners replay from the start and one slow or disconnected client can't stall
+    the others. Once the last subscriber leaves, the upstream is abandoned; a caller
+    arriving after that starts a fresh flight rather than joining the abandoned one.
+
+    Sharing is only correct when every caller would get the same answer, so callers
+    pass shared=False for sampled requests and those always get their own upstream.
+    """
+
+    def __init__(self, enabled: bool = COALESCE_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._started = 0
+        self._joined = 0
+
+    def stream(
+        self, key: str, factory: Callable[[], Iterator[str]], shared: bool = True
+    ) -> Generator[str, None, None]:
+        if not self.enabled or not shared:
+            yield from factory()
+            return
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                with flight.cond:
+                    abandoned = flight.cancelled
+                if abandoned:
+                    # its pump stops at the next chunk; it only removes its own entry
+                    flight = None
+            if flight is None:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._started += 1
+                threading.Thread(
+                    target=self._pump, args=(key, flight, factory), name="coalesce-pump", daemon=True
+                ).start()
+            else:
+                self._joined += 1
+            with flight.cond:
+                flight.subscribers += 1
+
+        yield from self._follow(flight)
+
+    def _pump(self, key: str, flight: _Flight, factory: Callable[[], Iterator[str]]) -> None:
+        upstream = factory()
+        try:
+            for chunk in upstream:
+                with flight.cond:
+                    if flight.cancelled:
+                        break
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            close = getattr(upstream, "close", None)
+            if close is not None:
+                close()
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+    def _follow(self, flight: _Flight) -> Generator[str, None, None]:
+        i = 0
+        try:
+            while True:
+                with flight.cond:
+                    while i >= len(flight.chunks) and not flight.done:
+                        flight.cond.wait()
+                    batch = flight.chunks[i:]
+                    finished = flight.done
+                i += len(batch)
+                yield from batch
+                if finished and i >= len(flight.chunks):
+                    break
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            with flight.cond:
+                flight.subscribers -= 1
+                if flight.subscribers == 0 and not flight.done:
+                    flight.cancelled = True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "upstream_started_total": self._started,
+                "coalesced_total": self._joined,
+            }
+
+
+coalescer = StreamCoalescer()
@@ -0,0 +1,31 @@
+import json
+from typing import Any, Dict, Generator, Iterable
+
+DATA_PREFIX = "data:"
+DONE = "[DONE]"
+
+
+def iter_sse_chunks(lines: Iterable[str]) -> Generator[Dict[str, Any], None, None]:
+    """
+    Parse the `data:` lines of an OpenAI-compatible stream into JSON chunks.
+    Stops at `data: [DONE]`; comments, event lines and blanks are skipped.
+    """
+    for line in lines:
+        if not line or not line.startswith(DATA_PREFIX):
+            continue
+        data = line[len(DATA_PREFIX):].strip()
+        if data == DONE:
+            return
+        if data:
+            yield json.loads(data)
+
+
+def iter_content_deltas(lines: Iterable[str]) -> Generator[str, None, None]:
+    """Only the text content of each chunk's first choice."""
+    for chunk in iter_sse_chunks(lines):
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
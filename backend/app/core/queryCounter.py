@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Generator, List, Optional, Tuple
+
+from decouple import config
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Adds X-DB-Queries / X-DB-Time-ms to every response
+DEV_MODE = config("DEV_MODE", default=False, cast=bool)
+SLOW_QUERY_MS = config("SLOW_QUERY_MS", default=200, cast=float)
+# Same SQL this many times in one request is reported as a likely N+1
+QUERY_REPEAT_THRESHOLD = config("QUERY_REPEAT_THRESHOLD", default=5, cast=int)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_s = 0.0
+        self.statements: "Counter[str]" = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed_s: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_s += elapsed_s
+            self.statements[statement] += 1
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_s * 1000
+
+    def repeated(self, threshold: int = QUERY_REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        with self._lock:
+            return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_installed = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed_s = time.perf_counter() - starts.pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed_s)
+    if elapsed_s * 1000 >= SLOW_QUERY_MS:
+        print(f"slow query ({elapsed_s * 1000:.0f} ms): {' '.join(statement.split())[:500]}")
+
+
+def install() -> None:
+    """Listen on every Engine (app, tests, benchmarks). Safe to call more than once."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def track() -> Generator[QueryStats, None, None]:
+    """Counts every statement executed in this context (threadpool hops included)."""
+    install()
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_query_budget(max_statements: int) -> Generator[QueryStats, None, None]:
+    """
+    Test helper: fails if the block runs more than `max_statements` statements.
+
+        with assert_query_budget(3):
+            repo.create_message(data=payload)
+    """
+    with track() as stats:
+        yield stats
+    if stats.count > max_statements:
+        listing = "\n".join(f"  {n}x {' '.join(sql.split())[:200]}" for sql, n in stats.statements.most_common())
+        raise AssertionError(f"expected at most {max_statements} statements, ran {stats.count}:\n{listing}")
+
+
+class QueryCounterMiddleware:
+    """
+    Pure ASGI middleware: tracks statements per request, reports repeated ones
+    when the request finishes and, in DEV_MODE, sets X-DB-Queries / X-DB-Time-ms.
+    For streamed responses the headers cover the work done before the first byte.
+    """
+
+    def __init__(self, app, dev_mode: bool = DEV_MODE):
+        self.app = app
+        self.dev_mode = dev_mode
+        install()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if self.dev_mode and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.total_ms:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with track() as stats:
+            await self.app(scope, receive, send_wrapper)
+
+        for sql, n in stats.repeated():
+            print(f"repeated query ({n}x in {scope.get('method')} {scope.get('path')}): {' '.join(sql.split())[:300]}")
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Generator, Iterable, Optional, Tuple
+
+from decouple import config, Csv
+
+# Concurrent upstream generations the scheduler lets through, per worker process
+# (not shared, see app/core/sharedState.py): with N workers set it to capacity / N
+SCHED_SLOTS = config("SCHED_SLOTS", default=8, cast=int)
+# Slots thinking jobs may never take, so a chat turn can always start promptly
+SCHED_RESERVED_INTERACTIVE = config("SCHED_RESERVED_INTERACTIVE", default=2, cast=int)
+SCHED_WAIT_TIMEOUT = config("SCHED_WAIT_TIMEOUT", default=60.0, cast=float)
+# Send vLLM's `priority` field; the server must run with --scheduling-policy priority
+SCHED_VLLM_PRIORITY = config("SCHED_VLLM_PRIORITY", default=False, cast=bool)
+SCHED_PREMIUM_USERS = config("SCHED_PREMIUM_USERS", default="", cast=Csv(int))
+
+INTERACTIVE, THINKING = "interactive", "thinking"
+STANDARD, PREMIUM = "standard", "premium"
+
+# Share of dispatch each class gets under contention (weighted fair queuing)
+CLASS_WEIGHTS = {INTERACTIVE: 4.0, THINKING: 1.0}
+TIER_WEIGHTS = {STANDARD: 1.0, PREMIUM: 2.0}
+# Rough relative cost of one job, thinking turns run much longer
+CLASS_COST = {INTERACTIVE: 1.0, THINKING: 4.0}
+# vLLM serves lower values first
+VLLM_PRIORITY = {INTERACTIVE: 0, THINKING: 10}
+PREMIUM_PRIORITY_BOOST = -1
+
+
+class SchedulerTimeout(Exception):
+    pass
+
+
+def job_class(mode: int) -> str:
+    # mode 1 = think
+    return THINKING if mode == 1 else INTERACTIVE
+
+
+def user_tier(user_id: Optional[int], premium_users: Iterable[int] = SCHED_PREMIUM_USERS) -> str:
+    return PREMIUM if user_id is not None and user_id in premium_users else STANDARD
+
+
+class _Ticket:
+    __slots__ = ("key", "finish", "granted")
+
+    def __init__(self, key: Tuple[str, str], finish: float):
+        self.key = key
+        self.finish = finish
+        self.granted = False
+
+
+class GenerationScheduler:
+    """
+    Start-time fair queuing over (job class, user tier) queues. Each job gets a virtual
+    finish tag = max(virtual time, class's last tag) + cost / weight; the free slot goes
+    to the smallest tag among queue heads. Idle capacity is always used, but thinking
+    jobs can hold at most `slots - reserved_interactive` slots.
+    """
+
+    def __init__(
+        self,
+        slots: int = SCHED_SLOTS,
+        reserved_interactive: int = SCHED_RESERVED_INTERACTIVE,
+        wait_timeout_s: float = SCHED_WAIT_TIMEOUT,
+        premium_users: Iterable[int] = SCHED_PREMIUM_USERS,
+        vllm_priority: bool = SCHED_VLLM_PRIORITY,
+    ):
+        self.slots = slots
+        self.thinking_cap = max(1, slots - reserved_interactive)
+        self.wait_timeout_s = wait_timeout_s
+        self.premium_users = set(premium_users)
+        self.vllm_priority = vllm_priority
+
+        self._cond = threading.Condition()
+        self._queues: Dict[Tuple[str, str], Deque[_Ticket]] = {}
+        self._last_finish: Dict[Tuple[str, str], float] = {}
+        self._virtual_time = 0.0
+        self._running: Dict[str, int] = {INTERACTIVE: 0, THINKING: 0}
+        self._dispatched: Dict[Tuple[str, str], int] = {}
+
+    def classify(self, mode: int, user_id: Optional[int]) -> Tuple[str, str]:
+        return job_class(mode), user_tier(user_id, self.premium_users)
+
+    def priority_hint(self, mode: int, user_id: Optional[int]) -> Optional[int]:
+        """Value for vLLM's `priority` request field, or None when disabled."""
+        if not self.vllm_priority:
+            return None
+        cls, tier = self.classify(mode, user_id)
+        return VLLM_PRIORITY[cls] + (PREMIUM_PRIORITY_BOOST if tier == PREMIUM else 0)
+
+    def _free_for(self, cls: str) -> bool:
+        if sum(self._running.values()) >= self.slots:
+            return False
+        return cls != THINKING or self._running[THINKING] < self.thinking_cap
+
+    def _dispatch_locked(self) -> None:
+        while True:
+            heads = [
+                q[0] for key, q in self._queues.items()
+                if q and self._free_for(key[0])
+            ]
+            if not heads:
+                return
+            ticket = min(heads, key=lambda t: t.finish)
+            self._queues[ticket.key].popleft()
+            self._virtual_time = max(self._virtual_time, ticket.finish)
+            self._running[ticket.key[0]] += 1
+            self._dispatched[ticket.key] = self._dispatched.get(ticket.key, 0) + 1
+            ticket.granted = True
+            self._cond.notify_all()
+
+    def acquire(self, mode: int, user_id: Optional[int] = None) -> Tuple[str, str]:
+        key = self.classify(mode, user_id)
+        cls, tier = key
+        deadline = time.monotonic() + self.wait_timeout_s
+        with self._cond:
+            start = max(self._virtual_time, self._last_finish.get(key, 0.0))
+            finish = start + CLASS_COST[cls] / (CLASS_WEIGHTS[cls] * TIER_WEIGHTS[tier])
+            self._last_finish[key] = finish
+            ticket = _Ticket(key, finish)
+            self._queues.setdefault(key, deque()).append(ticket)
+            self._dispatch_locked()
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queues[key].remove(ticket)
+                    raise SchedulerTimeout(f"no generation slot for {cls}/{tier} within {self.wait_timeout_s}s")
+                self._cond.wait(remaining)
+        return key
+
+    def release(self, key: Tuple[str, str]) -> None:
+        with self._cond:
+            self._running[key[0]] -= 1
+            self._dispatch_locked()
+
+    @contextmanager
+    def slot(self, mode: int, user_id: Optional[int] = None) -> Generator[None, None, None]:
+        key = self.acquire(mode, user_id)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "running": dict(self._running),
+                "queued": {f"{c}/{t}": len(q) for (c, t), q in self._queues.items()},
+                "dispatched_total": {f"{c}/{t}": n for (c, t), n in self._dispatched.items()},
+            }
+
+
+scheduler = GenerationScheduler()
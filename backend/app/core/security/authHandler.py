@@ -1,29 +1,112 @@
 import jwt
 import time
+import uuid
+from typing import Optional
 from decouple import config
 
-JWT_SECRET = config("JWT_SECRET")
+from app.core.cache.ttlCache import TTLCache
+from app.core.security.jwtVerifier import (
+    JWT_AUDIENCE, JWT_ISSUER, JWT_JWKS_URL, JWT_KEY_ID, JWT_PRIVATE_KEY_FILE, JWT_PUBLIC_KEYS_DIR,
+    JWTVerifier, KeyRing, TokenRejected, jwks_loader, pem_dir_loader, prepare_key,
+)
+
+# Only needed for HS* algorithms; asymmetric deployments sign with JWT_PRIVATE_KEY_FILE
+JWT_SECRET = config("JWT_SECRET", default="")
 JWT_ALGORITHM = config("JWT_ALGORITHM")
+# Access tokens are verified without the DB, so they are short-lived; refresh tokens renew them
+JWT_ACCESS_TOKEN_TTL = config("JWT_ACCESS_TOKEN_TTL", default=900, cast=int)
+JWT_REFRESH_TOKEN_TTL = config("JWT_REFRESH_TOKEN_TTL", default=30 * 24 * 3600, cast=int)
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+# Verified tokens can be remembered briefly so every authenticated request doesn't
+# re-verify; off unless set (e.g. 60)
+AUTH_CACHE_TTL = config("AUTH_CACHE_TTL", default=0, cast=int)
+
+_verified_tokens = TTLCache("auth", max_entries=4096, ttl_s=AUTH_CACHE_TTL)
+_signing_key = None
+
+
+def _is_hmac(algorithm: str) -> bool:
+    return algorithm.startswith("HS")
+
+
+def _get_signing_key():
+    global _signing_key
+    if _signing_key is None:
+        if _is_hmac(JWT_ALGORITHM):
+            if not JWT_SECRET:
+                raise RuntimeError(f"JWT_SECRET must be set for {JWT_ALGORITHM}")
+            _signing_key = prepare_key(JWT_ALGORITHM, JWT_SECRET)
+        else:
+            if not JWT_PRIVATE_KEY_FILE:
+                raise RuntimeError(f"JWT_PRIVATE_KEY_FILE must be set to sign {JWT_ALGORITHM} tokens")
+            with open(JWT_PRIVATE_KEY_FILE, "rb") as f:
+                _signing_key = prepare_key(JWT_ALGORITHM, f.read())
+    return _signing_key
+
+
+def _load_verification_keys():
+    if JWT_JWKS_URL:
+        return jwks_loader(JWT_JWKS_URL)()
+    if JWT_PUBLIC_KEYS_DIR:
+        return pem_dir_loader(JWT_PUBLIC_KEYS_DIR, JWT_ALGORITHM)()
+    if _is_hmac(JWT_ALGORITHM):
+        return {JWT_KEY_ID or None: prepare_key(JWT_ALGORITHM, JWT_SECRET)} if JWT_SECRET else {}
+    # a lone signing service can verify with the public half of its own key
+    return {JWT_KEY_ID or None: _get_signing_key().public_key()}
+
+
+verifier = JWTVerifier(KeyRing(_load_verification_keys), algorithms=[JWT_ALGORITHM], cache=_verified_tokens)
+
+def _encode(claims: dict, ttl_s: int) -> str:
+    now = int(time.time())
+    payload = {**claims, "iat": now, "nbf": now, "exp": now + ttl_s}
+    if JWT_ISSUER:
+        payload["iss"] = JWT_ISSUER
+    if JWT_AUDIENCE:
+        payload["aud"] = JWT_AUDIENCE
+    headers = {"kid": JWT_KEY_ID} if JWT_KEY_ID else None
+    # The jwt.encode() function already returns a string.
+    return jwt.encode(payload, _get_signing_key(), algorithm=JWT_ALGORITHM, headers=headers)
+
 
 class AuthHandler(object):
 
     @staticmethod
-    def sign_jwt(user_id: int) -> str:
-        payload = {
+    def sign_jwt(user_id: int, username: Optional[str] = None, email: Optional[str] = None) -> str:
+        """An access token; with username/email set, get_current_user needs no DB read."""
+        claims = {
             "user_id": user_id,
-            "expires": time.time() + 90000
+            "typ": ACCESS_TOKEN,
+            # read by verifiers that predate `exp`
+            "expires": int(time.time()) + JWT_ACCESS_TOKEN_TTL,
         }
-        # The jwt.encode() function already returns a string.
-        token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-        return token
+        if username is not None and email is not None:
+            claims.update(username=username, email=email)
+        return _encode(claims, JWT_ACCESS_TOKEN_TTL)
+
+    @staticmethod
+    def sign_refresh_token(user_id: int) -> str:
+        """A long-lived token whose `jti` can be revoked (see RevocationList)."""
+        return _encode({"user_id": user_id, "typ": REFRESH_TOKEN, "jti": uuid.uuid4().hex}, JWT_REFRESH_TOKEN_TTL)
 
     @staticmethod
     def decode_jwt(token: str) -> dict:
+        """An access token's claims, or None if it isn't valid (rejections are counted by reason)."""
         try:
-            decoded_token = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-            if decoded_token["expires"] >= time.time():
-                return decoded_token
+            claims = verifier.verify(token)
+        except TokenRejected:
+            return None
+        # tokens signed before `typ` existed are access tokens
+        return claims if claims.get("typ", ACCESS_TOKEN) == ACCESS_TOKEN else None
+
+    @staticmethod
+    def decode_refresh_token(token: str) -> dict:
+        """A refresh token's claims if its signature and expiry are valid; revocation is checked by the caller."""
+        try:
+            claims = verifier.verify(token)
+        except TokenRejected:
+            return None
+        if claims.get("typ") != REFRESH_TOKEN or not claims.get("jti"):
             return None
-        except Exception:
-            print("unable to decode the token")
-            return None
\ No newline at end of file
+        return claims
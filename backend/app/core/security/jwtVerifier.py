@@ -0,0 +1,207 @@
+"""
+Stateless verification of access tokens.
+
+Checks the standard exp/nbf/iat claims with JWT_LEEWAY_S of clock skew (plus
+the legacy `expires` claim of tokens signed before exp was used). Besides
+HS256 with the shared JWT_SECRET, asymmetric algorithms (RS256, ES256, EdDSA)
+verify with public keys only, so other services can check tokens without
+being able to sign them:
+
+    JWT_ALGORITHM=RS256
+    JWT_PRIVATE_KEY_FILE=./keys/2026-10.pem   # signing, auth service only
+    JWT_KEY_ID=2026-10
+    JWT_PUBLIC_KEYS_DIR=./keys/public         # <kid>.pem for every key still accepted
+    # or JWT_JWKS_URL=https://auth.example.com/.well-known/jwks.json
+
+Keys are parsed once and looked up by the token's `kid` header. A kid the
+ring doesn't know triggers a reload (at most every JWT_KEYS_RELOAD_S), which
+is how a rotated-in key is picked up without a restart. Verified claims are
+cached per token until they expire, so a repeat request costs one lookup.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import jwt
+from decouple import config
+
+from app.core import metrics
+from app.core.cache.ttlCache import TTLCache
+
+JWT_LEEWAY_S = config("JWT_LEEWAY_S", default=30, cast=int)
+JWT_KEY_ID = config("JWT_KEY_ID", default="")
+JWT_PRIVATE_KEY_FILE = config("JWT_PRIVATE_KEY_FILE", default="")
+JWT_PUBLIC_KEYS_DIR = config("JWT_PUBLIC_KEYS_DIR", default="")
+JWT_JWKS_URL = config("JWT_JWKS_URL", default="")
+JWT_KEYS_RELOAD_S = config("JWT_KEYS_RELOAD_S", default=60, cast=int)
+# Optional; when set they are written into new tokens and required on verification
+JWT_ISSUER = config("JWT_ISSUER", default="")
+JWT_AUDIENCE = config("JWT_AUDIENCE", default="")
+
+token_rejections = metrics.registry.counter(
+    "auth_token_rejections_total", "Tokens that failed verification by reason.", ("reason",)
+)
+key_load_failures = metrics.registry.counter(
+    "auth_key_load_failures_total", "Failed loads of the JWT verification keys."
+)
+
+Keys = Dict[Optional[str], Any]
+
+
+def prepare_key(algorithm: str, key) -> Any:
+    """Parses a secret or PEM once into what PyJWT verifies with."""
+    return jwt.get_algorithm_by_name(algorithm).prepare_key(key)
+
+
+def pem_dir_loader(path: str, algorithm: str) -> Callable[[], Keys]:
+    """Every <kid>.pem in `path`, parsed for `algorithm`."""
+    def load() -> Keys:
+        keys = {}
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".pem"):
+                with open(os.path.join(path, name), "rb") as f:
+                    keys[name[:-len(".pem")]] = prepare_key(algorithm, f.read())
+        return keys
+    return load
+
+
+def jwks_loader(url: str, timeout_s: float = 5.0) -> Callable[[], Keys]:
+    """The keys of a JWKS document, by kid."""
+    def load() -> Keys:
+        with urllib.request.urlopen(url, timeout=timeout_s) as response:
+            jwks = jwt.PyJWKSet.from_dict(json.load(response))
+        return {key.key_id: key.key for key in jwks.keys}
+    return load
+
+
+class KeyRing:
+    """Verification keys by kid; None is the key of tokens without a kid header."""
+
+    def __init__(self, loader: Callable[[], Keys], reload_interval_s: float = JWT_KEYS_RELOAD_S):
+        self._loader = loader
+        self._reload_interval_s = reload_interval_s
+        self._keys: Optional[Keys] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        # set while the key source is failing; cleared by the next successful load
+        self.last_error: Optional[str] = None
+
+    def _reload(self, force: bool) -> None:
+        with self._lock:
+            if not force and time.monotonic() - self._loaded_at < self._reload_interval_s:
+                return
+            self._loaded_at = time.monotonic()
+            try:
+                self._keys = dict(self._loader())
+                self.last_error = None
+            except Exception as e:
+                # keep verifying with the keys we have; the failure shows in
+                # auth_key_load_failures_total and auth_verification_keys
+                self.last_error = f"{type(e).__name__}: {e}"
+                key_load_failures.inc()
+                print(f"ERROR unable to load JWT verification keys ({len(self._keys or {})} kept): {e}", file=sys.stderr)
+                if self._keys is None:
+                    self._keys = {}
+
+    def get(self, kid: Optional[str]) -> Optional[Any]:
+        if self._keys is None:
+            self._reload(force=True)
+        key = self._lookup(kid)
+        if key is None and kid is not None:
+            self._reload(force=False)
+            key = self._lookup(kid)
+        return key
+
+    def _lookup(self, kid: Optional[str]) -> Optional[Any]:
+        keys = self._keys
+        if kid in keys:
+            return keys[kid]
+        if None in keys:
+            return keys[None]
+        if kid is None and len(keys) == 1:
+            return next(iter(keys.values()))
+        return None
+
+    def __len__(self) -> int:
+        return len(self._keys or {})
+
+
+class TokenRejected(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class JWTVerifier:
+    def __init__(
+        self,
+        keys: KeyRing,
+        algorithms: Sequence[str],
+        leeway_s: float = JWT_LEEWAY_S,
+        cache: Optional[TTLCache] = None,
+        issuer: str = JWT_ISSUER,
+        audience: str = JWT_AUDIENCE,
+    ):
+        self.keys = keys
+        self.algorithms = list(algorithms)
+        self.leeway_s = leeway_s
+        self.issuer = issuer or None
+        self.audience = audience or None
+        self._cache = cache
+
+    def verify(self, token: str) -> Dict:
+        """The token's claims; raises TokenRejected (with a reason) if it isn't valid now."""
+        if self._cache is not None:
+            cached = self._cache.get(token)
+            if cached is not None:
+                return dict(cached)
+        try:
+            claims = self._decode(token)
+        except TokenRejected as rejected:
+            token_rejections.inc(reason=rejected.reason)
+            raise
+        if self._cache is not None:
+            self._cache.set(token, dict(claims), expires_at=self._expires_at(claims) + self.leeway_s)
+        return claims
+
+    def _decode(self, token: str) -> Dict:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError:
+            raise TokenRejected("malformed")
+        # never let the token pick its own algorithm (e.g. "none", or HS256 keyed with a public key)
+        if header.get("alg") not in self.algorithms:
+            raise TokenRejected("algorithm")
+        key = self.keys.get(header.get("kid"))
+        if key is None:
+            raise TokenRejected("unknown_key")
+        try:
+            claims = jwt.decode(
+                token, key, algorithms=self.algorithms, leeway=self.leeway_s,
+                issuer=self.issuer, audience=self.audience,
+                options={"require": ["iss"] if self.issuer else []},
+            )
+        except jwt.ExpiredSignatureError:
+            raise TokenRejected("expired")
+        except jwt.ImmatureSignatureError:
+            raise TokenRejected("not_yet_valid")
+        except jwt.InvalidSignatureError:
+            raise TokenRejected("signature")
+        except jwt.InvalidTokenError:
+            raise TokenRejected("invalid")
+        expires_at = self._expires_at(claims)
+        if expires_at is None:
+            raise TokenRejected("no_expiry")
+        # PyJWT has already checked exp; the legacy claim is checked here
+        if "exp" not in claims and expires_at + self.leeway_s < time.time():
+            raise TokenRejected("expired")
+        return claims
+
+    @staticmethod
+    def _expires_at(claims: Dict) -> Optional[float]:
+        expires_at = claims.get("exp", claims.get("expires"))
+        return float(expires_at) if isinstance(expires_at, (int, float)) else None
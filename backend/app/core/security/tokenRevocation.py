@@ -0,0 +1,80 @@
+"""
+In-memory view of the revoked_tokens table, so checking a refresh token
+doesn't query the database.
+
+Revocations only live until the token would have expired anyway, so the set
+stays small: it is loaded from the table on first use and then kept current
+by every revoke() in this process. With shared state (SHARED_STATE_URL),
+revocations made by other workers are seen through a per-token key.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from app.core.sharedState import SharedState, shared_state
+from app.db.repository.tokenRepo import TokenRepository
+
+# How often expired entries are dropped from memory
+PRUNE_INTERVAL_S = 300
+
+
+def _default_loader() -> Iterable[Tuple[str, int]]:
+    from app.core.database import SessionLocal
+    with SessionLocal() as db:
+        repo = TokenRepository(session=db)
+        repo.purge_expired()
+        return repo.active_revocations()
+
+
+class RevocationList:
+    def __init__(
+        self,
+        loader: Callable[[], Iterable[Tuple[str, int]]] = _default_loader,
+        state: Optional[SharedState] = None,
+    ):
+        self._loader = loader
+        self._state = state
+        self._revoked: Optional[Dict[str, int]] = None
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _entries(self, repo: Optional[TokenRepository]) -> Dict[str, int]:
+        if self._revoked is None:
+            with self._lock:
+                if self._revoked is None:
+                    self._revoked = dict(repo.active_revocations() if repo is not None else self._loader())
+        return self._revoked
+
+    def add(self, jti: str, expires_at: int, repo: Optional[TokenRepository] = None) -> None:
+        """
+        Call after the revocation is committed to the table. `repo` (the caller's
+        session) is used for the initial load instead of opening a new session.
+        """
+        entries = self._entries(repo)
+        with self._lock:
+            entries[jti] = int(expires_at)
+            if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL_S:
+                self._prune()
+        if self._state is not None:
+            self._state.set(f"revoked:{jti}", "1", ttl_s=max(1, int(expires_at - time.time())))
+
+    def is_revoked(self, jti: str, repo: Optional[TokenRepository] = None) -> bool:
+        if jti in self._entries(repo):
+            return True
+        return self._state is not None and self._state.get(f"revoked:{jti}") is not None
+
+    def _prune(self) -> None:
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp >= now}
+        self._pruned_at = time.monotonic()
+
+    def reset(self) -> None:
+        """Forgets the loaded set so the next check reloads it from the table."""
+        with self._lock:
+            self._revoked = None
+
+    def __len__(self) -> int:
+        return len(self._revoked or {})
+
+
+revocations = RevocationList(state=shared_state if shared_state.shared else None)
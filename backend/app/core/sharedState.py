@@ -0,0 +1,317 @@
+"""
+State that must agree across worker processes (uvicorn --workers N, gunicorn):
+admission counters and cache versions.
+
+    SHARED_STATE_URL=memory://                  single process (default)
+    SHARED_STATE_URL=sqlite:///./shared.sqlite3 workers on one host
+    SHARED_STATE_URL=redis://localhost:6379/0   any number of hosts (needs `redis`)
+
+Values are strings, counters are integers, and every key may carry a TTL.
+Lease sets hold members that each expire on their own unless their owner
+refreshes them, so what a crashed worker held ages out while the others
+keep going.
+
+Not covered, so with several workers each still acts per process:
+  - the scheduler's SCHED_SLOTS: upstream concurrency is workers x SCHED_SLOTS,
+    so divide the backend's capacity by the worker count;
+  - the semantic cache and the history index: they open an embedded Chroma
+    PersistentClient, which must not be shared by several processes; keep
+    SEMANTIC_CACHE_ENABLED and HISTORY_INDEX_ENABLED off with --workers N.
+"""
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from decouple import config
+
+SHARED_STATE_URL = config("SHARED_STATE_URL", default="memory://")
+SHARED_STATE_PREFIX = config("SHARED_STATE_PREFIX", default="chatapp:")
+
+
+class SharedState:
+    """Backend interface. `shared` is False when other processes can't see the state."""
+
+    shared = True
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl_s: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl_s: Optional[float] = None) -> int:
+        """Atomically adds `amount` (which may be negative) and returns the new value."""
+        raise NotImplementedError
+
+    def lease_acquire(self, key: str, member: str, ttl_s: float, limit: int) -> bool:
+        """Adds `member` to the lease set `key`, expiring in ttl_s, unless `limit` live members are in it."""
+        raise NotImplementedError
+
+    def lease_refresh(self, key: str, members: Iterable[str], ttl_s: float) -> None:
+        """Pushes back the expiry of those `members` still in the set; never re-adds one."""
+        raise NotImplementedError
+
+    def lease_release(self, key: str, member: str) -> None:
+        raise NotImplementedError
+
+    def lease_count(self, key: str) -> int:
+        """Live members of the lease set."""
+        raise NotImplementedError
+
+
+class MemoryState(SharedState):
+    shared = False
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._leases: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[str]:
+        item = self._values.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] < time.time():
+            del self._values[key]
+            return None
+        return item[0]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key: str, value: str, ttl_s: Optional[float] = None) -> None:
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl_s if ttl_s else None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl_s: Optional[float] = None) -> int:
+        with self._lock:
+            value = int(self._live(key) or 0) + amount
+            expires_at = time.time() + ttl_s if ttl_s else (self._values.get(key, (None, None))[1])
+            self._values[key] = (str(value), expires_at)
+            return value
+
+    def _live_leases(self, key: str) -> Dict[str, float]:
+        now = time.time()
+        members = {m: exp for m, exp in self._leases.get(key, {}).items() if exp >= now}
+        self._leases[key] = members
+        return members
+
+    def lease_acquire(self, key: str, member: str, ttl_s: float, limit: int) -> bool:
+        with self._lock:
+            members = self._live_leases(key)
+            if member not in members and len(members) >= limit:
+                return False
+            members[member] = time.time() + ttl_s
+            return True
+
+    def lease_refresh(self, key: str, members: Iterable[str], ttl_s: float) -> None:
+        with self._lock:
+            live = self._live_leases(key)
+            for member in members:
+                if member in live:
+                    live[member] = time.time() + ttl_s
+
+    def lease_release(self, key: str, member: str) -> None:
+        with self._lock:
+            self._leases.get(key, {}).pop(member, None)
+
+    def lease_count(self, key: str) -> int:
+        with self._lock:
+            return len(self._live_leases(key))
+
+
+class SqliteState(SharedState):
+    """One WAL-mode file shared by the workers of a host; increments run in IMMEDIATE transactions."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_state ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_leases ("
+            "key TEXT NOT NULL, member TEXT NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (key, member))"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at >= ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl_s: Optional[float] = None) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl_s if ttl_s else None),
+        )
+
+    def delete(self, key: str) -> None:
+        self._connect().execute("DELETE FROM shared_state WHERE key = ?", (key,))
+
+    def incr(self, key: str, amount: int = 1, ttl_s: Optional[float] = None) -> int:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM shared_state WHERE key = ?", (key,)
+            ).fetchone()
+            live = row is not None and (row[1] is None or row[1] >= now)
+            value = (int(row[0]) if live else 0) + amount
+            expires_at = now + ttl_s if ttl_s else (row[1] if live else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, str(value), expires_at),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def lease_acquire(self, key: str, member: str, ttl_s: float, limit: int) -> bool:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM shared_leases WHERE key = ? AND expires_at < ?", (key, now))
+            held = conn.execute(
+                "SELECT COUNT(*) FROM shared_leases WHERE key = ? AND member != ?", (key, member)
+            ).fetchone()[0]
+            admitted = held < limit
+            if admitted:
+                conn.execute(
+                    "INSERT OR REPLACE INTO shared_leases (key, member, expires_at) VALUES (?, ?, ?)",
+                    (key, member, now + ttl_s),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return admitted
+
+    def lease_refresh(self, key: str, members: Iterable[str], ttl_s: float) -> None:
+        now = time.time()
+        self._connect().executemany(
+            "UPDATE shared_leases SET expires_at = ? WHERE key = ? AND member = ? AND expires_at >= ?",
+            [(now + ttl_s, key, member, now) for member in members],
+        )
+
+    def lease_release(self, key: str, member: str) -> None:
+        self._connect().execute("DELETE FROM shared_leases WHERE key = ? AND member = ?", (key, member))
+
+    def lease_count(self, key: str) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM shared_leases WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()[0]
+
+
+class RedisState(SharedState):
+    """
+    Any client speaking the redis-py API (get/set/delete/incrby/expire and the
+    sorted-set calls), so a Redis-compatible server (Redis, Valkey, KeyDB,
+    Dragonfly) or a fake in tests.
+
+    A lease set is a sorted set scored by expiry. Acquiring adds first and backs
+    out if that went over the limit, so two racing for the last place may both
+    be refused, but the limit is never exceeded.
+    """
+
+    def __init__(self, client, prefix: str = SHARED_STATE_PREFIX):
+        self._client = client
+        self._prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(self._prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl_s: Optional[float] = None) -> None:
+        self._client.set(self._prefix + key, value, ex=max(1, int(ttl_s)) if ttl_s else None)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self._prefix + key)
+
+    def incr(self, key: str, amount: int = 1, ttl_s: Optional[float] = None) -> int:
+        value = self._client.incrby(self._prefix + key, amount)
+        if ttl_s:
+            self._client.expire(self._prefix + key, max(1, int(ttl_s)))
+        return int(value)
+
+    def lease_acquire(self, key: str, member: str, ttl_s: float, limit: int) -> bool:
+        name = self._prefix + key
+        now = time.time()
+        self._client.zremrangebyscore(name, "-inf", now)
+        self._client.zadd(name, {member: now + ttl_s})
+        if self._client.zcard(name) > limit:
+            self._client.zrem(name, member)
+            return False
+        # the set itself goes once every member has expired
+        self._client.expire(name, max(1, int(ttl_s) + 1))
+        return True
+
+    def lease_refresh(self, key: str, members: Iterable[str], ttl_s: float) -> None:
+        name = self._prefix + key
+        deadline = time.time() + ttl_s
+        mapping = {member: deadline for member in members}
+        if mapping:
+            # drop the expired first, so a member that already aged out isn't revived
+            self._client.zremrangebyscore(name, "-inf", time.time())
+            self._client.zadd(name, mapping, xx=True)
+            self._client.expire(name, max(1, int(ttl_s) + 1))
+
+    def lease_release(self, key: str, member: str) -> None:
+        self._client.zrem(self._prefix + key, member)
+
+    def lease_count(self, key: str) -> int:
+        return int(self._client.zcount(self._prefix + key, time.time(), "+inf"))
+
+
+def _redis_client(url: str):
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError("SHARED_STATE_URL is a redis:// URL but the `redis` package is not installed")
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def create_state(url: str = SHARED_STATE_URL, redis_factory: Callable = _redis_client) -> SharedState:
+    if url.startswith("memory:"):
+        return MemoryState()
+    if url.startswith("sqlite:///"):
+        return SqliteState(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState(redis_factory(url))
+    raise ValueError(f"unsupported SHARED_STATE_URL: {url}")
+
+
+shared_state = create_state()
+
+
+def cache_version(name: str, state: Optional[SharedState] = None) -> int:
+    """Current version of a cache namespace; bump it to invalidate that cache in every worker."""
+    return int((state or shared_state).get(f"version:{name}") or 0)
+
+
+def bump_cache_version(name: str, state: Optional[SharedState] = None) -> int:
+    return (state or shared_state).incr(f"version:{name}")
@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, List, Optional
+
+from decouple import config
+
+# none | jsonl | otel
+TRACING_EXPORTER = config("TRACING_EXPORTER", default="none")
+TRACING_FILE = config("TRACING_FILE", default="./traces.jsonl")
+
+
+def _hex_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    """
+    A finished span is exported as an OTLP-shaped dict: trace_id (32 hex),
+    span_id / parent_span_id (16 hex), unix-nano timestamps, attributes, events, status.
+    """
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"] = None, attributes: Optional[Dict] = None):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else _hex_id(16)
+        self.span_id = _hex_id(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict] = []
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        self.end_ns: Optional[int] = None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start_perf) * 1000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append({"name": name, "time_unix_nano": time.time_ns(), "attributes": attributes})
+
+    def record_exception(self, error: BaseException) -> None:
+        self.status = "ERROR"
+        self.add_event("exception", type=type(error).__name__, message=str(error))
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self._tracer._export(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": self.status,
+        }
+
+
+class _NoopSpan:
+    name = ""
+    attributes: Dict[str, Any] = {}
+
+    def elapsed_ms(self) -> float:
+        return 0.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def record_exception(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonLinesExporter:
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+
+class OtelExporter:
+    """Mirrors spans into the OpenTelemetry API (whatever SDK the process configured)."""
+
+    def __init__(self):
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer("chatgpt-clone.backend")
+
+    def on_start(self, span: Span, parent: Optional[Span]) -> None:
+        parent_otel = getattr(parent, "_otel", None)
+        ctx = self._trace.set_span_in_context(parent_otel) if parent_otel is not None else None
+        span._otel = self._tracer.start_span(span.name, context=ctx, start_time=span.start_ns)
+
+    def export(self, span: Span) -> None:
+        otel_span = span._otel
+        for key, value in span.attributes.items():
+            if isinstance(value, (str, bool, int, float)):
+                otel_span.set_attribute(key, value)
+        for event in span.events:
+            otel_span.add_event(event["name"], attributes=event["attributes"], timestamp=event["time_unix_nano"])
+        if span.status == "ERROR":
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        otel_span.end(end_time=span.end_ns)
+
+
+class Tracer:
+    """
+    Minimal span API. With no exporter every call returns a shared no-op span, so
+    instrumented code pays almost nothing when tracing is off.
+    Parents are passed explicitly: streamed responses hop threads between chunks,
+    so ambient context would not survive.
+    """
+
+    def __init__(self, exporter=None):
+        self._exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self._exporter is not None
+
+    def start_span(self, name: str, parent=None, **attributes: Any):
+        if self._exporter is None:
+            return NOOP_SPAN
+        parent = parent if isinstance(parent, Span) else None
+        span = Span(self, name, parent=parent, attributes=attributes)
+        on_start = getattr(self._exporter, "on_start", None)
+        if on_start is not None:
+            on_start(span, parent)
+        return span
+
+    @contextmanager
+    def span(self, name: str, parent=None, **attributes: Any) -> Generator:
+        span = self.start_span(name, parent=parent, **attributes)
+        try:
+            yield span
+        except GeneratorExit:
+            # client went away mid-stream; not an error of the traced operation
+            span.set_attribute("cancelled", True)
+            raise
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end()
+
+    def _export(self, span: Span) -> None:
+        try:
+            self._exporter.export(span)
+        except Exception as e:
+            print(f"trace export failed: {e}")
+
+
+def build_tracer(exporter_name: str = TRACING_EXPORTER, path: str = TRACING_FILE) -> Tracer:
+    if exporter_name == "jsonl":
+        return Tracer(JsonLinesExporter(path))
+    if exporter_name == "otel":
+        try:
+            return Tracer(OtelExporter())
+        except ImportError:
+            print("TRACING_EXPORTER=otel but opentelemetry is not installed; tracing disabled")
+    return Tracer()
+
+
+tracer = build_tracer()
@@ -1,5 +1,5 @@
 from app.core.database import Base
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 
@@ -13,8 +13,17 @@ class ChatSession(Base):
 
     create_date = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
+    # Maintained by MessageRepository in the same transaction as message writes
+    # (see app/util/sessionCounters.py for backfill / consistency checks)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+
     messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_chat_sessions_user_last_message", "user_id", "last_message_at"),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -26,4 +35,9 @@ class Message(Base):
     
     create_date = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
-    session = relationship("ChatSession", back_populates="messages")
\ No newline at end of file
+    session = relationship("ChatSession", back_populates="messages")
+
+    __table_args__ = (
+        # history windows and last-message lookups per session
+        Index("ix_messages_session_created", "session_id", "create_date"),
+    )
\ No newline at end of file
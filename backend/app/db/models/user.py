@@ -1,5 +1,5 @@
 from app.core.database import Base
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
 from datetime import datetime, timezone
 
 
@@ -9,4 +9,15 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), nullable=False)
     email = Column(String(75), nullable=False, unique=True)
-    password = Column(String(250), nullable=False)
\ No newline at end of file
+    password = Column(String(250), nullable=False)
+
+
+class RevokedToken(Base):
+    """Refresh tokens that were used (rotated) or logged out, kept until they would have expired."""
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # The token's exp (epoch seconds); rows past it can be purged
+    expires_at = Column(Integer, nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
\ No newline at end of file
@@ -1,14 +1,31 @@
 from __future__ import annotations
-from typing import List, Optional
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from sqlalchemy import func, desc, asc
+from sqlalchemy import func, desc, asc, select, insert, update, case, and_, or_, true
+from sqlalchemy.engine import Row
 
 from .base import BaseRepository
 from app.db.models.chat import ChatSession, Message
 from app.db.schema.chat import ChatSessionInCreate, MessageInCreate
+from app.core.cache.sessionWindowCache import session_window_cache
+from app.core.cache.sessionOwnerCache import session_owners
 
 DEFAULT_SESSION_NAME = "New Chat"
 SNIPPET_LEN = 10
+PREVIEW_LEN = 120
+# Rows per multi-row INSERT in bulk imports (well under SQLite's bound-parameter limit)
+BULK_INSERT_CHUNK = 500
+
+
+class SessionNotFound(ValueError):
+    """The session a write targets is gone (e.g. deleted by another request since it was checked)."""
+
+    def __init__(self, session_id: int):
+        super().__init__(f"ChatSession {session_id} not found")
+        self.session_id = session_id
 
 
 class ChatSessionRepository(BaseRepository):
@@ -17,14 +34,21 @@ class ChatSessionRepository(BaseRepository):
         self.session.add(new_session)
         self.session.commit()
         self.session.refresh(new_session)
+        session_owners.set(new_session.id, new_session.user_id)
         return new_session
 
-    def get_session_by_id(self, session_id: int) -> Optional[ChatSession]:
-        return (
-            self.session.query(ChatSession)
-            .filter(ChatSession.id == session_id)
-            .first()
-        )
+    def _by_id(self, session_id: int, user_id: Optional[int]):
+        """Session lookup with the ownership check folded in (user_id=None: no check)."""
+        q = self.session.query(ChatSession).filter(ChatSession.id == session_id)
+        if user_id is not None:
+            q = q.filter(ChatSession.user_id == user_id)
+        return q
+
+    def get_session_by_id(self, session_id: int, user_id: Optional[int] = None) -> Optional[ChatSession]:
+        sess = self._by_id(session_id, user_id).first()
+        if sess is not None:
+            session_owners.set(sess.id, sess.user_id)
+        return sess
 
     def list_sessions_by_user(
         self, user_id: int, limit: int = 20, offset: int = 0, newest_first: bool = True
@@ -33,12 +57,8 @@ class ChatSessionRepository(BaseRepository):
         q = q.order_by(desc(ChatSession.create_date) if newest_first else asc(ChatSession.create_date))
         return q.offset(offset).limit(limit).all()
 
-    def rename_session(self, session_id: int, new_name: str) -> Optional[ChatSession]:
-        session_obj = (
-            self.session.query(ChatSession)
-            .filter(ChatSession.id == session_id)
-            .first()
-        )
+    def rename_session(self, session_id: int, new_name: str, user_id: Optional[int] = None) -> Optional[ChatSession]:
+        session_obj = self._by_id(session_id, user_id).first()
         if not session_obj:
             return None
         session_obj.name = new_name
@@ -46,67 +66,305 @@ class ChatSessionRepository(BaseRepository):
         self.session.refresh(session_obj)
         return session_obj
 
-    def delete_session(self, session_id: int) -> bool:
-        session_obj = (
-            self.session.query(ChatSession)
-            .filter(ChatSession.id == session_id)
-            .first()
-        )
+    def delete_session(self, session_id: int, user_id: Optional[int] = None) -> bool:
+        session_obj = self._by_id(session_id, user_id).first()
         if not session_obj:
             return False
         self.session.delete(session_obj)
         self.session.commit()
+        session_window_cache.invalidate(session_id)
+        session_owners.invalidate(session_id)
         return True
 
-    def session_exists(self, session_id: int) -> bool:
-        return (
-            self.session.query(ChatSession.id)
-            .filter(ChatSession.id == session_id)
-            .first()
-            is not None
+    def list_session_summaries(
+        self, user_id: int, limit: int = 20, before: Optional[Tuple[datetime, int]] = None
+    ) -> List[Row]:
+        """
+        One query for the sidebar: each session with its message count and a preview of
+        its last message. Sessions without messages come first (just created), then by
+        last_message_at descending, which walks ix_chat_sessions_user_last_message.
+        `before` is the (last_message_at, id) of the previous page's last row (keyset
+        pagination); its timestamp is None while still inside the empty sessions.
+
+        The page is picked from chat_sessions alone (the count is the denormalized
+        column), then each row's last message is joined in: LATERAL ... LIMIT 1 on
+        Postgres, one correlated lookup of its id elsewhere (SQLite has no LATERAL).
+        Both are one ix_messages_session_created probe per row of the page.
+        """
+        page = select(
+            ChatSession.id,
+            ChatSession.user_id,
+            ChatSession.name,
+            ChatSession.create_date,
+            ChatSession.last_message_at,
+            ChatSession.message_count,
+        ).where(ChatSession.user_id == user_id)
+
+        if before is not None:
+            before_ts, before_id = before
+            if before_ts is None:
+                page = page.where(or_(
+                    and_(ChatSession.last_message_at.is_(None), ChatSession.id < before_id),
+                    ChatSession.last_message_at.is_not(None),
+                ))
+            else:
+                page = page.where(or_(
+                    ChatSession.last_message_at < before_ts,
+                    and_(ChatSession.last_message_at == before_ts, ChatSession.id < before_id),
+                ))
+        newest_first = (desc(ChatSession.last_message_at).nulls_first(), desc(ChatSession.id))
+        page = page.order_by(*newest_first).limit(limit).subquery("page")
+
+        newest_message = (desc(Message.create_date), desc(Message.id))
+        if self.session.get_bind().dialect.name == "postgresql":
+            last = (
+                select(Message.role, func.substr(Message.content, 1, PREVIEW_LEN).label("preview"))
+                .where(Message.session_id == page.c.id)
+                .order_by(*newest_message)
+                .limit(1)
+                .lateral("last_message")
+            )
+            joined = page.outerjoin(last, true())
+            role, preview = last.c.role, last.c.preview
+        else:
+            last_id = (
+                select(Message.id)
+                .where(Message.session_id == page.c.id)
+                .order_by(*newest_message)
+                .limit(1)
+                .correlate(page)
+                .scalar_subquery()
+            )
+            joined = page.outerjoin(Message, Message.id == last_id)
+            role, preview = Message.role, func.substr(Message.content, 1, PREVIEW_LEN)
+
+        q = (
+            select(
+                page.c.id,
+                page.c.user_id,
+                page.c.name,
+                page.c.create_date,
+                func.coalesce(page.c.last_message_at, page.c.create_date).label("last_activity"),
+                page.c.last_message_at,
+                page.c.message_count,
+                role.label("last_message_role"),
+                preview.label("last_message_preview"),
+            )
+            .select_from(joined)
+            .order_by(desc(page.c.last_message_at).nulls_first(), desc(page.c.id))
         )
+        return list(self.session.execute(q).all())
+
+    def iter_user_messages(self, user_id: int, batch_size: int = 500) -> Iterator[Row]:
+        """
+        Every message of every session a user owns, grouped by session and oldest first,
+        as one streamed query. Sessions without messages come through once with
+        message_id None.
+        """
+        stmt = (
+            select(
+                ChatSession.id.label("session_id"),
+                ChatSession.name,
+                ChatSession.create_date.label("session_create_date"),
+                ChatSession.message_count,
+                Message.id.label("message_id"),
+                Message.role,
+                Message.content,
+                Message.create_date,
+            )
+            .outerjoin(Message, Message.session_id == ChatSession.id)
+            .where(ChatSession.user_id == user_id)
+            .order_by(asc(ChatSession.id), asc(Message.create_date), asc(Message.id))
+            .execution_options(yield_per=batch_size)
+        )
+        return iter(self.session.execute(stmt))
+
+    def session_exists(self, session_id: int, user_id: Optional[int] = None) -> bool:
+        """
+        With user_id, whether that user owns the session; answered from the owner
+        cache when possible, else by the same one-row lookup.
+        """
+        if user_id is not None:
+            owner = session_owners.get(session_id)
+            if owner is not None:
+                return owner == user_id
+        version = session_owners.version(session_id)
+        owner = self.session.execute(
+            select(ChatSession.user_id).where(ChatSession.id == session_id)
+        ).scalar_one_or_none()
+        if owner is None:
+            return False
+        session_owners.set(session_id, owner, version=version)
+        return user_id is None or owner == user_id
+
+    def untitled_first_messages(self, session_ids) -> Dict[int, str]:
+        """{id: first message content} for those of `session_ids` still carrying the default name."""
+        if not session_ids:
+            return {}
+        first_message = (
+            select(Message.content)
+            .where(Message.session_id == ChatSession.id)
+            .order_by(asc(Message.create_date), asc(Message.id))
+            .limit(1)
+            .correlate(ChatSession)
+            .scalar_subquery()
+        )
+        rows = self.session.execute(
+            select(ChatSession.id, first_message.label("content"))
+            .where(ChatSession.id.in_(set(session_ids)), ChatSession.name.in_((DEFAULT_SESSION_NAME, "")))
+        )
+        return {row.id: row.content for row in rows if row.content and row.content.strip()}
+
+    def set_default_titles(self, titles: Dict[int, str]) -> int:
+        """
+        Names sessions in one commit, skipping any renamed since they were read.
+        Returns how many were renamed.
+        """
+        renamed = 0
+        for session_id, title in titles.items():
+            result = self.session.execute(
+                update(ChatSession)
+                .where(ChatSession.id == session_id, ChatSession.name.in_((DEFAULT_SESSION_NAME, "")))
+                .values(name=title[:100]),
+                execution_options={"synchronize_session": False},
+            )
+            renamed += result.rowcount
+        self.session.commit()
+        return renamed
+
+    def get_session_names(self, user_id: int, session_ids) -> Dict[int, str]:
+        """{id: name} for those of `session_ids` that exist and belong to the user."""
+        if not session_ids:
+            return {}
+        rows = self.session.execute(
+            select(ChatSession.id, ChatSession.name)
+            .where(ChatSession.user_id == user_id, ChatSession.id.in_(set(session_ids)))
+        )
+        return {row.id: row.name for row in rows}
+
+    def get_message_counters(self, session_id: int) -> Optional[Row]:
+        """(message_count, last_message_at) of a session, or None if it doesn't exist."""
+        return self.session.execute(
+            select(ChatSession.message_count, ChatSession.last_message_at)
+            .where(ChatSession.id == session_id)
+        ).first()
 
     def count_messages(self, session_id: int) -> int:
         return (
-            self.session.query(func.count(Message.id))
-            .filter(Message.session_id == session_id)
+            self.session.query(ChatSession.message_count)
+            .filter(ChatSession.id == session_id)
             .scalar()
             or 0
         )
 
 
 class MessageRepository(BaseRepository):
-    def create_message(self, data: MessageInCreate) -> Message:
+    def create_message(self, data: MessageInCreate, auto_title: bool = True) -> Message:
+        """
+        Inserts a message and bumps the session counters in one commit. With
+        auto_title, the first message of an unnamed session also names it; callers
+        that defer titling to a background job pass False (see app/service/titleGenerator.py).
+        """
         session_obj = (
             self.session.query(ChatSession)
             .filter(ChatSession.id == data.session_id)
             .first()
         )
         if not session_obj:
-            raise ValueError(f"ChatSession {data.session_id} not found")
-
-        existing_count = (
-            self.session.query(func.count(Message.id))
-            .filter(Message.session_id == data.session_id)
-            .scalar()
-            or 0
-        )
+            session_owners.invalidate(data.session_id)
+            raise SessionNotFound(data.session_id)
 
+        existing_count = session_obj.message_count or 0
         new_msg = Message(**data.model_dump(exclude_none=True))
+        new_msg.create_date = new_msg.create_date or datetime.now(timezone.utc)
         self.session.add(new_msg)
-        self.session.commit()
-        self.session.refresh(new_msg)
+
+        # Counters go out in the same transaction; the increment is done in SQL so
+        # concurrent inserts into one session don't lose updates
+        session_obj.message_count = ChatSession.message_count + 1
+        session_obj.last_message_at = new_msg.create_date
 
         # Auto-title from first message
-        if existing_count == 0 and (not session_obj.name or session_obj.name == DEFAULT_SESSION_NAME):
+        if auto_title and existing_count == 0 and (not session_obj.name or session_obj.name == DEFAULT_SESSION_NAME):
             snippet = (new_msg.content or "").strip()[:SNIPPET_LEN]
             if snippet:
                 session_obj.name = snippet
-                self.session.commit()
-                self.session.refresh(session_obj)
 
+        self.session.commit()
+        self.session.refresh(new_msg)
+        session_window_cache.append(new_msg.session_id, new_msg)
         return new_msg
 
+    def bulk_create_messages(self, session_id: int, items: List[Dict]) -> int:
+        """
+        Inserts many messages in one transaction: COPY on Postgres (psycopg2), chunked
+        multi-row INSERTs elsewhere. No per-row count/refresh and no auto-title.
+        Items without create_date get now() plus one microsecond per position, keeping
+        their order. Returns the number of rows inserted.
+        """
+        if not items:
+            return 0
+        exists = (
+            self.session.query(ChatSession.id)
+            .filter(ChatSession.id == session_id)
+            .first()
+        )
+        if not exists:
+            session_owners.invalidate(session_id)
+            raise SessionNotFound(session_id)
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for i, item in enumerate(items):
+            created = item.get("create_date") or now + timedelta(microseconds=i)
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=timezone.utc)  # naive timestamps are taken as UTC
+            rows.append({
+                "session_id": session_id,
+                "role": item["role"],
+                "content": item["content"],
+                "create_date": created,
+            })
+        if not self._copy_messages(rows):
+            for lo in range(0, len(rows), BULK_INSERT_CHUNK):
+                self.session.execute(insert(Message).values(rows[lo:lo + BULK_INSERT_CHUNK]))
+
+        newest = max(row["create_date"] for row in rows)
+        self.session.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_id)
+            .values(
+                message_count=ChatSession.message_count + len(rows),
+                last_message_at=case(
+                    (ChatSession.last_message_at.is_(None), newest),
+                    (ChatSession.last_message_at < newest, newest),
+                    else_=ChatSession.last_message_at,
+                ),
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        self.session.commit()
+        session_window_cache.invalidate(session_id)
+        return len(rows)
+
+    def _copy_messages(self, rows: List[Dict]) -> bool:
+        """COPY ... FROM STDIN on the session's own connection (same transaction)."""
+        connection = self.session.connection()
+        if connection.dialect.name != "postgresql":
+            return False
+        cursor = connection.connection.dbapi_connection.cursor()
+        if not hasattr(cursor, "copy_expert"):
+            return False
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow([row["session_id"], row["role"], row["content"], row["create_date"].isoformat()])
+        buf.seek(0)
+        cursor.copy_expert(
+            "COPY messages (session_id, role, content, create_date) FROM STDIN WITH (FORMAT csv)", buf
+        )
+        return True
+
     def get_message_by_id(self, message_id: int) -> Optional[Message]:
         return (
             self.session.query(Message)
@@ -125,6 +383,20 @@ class MessageRepository(BaseRepository):
         q = q.order_by(asc(Message.create_date) if ascending else desc(Message.create_date))
         return q.offset(offset).limit(limit).all()
 
+    def iter_messages_by_session(self, session_id: int, batch_size: int = 500) -> Iterator[Row]:
+        """
+        Streams (id, role, content, create_date) rows oldest first. yield_per keeps a
+        server-side cursor open on Postgres and plain rows skip the identity map,
+        so memory stays flat whatever the session size.
+        """
+        stmt = (
+            select(Message.id, Message.role, Message.content, Message.create_date)
+            .where(Message.session_id == session_id)
+            .order_by(asc(Message.create_date), asc(Message.id))
+            .execution_options(yield_per=batch_size)
+        )
+        return iter(self.session.execute(stmt))
+
     def get_last_message(self, session_id: int) -> Optional[Message]:
         return (
             self.session.query(Message)
@@ -137,16 +409,36 @@ class MessageRepository(BaseRepository):
         msg = self.session.query(Message).filter(Message.id == message_id).first()
         if not msg:
             return False
+        session_id = msg.session_id
         self.session.delete(msg)
+        self.session.flush()
+        # Counters in the same transaction; last_message_at is re-derived after the delete
+        self.session.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_id)
+            .values(
+                message_count=ChatSession.message_count - 1,
+                last_message_at=(
+                    select(func.max(Message.create_date))
+                    .where(Message.session_id == session_id)
+                    .scalar_subquery()
+                ),
+            ),
+            execution_options={"synchronize_session": False},
+        )
         self.session.commit()
+        session_window_cache.invalidate(session_id)
         return True
 
-    def update_message(self, message_id: int, *, role: Optional[str] = None, content: Optional[str] = None) -> Optional[Message]:
-        msg = (
-            self.session.query(Message)
-            .filter(Message.id == message_id)
-            .first()
-        )
+    def update_message(
+        self, message_id: int, *, role: Optional[str] = None, content: Optional[str] = None,
+        user_id: Optional[int] = None,
+    ) -> Optional[Message]:
+        q = self.session.query(Message).filter(Message.id == message_id)
+        if user_id is not None:
+            # ownership checked in the same query
+            q = q.join(ChatSession, ChatSession.id == Message.session_id).filter(ChatSession.user_id == user_id)
+        msg = q.first()
         if not msg:
             return None
 
@@ -161,4 +453,5 @@ class MessageRepository(BaseRepository):
         if changed:
             self.session.commit()
             self.session.refresh(msg)
+            session_window_cache.invalidate(msg.session_id)
         return msg
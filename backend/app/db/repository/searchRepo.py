@@ -0,0 +1,94 @@
+from __future__ import annotations
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Row
+
+from .base import BaseRepository
+from app.util.searchIndex import SEARCH_TS_CONFIG, SQLITE_FTS_TABLE
+
+SNIPPET_WORDS = 12
+MARK_START = "<mark>"
+MARK_END = "</mark>"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def fts5_query(q: str) -> str:
+    """
+    User text -> FTS5 MATCH expression: every word quoted (so FTS5 operators and
+    punctuation in the input can't break the query), all words required, the last
+    one also matching as a prefix for search-as-you-type.
+    """
+    words = _WORD.findall(q)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class MessageSearchRepository(BaseRepository):
+    """
+    Ranked full-text search over a user's messages. Results are ordered by relevance
+    then recency; snippets are only built for the returned page.
+    Requires app.util.searchIndex.ensure_search_index() to have run.
+    """
+
+    def search(
+        self, user_id: int, q: str, session_id: Optional[int] = None, limit: int = 20, offset: int = 0
+    ) -> List[Row]:
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            return self._search_postgres(user_id, q, session_id, limit, offset)
+        if dialect == "sqlite":
+            return self._search_sqlite(user_id, q, session_id, limit, offset)
+        raise NotImplementedError(f"full-text search is not available on {dialect}")
+
+    def _search_postgres(self, user_id, q, session_id, limit, offset) -> List[Row]:
+        # Rank/limit first on the GIN-filtered rows, then ts_headline only for the page
+        sql = text(f"""
+            WITH query AS (SELECT websearch_to_tsquery('{SEARCH_TS_CONFIG}', :q) AS tsq),
+            page AS (
+                SELECT m.id, m.session_id, m.role, m.content, m.create_date, s.name AS session_name,
+                       ts_rank_cd(m.search_vector, query.tsq) AS rank
+                FROM messages m
+                JOIN chat_sessions s ON s.id = m.session_id
+                CROSS JOIN query
+                WHERE m.search_vector @@ query.tsq
+                  AND s.user_id = :user_id
+                  AND (CAST(:session_id AS INTEGER) IS NULL OR m.session_id = :session_id)
+                ORDER BY rank DESC, m.create_date DESC, m.id DESC
+                LIMIT :limit OFFSET :offset
+            )
+            SELECT page.id AS message_id, page.session_id, page.session_name, page.role,
+                   page.create_date, page.rank,
+                   ts_headline('{SEARCH_TS_CONFIG}', page.content, query.tsq,
+                               'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_WORDS * 2}, MinWords={SNIPPET_WORDS // 2}, MaxFragments=1') AS snippet
+            FROM page CROSS JOIN query
+            ORDER BY page.rank DESC, page.create_date DESC, page.id DESC
+        """)
+        params = {"q": q, "user_id": user_id, "session_id": session_id, "limit": limit, "offset": offset}
+        return list(self.session.execute(sql, params).all())
+
+    def _search_sqlite(self, user_id, q, session_id, limit, offset) -> List[Row]:
+        match = fts5_query(q)
+        if not match:
+            return []
+        # bm25() is lower-is-better; negate it so rank means the same on both backends
+        sql = text(f"""
+            SELECT m.id AS message_id, m.session_id, s.name AS session_name, m.role, m.create_date,
+                   -bm25({SQLITE_FTS_TABLE}) AS rank,
+                   snippet({SQLITE_FTS_TABLE}, 0, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_WORDS}) AS snippet
+            FROM {SQLITE_FTS_TABLE}
+            JOIN messages m ON m.id = {SQLITE_FTS_TABLE}.rowid
+            JOIN chat_sessions s ON s.id = m.session_id
+            WHERE {SQLITE_FTS_TABLE} MATCH :match
+              AND s.user_id = :user_id
+              AND (:session_id IS NULL OR m.session_id = :session_id)
+            ORDER BY rank DESC, m.create_date DESC, m.id DESC
+            LIMIT :limit OFFSET :offset
+        """)
+        params = {"match": match, "user_id": user_id, "session_id": session_id, "limit": limit, "offset": offset}
+        return list(self.session.execute(sql, params).all())
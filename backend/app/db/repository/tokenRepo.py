@@ -0,0 +1,36 @@
+import time
+from typing import List, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from .base import BaseRepository
+from app.db.models.user import RevokedToken
+
+class TokenRepository(BaseRepository):
+    def revoke(self, jti: str, user_id: int, expires_at: int) -> bool:
+        """
+        Records a refresh token as revoked. Returns False if it already was, which
+        makes revoking double as an atomic claim when a token is rotated.
+        """
+        try:
+            # a savepoint, so a duplicate doesn't roll back the rest of the caller's transaction
+            with self.session.begin_nested():
+                self.session.add(RevokedToken(jti=jti, user_id=user_id, expires_at=int(expires_at)))
+        except IntegrityError:
+            return False
+        self.session.commit()
+        return True
+
+    def is_revoked(self, jti: str) -> bool:
+        return self.session.get(RevokedToken, jti) is not None
+
+    def active_revocations(self) -> List[Tuple[str, int]]:
+        """(jti, expires_at) of revoked tokens that haven't expired yet."""
+        stmt = select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at >= int(time.time()))
+        return [(row.jti, row.expires_at) for row in self.session.execute(stmt)]
+
+    def purge_expired(self) -> int:
+        result = self.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < int(time.time())))
+        self.session.commit()
+        return result.rowcount
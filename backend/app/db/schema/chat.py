@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from pydantic import ConfigDict
 from typing import Optional, List
 from datetime import datetime
@@ -12,6 +12,8 @@ class MessageBase(BaseModel):
 class MessageIn(BaseModel):
     content: str
     mode: int
+    temperature: Optional[float] = None
+    cacheable: bool = False  # opt into the response cache even when sampling
 
     
 class MessageInCreate(MessageBase):
@@ -23,6 +25,21 @@ class MessageInCreateBody(BaseModel):
     content: str
 
 
+class MessageImportItem(BaseModel):
+    role: str
+    content: str
+    create_date: Optional[datetime] = None  # defaults to now, preserving list order
+
+
+class MessageBulkIn(BaseModel):
+    messages: List[MessageImportItem] = Field(..., max_length=10000)
+
+
+class MessageBulkResult(BaseModel):
+    session_id: int
+    inserted: int
+
+
 class MessageInUpdate(BaseModel):
     role: Optional[str] = None
     content: Optional[str] = None
@@ -50,6 +67,61 @@ class ChatSessionInUpdate(BaseModel):
     name: Optional[str] = None
 
 
+class ChatSessionSummary(BaseModel):
+    id: int
+    user_id: int
+    name: str
+    create_date: datetime
+    last_activity: datetime
+    last_message_at: Optional[datetime] = None
+    last_message_role: Optional[str] = None
+    last_message_preview: Optional[str] = None
+    message_count: int = 0
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChatSessionSummaryPage(BaseModel):
+    items: List[ChatSessionSummary]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+
+class MessageSearchHit(BaseModel):
+    message_id: int
+    session_id: int
+    session_name: str
+    role: str
+    snippet: str  # matched terms wrapped in <mark>...</mark>
+    rank: float
+    create_date: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MessageSearchPage(BaseModel):
+    items: List[MessageSearchHit]
+    next_offset: Optional[int] = None  # pass back as ?offset= for the next page
+
+
+class SemanticMessageHit(BaseModel):
+    message_id: int
+    role: str
+    content: str
+    create_date: datetime
+    similarity: float
+
+
+class SemanticSessionHit(BaseModel):
+    session_id: int
+    session_name: str
+    similarity: float  # best message similarity in the session
+    messages: List[SemanticMessageHit]
+
+
+class SemanticSearchResult(BaseModel):
+    sessions: List[SemanticSessionHit]
+
+
 class ChatSessionOutput(ChatSessionBase):
     id: int
     name: str
@@ -27,4 +27,12 @@ class UserInLogin(BaseModel):
 
 
 class UserWithToken(BaseModel):
-    token : str
\ No newline at end of file
+    # Access token (kept as `token` for existing clients)
+    token : str
+    refresh_token : Union[str, None] = None
+    # Lifetime of the access token in seconds
+    expires_in : Union[int, None] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token : str
\ No newline at end of file
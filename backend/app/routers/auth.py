@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends
-from app.db.schema.user import UserInCreate, UserInLogin, UserWithToken, UserOutput
+from fastapi import APIRouter, Depends, Response
+from app.db.schema.user import UserInCreate, UserInLogin, UserWithToken, UserOutput, RefreshRequest
 from app.core.database import get_db
 from sqlalchemy.orm import Session
 from app.service.userService import UserService
@@ -23,5 +23,16 @@ def signUp(signUpDetails : UserInCreate, session : Session = Depends(get_db)):
         raise error
 
 
+@authRouter.post("/refresh", status_code=200, response_model=UserWithToken)
+def refresh(refreshDetails : RefreshRequest, session : Session = Depends(get_db)):
+    return UserService(session=session).refresh(refresh_token=refreshDetails.refresh_token)
+
+
+@authRouter.post("/logout", status_code=204)
+def logout(refreshDetails : RefreshRequest, session : Session = Depends(get_db)):
+    UserService(session=session).logout(refresh_token=refreshDetails.refresh_token)
+    return Response(status_code=204)
+
+
 # router -> service -> repository -> db
 # router <- service <- repository <- db
\ No newline at end of file
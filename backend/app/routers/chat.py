@@ -1,36 +1,130 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, Query, status, HTTPException
 from sqlalchemy.orm import Session
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.core.database import get_db
 from app.service.chatService import ChatSessionService
+from app.util.protectRoute import get_current_user
+from app.db.schema.user import UserOutput
+from app.core.admission import admission, AdmissionRejected
 from app.db.schema.chat import (
     ChatSessionInCreate,
     ChatSessionInUpdate,
     ChatSessionOutput,
+    ChatSessionSummaryPage,
+    MessageSearchPage,
+    SemanticSearchResult,
     MessageOutput,
     MessageInCreateBody,
     MessageInUpdate,
     MessageIn,
+    MessageBulkIn,
+    MessageBulkResult,
 )
 chatRouter = APIRouter()
 messagesRouter = APIRouter()
 
+# Every route acts as the authenticated user. Access tokens carry the profile and
+# session owners are cached, so authorization itself normally costs no query;
+# where a lookup is needed the owner filter is part of the query the route makes anyway.
+# A session owned by someone else is reported as not found.
+
+def resolve_user_id(user_id: Optional[int], current_user: UserOutput) -> int:
+    """The `user_id` query parameter is optional now; if given it must be the caller."""
+    if user_id is not None and user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to access another user's chats")
+    return current_user.id
+
 # Create session
 @chatRouter.post("", status_code=201, response_model=ChatSessionOutput)
-def create_chat_session(payload: ChatSessionInCreate, session: Session = Depends(get_db)):
+def create_chat_session(
+    payload: ChatSessionInCreate,
+    session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
+):
+    resolve_user_id(payload.user_id, current_user)
     try:
         return ChatSessionService(session=session).create_session(payload=payload)
     except Exception as e:
         print(e)
         raise e
 
+# Sidebar listing: one query for names, counts and last-message previews
+# (declared before /{session_id} so "summaries" isn't parsed as an id)
+@chatRouter.get("/summaries", response_model=ChatSessionSummaryPage)
+def list_chat_session_summaries(
+    user_id: Optional[int] = Query(None, description="Owner of the chat sessions (defaults to the caller)"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
+):
+    user_id = resolve_user_id(user_id, current_user)
+    try:
+        return ChatSessionService(session=session).list_session_summaries(
+            user_id=user_id, limit=limit, cursor=cursor
+        )
+    except Exception as e:
+        print(e)
+        raise e
+
+# Ranked full-text search over a user's messages (before /{session_id} as well)
+@chatRouter.get("/search", response_model=MessageSearchPage)
+def search_chat_messages(
+    user_id: Optional[int] = Query(None, description="Owner of the chat sessions (defaults to the caller)"),
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for"),
+    session_id: Optional[int] = Query(None, description="Only search this session"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
+):
+    user_id = resolve_user_id(user_id, current_user)
+    try:
+        return ChatSessionService(session=session).search_messages(
+            user_id=user_id, q=q, session_id=session_id, limit=limit, offset=offset
+        )
+    except Exception as e:
+        print(e)
+        raise e
+
+# "Find that conversation about X": similarity search over the user's indexed history
+@chatRouter.get("/semantic_search", response_model=SemanticSearchResult)
+def semantic_search_chat_history(
+    user_id: Optional[int] = Query(None, description="Owner of the chat sessions (defaults to the caller)"),
+    q: str = Query(..., min_length=1, max_length=500, description="What the conversation was about"),
+    k: int = Query(10, ge=1, le=50, description="Messages to match before grouping by session"),
+    session_id: Optional[int] = Query(None, description="Only search this session"),
+    session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
+):
+    user_id = resolve_user_id(user_id, current_user)
+    try:
+        return ChatSessionService(session=session).semantic_search(
+            user_id=user_id, q=q, k=k, session_id=session_id
+        )
+    except Exception as e:
+        print(e)
+        raise e
+
+# Export all of a user's sessions and messages as NDJSON (before /{session_id} as well)
+@chatRouter.get("/export")
+def export_user_history(
+    user_id: Optional[int] = Query(None, description="Owner of the chat sessions (defaults to the caller)"),
+    session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
+):
+    user_id = resolve_user_id(user_id, current_user)
+    chunks = ChatSessionService(session=session).export_user(user_id=user_id)
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
+
 # Get single session
 @chatRouter.get("/{session_id}", response_model=ChatSessionOutput)
-def get_chat_session(session_id: int, session: Session = Depends(get_db)):
+def get_chat_session(session_id: int, session: Session = Depends(get_db), current_user: UserOutput = Depends(get_current_user)):
     try:
-        return ChatSessionService(session=session).get_session(session_id=session_id)
+        return ChatSessionService(session=session).get_session(session_id=session_id, user_id=current_user.id)
     except Exception as e:
         print(e)
         raise e
@@ -38,12 +132,14 @@ def get_chat_session(session_id: int, session: Session = Depends(get_db)):
 # List sessions by user
 @chatRouter.get("", response_model=List[ChatSessionOutput])
 def list_chat_sessions_by_user(
-    user_id: int = Query(..., description="Owner of the chat sessions"),
+    user_id: Optional[int] = Query(None, description="Owner of the chat sessions (defaults to the caller)"),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
     newest_first: bool = Query(True),
     session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
 ):
+    user_id = resolve_user_id(user_id, current_user)
     try:
         return ChatSessionService(session=session).list_sessions_by_user(
             user_id=user_id, limit=limit, offset=offset, newest_first=newest_first
@@ -54,18 +150,25 @@ def list_chat_sessions_by_user(
 
 # Update (rename) session
 @chatRouter.patch("/{session_id}", response_model=ChatSessionOutput)
-def update_chat_session(session_id: int, payload: ChatSessionInUpdate, session: Session = Depends(get_db)):
+def update_chat_session(
+    session_id: int,
+    payload: ChatSessionInUpdate,
+    session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
+):
     try:
-        return ChatSessionService(session=session).update_session(session_id=session_id, payload=payload)
+        return ChatSessionService(session=session).update_session(
+            session_id=session_id, payload=payload, user_id=current_user.id
+        )
     except Exception as e:
         print(e)
         raise e
 
 # Delete session
 @chatRouter.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_chat_session(session_id: int, session: Session = Depends(get_db)):
+def delete_chat_session(session_id: int, session: Session = Depends(get_db), current_user: UserOutput = Depends(get_current_user)):
     try:
-        ChatSessionService(session=session).delete_session(session_id=session_id)
+        ChatSessionService(session=session).delete_session(session_id=session_id, user_id=current_user.id)
         return
     except Exception as e:
         print(e)
@@ -79,10 +182,11 @@ def list_messages_for_session(
     offset: int = Query(0, ge=0),
     ascending: bool = Query(True),
     session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
 ):
     try:
         return ChatSessionService(session=session).list_messages_for_session(
-            session_id=session_id, limit=limit, offset=offset, ascending=ascending
+            session_id=session_id, limit=limit, offset=offset, ascending=ascending, user_id=current_user.id
         )
     except Exception as e:
         print(e)
@@ -94,9 +198,28 @@ def create_message_for_session(
     session_id: int,
     body: MessageInCreateBody,
     session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
 ):
     try:
-        return ChatSessionService(session=session).create_message(session_id=session_id, payload=body)
+        return ChatSessionService(session=session).create_message(
+            session_id=session_id, payload=body, user_id=current_user.id
+        )
+    except Exception as e:
+        print(e)
+        raise e
+
+# Bulk import: thousands of messages in one transaction, no per-row auto-title
+@chatRouter.post("/{session_id}/messages/bulk", status_code=201, response_model=MessageBulkResult)
+def bulk_create_messages_for_session(
+    session_id: int,
+    body: MessageBulkIn,
+    session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
+):
+    try:
+        return ChatSessionService(session=session).bulk_create_messages(
+            session_id=session_id, payload=body, user_id=current_user.id
+        )
     except Exception as e:
         print(e)
         raise e
@@ -106,12 +229,33 @@ def create_message_for_session(
 def get_session_with_messages(
     session_id: int,
     session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
+):
+    try:
+        return ChatSessionService(session=session).get_session_with_messages(
+            session_id=session_id, user_id=current_user.id
+        )
+    except Exception as e:
+        print(e)
+        raise e
+
+# Stream a transcript of any size: NDJSON lines or one incrementally written JSON document
+@chatRouter.get("/{session_id}/with_messages/stream")
+def stream_session_with_messages(
+    session_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|json)$"),
+    session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
 ):
     try:
-        return ChatSessionService(session=session).get_session_with_messages(session_id=session_id)
+        chunks = ChatSessionService(session=session).export_session(
+            session_id=session_id, fmt=format, user_id=current_user.id
+        )
     except Exception as e:
         print(e)
         raise e
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(chunks, media_type=media_type)
 
 # Delete a message in a session
 @chatRouter.delete("/{session_id}/messages/{message_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -119,24 +263,54 @@ def delete_message_in_session(
     session_id: int,
     message_id: int,
     session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
 ):
     try:
-        ChatSessionService(session=session).delete_message(session_id=session_id, message_id=message_id)
+        ChatSessionService(session=session).delete_message(
+            session_id=session_id, message_id=message_id, user_id=current_user.id
+        )
         return
     except Exception as e:
         print(e)
         raise e
 
+# async so that waiting in the admission queue doesn't hold a threadpool worker
 @chatRouter.post("/{session_id}/messages/stream")
-def post_message_stream(session_id: int, body: MessageIn, session: Session = Depends(get_db)):
+async def post_message_stream(
+    session_id: int,
+    body: MessageIn,
+    session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
+):
     text = (body.content or "").strip()
     if not text:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="content is empty")
 
-    generator = ChatSessionService(session=session).stream_user_and_robot_message(session_id=session_id, user_text=text, mode=body.mode)
+    service = ChatSessionService(session=session)
+    # before admission, so requests for someone else's session don't take a slot
+    await run_in_threadpool(service.require_session, session_id=session_id, user_id=current_user.id)
+
+    # Global + per-user generation caps; waits briefly in the queue, else 429
+    try:
+        lease = await admission.acquire_async(user_id=current_user.id)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many concurrent generations ({e.reason})",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    generator = service.stream_user_and_robot_message(
+        session_id=session_id,
+        user_text=text,
+        mode=body.mode,
+        temperature=body.temperature,
+        cacheable=body.cacheable,
+        user_id=current_user.id,
+    )
 
     return StreamingResponse(
-        generator,
+        admission.guard(lease, generator),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -150,9 +324,12 @@ def update_message(
     message_id: int,
     payload: MessageInUpdate,
     session: Session = Depends(get_db),
+    current_user: UserOutput = Depends(get_current_user),
 ):
     try:
-        return ChatSessionService(session=session).update_message(message_id=message_id, payload=payload)
+        return ChatSessionService(session=session).update_message(
+            message_id=message_id, payload=payload, user_id=current_user.id
+        )
     except Exception as e:
         print(e)
         raise e
@@ -1,42 +1,104 @@
-from typing import Generator, List, Dict
+from typing import Generator, List, Dict, Optional
 from fastapi import HTTPException
 from sqlalchemy.orm import Session, selectinload
 from contextlib import suppress
-import httpx
-import os, json
+import os, json, time, base64
+from datetime import datetime, timezone
 
 from app.tools.web_search import web_search_summary 
 # Imports for tool-calling
 from app.tools.llm_tool import WEB_SEARCH_TOOL, run_tool_call, ToolCallBuffer
 from app.chroma_rag import query_rag_db
-
-from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
+from app.core.cache.responseCache import response_cache, make_cache_key, is_cacheable, replay_as_sse
+from app.core.cache.semanticCache import semantic_cache
+from app.core.cache.sessionWindowCache import session_window_cache, CachedMessage
+from app.service.promptBuilder import PromptBuilder, HISTORY_WINDOW, history_window_start
+from app.core.llm.backendPool import BackendPool, NoBackendAvailable, UpstreamRejected, LLM_BACKENDS
+from app.core.llm.sseParser import iter_sse_chunks, iter_content_deltas
+from app.core.scheduler import scheduler, SchedulerTimeout
+from app.core.llm.coalescer import coalescer
+from app.core.tracing import tracer
+from app.core.historyIndex import history_index, REINDEX_SESSION
+from app.core.jobQueue import job_queue
+from app.service.titleGenerator import title_generator
+from app.core.database import SessionLocal
+from app.core import metrics
+
+from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository, SessionNotFound
+from app.db.repository.searchRepo import MessageSearchRepository
 from app.db.models.chat import ChatSession
 from app.db.schema.chat import (
     ChatSessionInCreate,
     ChatSessionInUpdate,
     ChatSessionOutput,
+    ChatSessionSummary,
+    ChatSessionSummaryPage,
     MessageOutput,
     MessageInCreateBody,
     MessageInCreate,
+    MessageBulkIn,
+    MessageBulkResult,
     MessageInUpdate,
+    MessageSearchHit,
+    MessageSearchPage,
+    SemanticMessageHit,
+    SemanticSessionHit,
+    SemanticSearchResult,
 )
 
 ROBOT_ENDPOINT = "http://localhost:8000/v1/chat/completions"
 ROBOT_MODEL = "Qwen/Qwen3-0.6B"
 
+# Messages fetched per round trip / written per chunk by the transcript export
+EXPORT_BATCH_SIZE = 500
+
+# Set LLM_BACKENDS to spread generation over several vLLM instances
+llm_pool = BackendPool(endpoints=LLM_BACKENDS or [ROBOT_ENDPOINT])
+
+
+@job_queue.handler("chat.persist_robot_message")
+def _persist_robot_message_job(payload: Dict) -> None:
+    with SessionLocal() as db:
+        MessageRepository(session=db).create_message(data=MessageInCreate(**payload))
+
+
+@job_queue.handler("cache.semantic_store")
+def _semantic_store_job(payload: Dict) -> None:
+    semantic_cache.store(payload["namespace"], payload["text"], payload["answer"])
+
+
+def session_job_key(session_id: int) -> str:
+    return f"session:{session_id}"
+
+
+def encode_cursor(last_message_at: Optional[datetime], session_id: int) -> str:
+    raw = json.dumps({"t": last_message_at.isoformat() if last_message_at else None, "id": session_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(raw["t"]) if raw["t"] else None), int(raw["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 class ChatSessionService:
     def __init__(self, session: Session):
         self._sessions = ChatSessionRepository(session=session)
         self._messages = MessageRepository(session=session)
+        self._search = MessageSearchRepository(session=session)
+        self._prompts = PromptBuilder()
 
     # --- Sessions ---
     def create_session(self, payload: ChatSessionInCreate) -> ChatSessionOutput:
         created = self._sessions.create_session(data=payload)
         return created
 
-    def get_session(self, session_id: int) -> ChatSessionOutput:
-        sess = self._sessions.get_session_by_id(session_id=session_id)
+    # user_id on the per-session methods below scopes them to that owner: another
+    # user's session is reported as not found. None (internal callers) skips the check.
+    def get_session(self, session_id: int, user_id: Optional[int] = None) -> ChatSessionOutput:
+        sess = self._sessions.get_session_by_id(session_id=session_id, user_id=user_id)
         if not sess:
             raise HTTPException(status_code=404, detail="Chat session not found")
         return sess
@@ -48,8 +110,70 @@ class ChatSessionService:
             user_id=user_id, limit=limit, offset=offset, newest_first=newest_first
         )
 
-    def update_session(self, session_id: int, payload: ChatSessionInUpdate) -> ChatSessionOutput:
-        sess = self._sessions.get_session_by_id(session_id=session_id)
+    def list_session_summaries(
+        self, user_id: int, limit: int = 20, cursor: Optional[str] = None
+    ) -> ChatSessionSummaryPage:
+        before = decode_cursor(cursor) if cursor else None
+        rows = self._sessions.list_session_summaries(user_id=user_id, limit=limit + 1, before=before)
+        items = [ChatSessionSummary.model_validate(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last.last_message_at, last.id)
+        return ChatSessionSummaryPage(items=items, next_cursor=next_cursor)
+
+    def search_messages(
+        self, user_id: int, q: str, session_id: Optional[int] = None, limit: int = 20, offset: int = 0
+    ) -> MessageSearchPage:
+        try:
+            rows = self._search.search(
+                user_id=user_id, q=q, session_id=session_id, limit=limit + 1, offset=offset
+            )
+        except NotImplementedError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        items = [MessageSearchHit.model_validate(row) for row in rows[:limit]]
+        next_offset = offset + limit if len(rows) > limit else None
+        return MessageSearchPage(items=items, next_offset=next_offset)
+
+    def semantic_search(
+        self, user_id: int, q: str, k: int = 10, session_id: Optional[int] = None
+    ) -> SemanticSearchResult:
+        """
+        The user's messages nearest to `q`, grouped by session; sessions are ranked by
+        their best match. Ownership is re-checked against the DB, so hits from
+        sessions deleted or not yet removed from the index are dropped.
+        """
+        if not history_index.enabled:
+            raise HTTPException(status_code=503, detail="Semantic history search is disabled")
+        try:
+            hits = history_index.search(user_id=user_id, q=q, k=k, session_id=session_id)
+        except Exception as e:
+            print(f"semantic history search failed: {e}")
+            raise HTTPException(status_code=503, detail="Semantic history search is unavailable")
+
+        names = self._sessions.get_session_names(user_id=user_id, session_ids={h["session_id"] for h in hits})
+        sessions: Dict[int, SemanticSessionHit] = {}
+        for hit in hits:  # already most similar first
+            sid = hit["session_id"]
+            if sid not in names:
+                continue
+            if sid not in sessions:
+                sessions[sid] = SemanticSessionHit(
+                    session_id=sid, session_name=names[sid], similarity=hit["similarity"], messages=[]
+                )
+            sessions[sid].messages.append(SemanticMessageHit(
+                message_id=hit["message_id"],
+                role=hit["role"],
+                content=hit["content"],
+                create_date=datetime.fromtimestamp(hit["create_date"], tz=timezone.utc),
+                similarity=hit["similarity"],
+            ))
+        return SemanticSearchResult(sessions=list(sessions.values()))
+
+    def update_session(
+        self, session_id: int, payload: ChatSessionInUpdate, user_id: Optional[int] = None
+    ) -> ChatSessionOutput:
+        sess = self._sessions.get_session_by_id(session_id=session_id, user_id=user_id)
         if not sess:
             raise HTTPException(status_code=404, detail="Chat session not found")
 
@@ -59,41 +183,164 @@ class ChatSessionService:
 
         return sess
 
-    def delete_session(self, session_id: int) -> None:
-        ok = self._sessions.delete_session(session_id=session_id)
+    def delete_session(self, session_id: int, user_id: Optional[int] = None) -> None:
+        ok = self._sessions.delete_session(session_id=session_id, user_id=user_id)
         if not ok:
             raise HTTPException(status_code=404, detail="Chat session not found")
 
     # --- Messages ---
+    def require_session(self, session_id: int, user_id: Optional[int] = None) -> None:
+        """404 unless the session exists (and belongs to user_id); usually answered from the owner cache."""
+        if not self._sessions.session_exists(session_id=session_id, user_id=user_id):
+            raise HTTPException(status_code=404, detail="Chat session not found")
+
     def list_messages_for_session(
-        self, session_id: int, limit: int = 100, offset: int = 0, ascending: bool = True
+        self, session_id: int, limit: int = 100, offset: int = 0, ascending: bool = True,
+        user_id: Optional[int] = None,
     ) -> List[MessageOutput]:
-        if not self._sessions.session_exists(session_id=session_id):
+        if not self._sessions.session_exists(session_id=session_id, user_id=user_id):
             raise HTTPException(status_code=404, detail="Chat session not found")
         return self._messages.list_messages_by_session(
             session_id=session_id, limit=limit, offset=offset, ascending=ascending
         )
 
-    def create_message(self, session_id: int, payload: MessageInCreateBody) -> MessageOutput:
-        if not self._sessions.session_exists(session_id=session_id):
+    def create_message(
+        self, session_id: int, payload: MessageInCreateBody, user_id: Optional[int] = None
+    ) -> MessageOutput:
+        if not self._sessions.session_exists(session_id=session_id, user_id=user_id):
             raise HTTPException(status_code=404, detail="Chat session not found")
         msg_in = MessageInCreate(session_id=session_id, role=payload.role, content=payload.content)
-        created = self._messages.create_message(data=msg_in)  # auto-title handled in repo
+        try:
+            created = self._messages.create_message(data=msg_in)  # auto-title handled in repo
+        except SessionNotFound:
+            # the owner check can be answered from cache; the insert is authoritative
+            raise HTTPException(status_code=404, detail="Chat session not found")
         return created
 
-    def get_session_with_messages(self, session_id: int) -> ChatSessionOutput:
-        sess = (
+    def bulk_create_messages(
+        self, session_id: int, payload: MessageBulkIn, user_id: Optional[int] = None
+    ) -> MessageBulkResult:
+        if not self._sessions.session_exists(session_id=session_id, user_id=user_id):
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        try:
+            inserted = self._messages.bulk_create_messages(
+                session_id=session_id, items=[m.model_dump() for m in payload.messages]
+            )
+        except SessionNotFound:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        # core INSERT/COPY skips the ORM events the history index listens to
+        history_index.enqueue(REINDEX_SESSION, session_id)
+        return MessageBulkResult(session_id=session_id, inserted=inserted)
+
+    def export_user(self, user_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> Generator[str, None, None]:
+        """
+        NDJSON of every session a user owns: a {"type": "session"} line, then that
+        session's {"type": "message"} lines, from one streamed query.
+        """
+        rows = self._sessions.iter_user_messages(user_id=user_id, batch_size=batch_size)
+        batch: List[str] = []
+        current = None
+        for row in rows:
+            if row.session_id != current:
+                current = row.session_id
+                batch.append(json.dumps({
+                    "type": "session",
+                    "id": row.session_id,
+                    "user_id": user_id,
+                    "name": row.name,
+                    "create_date": row.session_create_date.isoformat() if row.session_create_date else None,
+                    "message_count": row.message_count,
+                }, ensure_ascii=False))
+            if row.message_id is not None:
+                batch.append(json.dumps({
+                    "type": "message",
+                    "id": row.message_id,
+                    "session_id": row.session_id,
+                    "role": row.role,
+                    "content": row.content,
+                    "create_date": row.create_date.isoformat() if row.create_date else None,
+                }, ensure_ascii=False))
+            if len(batch) >= batch_size:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+    def get_session_with_messages(self, session_id: int, user_id: Optional[int] = None) -> ChatSessionOutput:
+        q = (
             self._sessions.session.query(ChatSession)
             .options(selectinload(ChatSession.messages))
             .filter(ChatSession.id == session_id)
-            .first()
         )
+        if user_id is not None:
+            q = q.filter(ChatSession.user_id == user_id)
+        sess = q.first()
         if not sess:
             raise HTTPException(status_code=404, detail="Chat session not found")
         return sess
 
-    def delete_message(self, session_id: int, message_id: int) -> None:
-        if not self._sessions.session_exists(session_id=session_id):
+    def export_session(
+        self, session_id: int, fmt: str = "ndjson", batch_size: int = EXPORT_BATCH_SIZE,
+        user_id: Optional[int] = None,
+    ) -> Generator[str, None, None]:
+        """
+        Transcript export for StreamingResponse. The session is looked up eagerly so a
+        missing one is still a 404; messages are paged from the DB while streaming.
+        fmt="ndjson": one {"type": "session"} line, then one {"type": "message"} line each.
+        fmt="json":   the ChatSessionOutput shape, written incrementally.
+        """
+        sess = self._sessions.get_session_by_id(session_id=session_id, user_id=user_id)
+        if not sess:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        header = {
+            "id": sess.id,
+            "user_id": sess.user_id,
+            "name": sess.name,
+            "create_date": sess.create_date.isoformat() if sess.create_date else None,
+            "message_count": sess.message_count,
+        }
+        rows = self._messages.iter_messages_by_session(session_id=session_id, batch_size=batch_size)
+        if fmt == "json":
+            return self._iter_json_export(header, rows, batch_size)
+        return self._iter_ndjson_export(header, rows, batch_size)
+
+    @staticmethod
+    def _message_dict(session_id: int, row) -> Dict:
+        return {
+            "id": row.id,
+            "session_id": session_id,
+            "role": row.role,
+            "content": row.content,
+            "create_date": row.create_date.isoformat() if row.create_date else None,
+        }
+
+    def _iter_ndjson_export(self, header: Dict, rows, batch_size: int) -> Generator[str, None, None]:
+        yield json.dumps({"type": "session", **header}, ensure_ascii=False) + "\n"
+        batch: List[str] = []
+        for row in rows:
+            batch.append(json.dumps({"type": "message", **self._message_dict(header["id"], row)}, ensure_ascii=False))
+            if len(batch) >= batch_size:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+    def _iter_json_export(self, header: Dict, rows, batch_size: int) -> Generator[str, None, None]:
+        opening = json.dumps(header, ensure_ascii=False)[:-1]
+        yield opening + ', "messages": ['
+        batch: List[str] = []
+        first = True
+        for row in rows:
+            batch.append(json.dumps(self._message_dict(header["id"], row), ensure_ascii=False))
+            if len(batch) >= batch_size:
+                yield ("" if first else ",") + ",".join(batch)
+                first, batch = False, []
+        if batch:
+            yield ("" if first else ",") + ",".join(batch)
+        yield "]}"
+
+    def delete_message(self, session_id: int, message_id: int, user_id: Optional[int] = None) -> None:
+        if not self._sessions.session_exists(session_id=session_id, user_id=user_id):
             raise HTTPException(status_code=404, detail="Chat session not found")
 
         msg = self._messages.get_message_by_id(message_id=message_id)
@@ -104,7 +351,9 @@ class ChatSessionService:
         if not ok:
             raise HTTPException(status_code=404, detail="Message already deleted")
 
-    def update_message(self, message_id: int, payload: MessageInUpdate) -> MessageOutput:
+    def update_message(
+        self, message_id: int, payload: MessageInUpdate, user_id: Optional[int] = None
+    ) -> MessageOutput:
         if payload.role is None and payload.content is None:
             raise HTTPException(status_code=400, detail="Nothing to update")
 
@@ -112,6 +361,7 @@ class ChatSessionService:
             message_id=message_id,
             role=payload.role,
             content=payload.content,
+            user_id=user_id,
         )
         if not updated:
             raise HTTPException(status_code=404, detail="Message not found")
@@ -119,67 +369,95 @@ class ChatSessionService:
 
     def stream_user_and_robot_message(
         self, session_id: int, user_text: str, mode: int,
+        temperature: Optional[float] = None, cacheable: bool = False,
+        user_id: Optional[int] = None,
     ) -> Generator[str, None, None]:
         """
         - Save user msg
-        - Call robot endpoint with history + user input
+        - Call robot endpoint with history + user input (or replay a cached answer)
         - Yield tokens as SSE
         - Save final robot msg
         """
+        turn = tracer.start_span("chat.turn", session_id=session_id, mode=mode, user_id=user_id)
+        started = time.perf_counter()
+        first_frame = True
+        try:
+            for frame in self._stream_turn(
+                session_id, user_text, mode, temperature, cacheable, user_id, turn
+            ):
+                if first_frame:
+                    # TTFT as seen by the client, including DB, search and queueing
+                    ttft_s = time.perf_counter() - started
+                    turn.set_attribute("client_ttft_ms", round(ttft_s * 1000, 2))
+                    metrics.llm_ttft.observe(ttft_s, mode=mode)
+                    first_frame = False
+                yield frame
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                turn.record_exception(e)
+            raise
+        finally:
+            turn.end()
+
+    def _stream_turn(
+        self, session_id: int, user_text: str, mode: int,
+        temperature: Optional[float], cacheable: bool, user_id: Optional[int], turn,
+    ) -> Generator[str, None, None]:
         # Get the current frontend mode
         # mode 1 = think, mode 2 = web_search, mode 3 = RAG
 
-        # 1. Save user msg
-        if not self._sessions.session_exists(session_id=session_id):
-            raise HTTPException(status_code=404, detail="Chat session not found")
-        msg_in = MessageInCreate(session_id=session_id, role="user", content=user_text)
-        self._messages.create_message(data=msg_in)  # auto-title handled in repo
-
-        # 2. Build history including system prompt
-        history = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful assistant. Do not reveal hidden reasoning. "
-                    "Almost generate at lease 30 words but at more 200 words"
-                    "If web results are provided below, prefer them for facts and cite links in markdown. "
-                    "If LOCAL FILE CONTEXT is provided, ground your answer in it and quote file names when relevant."
-                ),
-            }
-        ]
-        """Convert DB messages to [{role, content}, ...]."""
-        msgs = self._messages.list_messages_by_session(
-            session_id=session_id, limit=100, offset=0, ascending=True
-        )
-        history.extend([{"role": m.role, "content": m.content} for m in msgs])
-
-        # 2a) (NEW) Web search pre-hook (heuristic or force)
+        # 1. Save user msg, after the previous turn's deferred writes have landed
+        with tracer.span("db.save_user_message", parent=turn):
+            if job_queue.running and not job_queue.drain(session_job_key(session_id)):
+                print(f"session {session_id}: previous turn still being persisted")
+            if not self._sessions.session_exists(session_id=session_id, user_id=user_id):
+                raise HTTPException(status_code=404, detail="Chat session not found")
+            msg_in = MessageInCreate(session_id=session_id, role="user", content=user_text)
+            try:
+                self._messages.create_message(data=msg_in, auto_title=not job_queue.running)
+            except SessionNotFound:
+                # deleted since the route checked it; the response has already started
+                yield "event:error\ndata:Chat session not found\n\n"
+                return
+
+        # 2. Load the history window (its start only moves in fixed steps, see promptBuilder)
+        with tracer.span("db.load_history", parent=turn) as span:
+            total, msgs, cached = self._load_history_window(session_id)
+            span.set_attribute("messages", len(msgs))
+            span.set_attribute("cached", cached)
+        if total == 1 and job_queue.running:
+            title_generator.request(session_id)
+
+        # 2a) Semantic cache: only first turns are FAQ-like enough to reuse a neighbour's answer
+        cache_eligible = is_cacheable(temperature, cacheable)
+        semantic_ns = None
+        if semantic_cache.enabled and cache_eligible and total <= 1:
+            semantic_ns = semantic_cache.namespace(ROBOT_MODEL, mode)
+            with tracer.span("cache.semantic_lookup", parent=turn) as span:
+                semantic_text = semantic_cache.lookup(semantic_ns, user_text)
+                span.set_attribute("hit", semantic_text is not None)
+            if semantic_text is not None:
+                turn.set_attribute("cache", "semantic")
+                yield from self._replay_cached(session_id, semantic_text, turn)
+                return
+
+        # 2b) Web search pre-hook (heuristic or force)
+        search_md = None
         do_search = True if mode == 2 else False
         if do_search:
-            search_md = web_search_summary(user_text, max_results=5)
-            if search_md:
-                # Keep it as a separate system message to avoid polluting the user text.
-                history.append({
-                    "role": "system",
-                    "content": (
-                        "Web results (use if relevant; cite the links you rely on):\n\n"
-                        f"{search_md}"
-                    ),
-                })
+            with tracer.span("web_search", parent=turn):
+                search_md = web_search_summary(user_text, max_results=5)
 
         # RAG pre-hook (heuristic or force)
+        rag_docs = None
         do_rag = True if mode == 3 else False
         if do_rag:
-            rag_docs = query_rag_db(user_text, k=4)
-            if rag_docs:
-                rag_context = "\n\n".join(rag_docs)
-                history.append({
-                    "role": "system",
-                    "content": (
-                        "LOCAL FILE CONTEXT (use if relevant and cite the filename):\n\n"
-                        f"{rag_context}"
-                    ),
-                })
+            with tracer.span("rag.retrieve", parent=turn) as span:
+                rag_docs = query_rag_db(user_text, k=4)
+                span.set_attribute("documents", len(rag_docs or []))
+
+        # 2c) Stable prefix + history, volatile web/RAG context last
+        history = self._prompts.build(msgs, web_results=search_md, rag_docs=rag_docs)
 
         # 3. Prepare request payload
         enable_thinking = True if mode == 1 else False
@@ -189,33 +467,82 @@ class ChatSessionService:
             "chat_template_kwargs": {"enable_thinking": enable_thinking},
             "stream": True,
         }
+        if temperature is not None:
+            payload["temperature"] = temperature
+        priority = scheduler.priority_hint(mode, user_id)
+        if priority is not None:
+            payload["priority"] = priority
+
+        # 3a. Exact-match cache (opt-in; deterministic or explicitly cacheable requests only)
+        payload_key = make_cache_key(
+            model=ROBOT_MODEL,
+            mode=mode,
+            messages=history,
+            sampling={"temperature": temperature, "enable_thinking": enable_thinking},
+        )
+        cache_key = None
+        if response_cache.enabled and cache_eligible:
+            cache_key = payload_key
+            cached_text = response_cache.get(cache_key)
+            if cached_text is not None:
+                turn.set_attribute("cache", "exact")
+                yield from self._replay_cached(session_id, cached_text, turn)
+                return
 
         pieces: List[str] = []
 
         try:
-            # 4. Stream from robot with httpx
-            with httpx.stream("POST", ROBOT_ENDPOINT, json=payload, timeout=None) as r:
-                # r.iter_lines already return strings
-                for line in r.iter_lines():
-                    if not line:
-                        continue
-                    if line.startswith("data: "):
-                        data = line[len("data: "):]
-                        if data.strip() == "[DONE]":
-                            break
-
-                        import json
-                        obj = json.loads(data)
-                        delta = obj["choices"][0]["delta"].get("content")
-                        if delta:
-                            pieces.append(delta)
-                            yield f"data:{delta}\n\n"
+            # 4. Stream from robot through the scheduler and backend pool;
+            #    identical in-flight payloads share one upstream stream
+            with tracer.span("llm.generate", parent=turn) as span:
+                generate_started = time.perf_counter()
+                try:
+                    deltas = coalescer.stream(
+                        payload_key,
+                        lambda: self._stream_robot(payload, mode=mode, user_id=user_id),
+                        # sampled answers differ per request, so only deterministic ones are shared
+                        shared=cache_eligible,
+                    )
+                    for delta in deltas:
+                        if not pieces:
+                            span.set_attribute("upstream_first_byte_ms", round((time.perf_counter() - generate_started) * 1000, 2))
+                        pieces.append(delta)
+                        yield f"data:{delta}\n\n"
+                except NoBackendAvailable as e:
+                    print(e)
+                    span.record_exception(e)
+                    yield "event:error\ndata:LLM backend unavailable\n\n"
+                    return
+                except UpstreamRejected as e:
+                    print(e)
+                    span.record_exception(e)
+                    yield "event:error\ndata:LLM rejected the request\n\n"
+                    return
+                except SchedulerTimeout as e:
+                    print(e)
+                    span.record_exception(e)
+                    yield "event:error\ndata:LLM busy, please retry\n\n"
+                    return
+                finally:
+                    # one streamed delta is roughly one token with vLLM
+                    elapsed_s = time.perf_counter() - generate_started
+                    tokens_per_s = len(pieces) / elapsed_s if elapsed_s else 0.0
+                    span.set_attribute("tokens", len(pieces))
+                    span.set_attribute("tokens_per_s", round(tokens_per_s, 2))
+                    if pieces:
+                        metrics.llm_tokens.inc(len(pieces), mode=mode)
+                        metrics.llm_tokens_per_s.observe(tokens_per_s, mode=mode)
 
             final_text = "".join(pieces).strip()
+            if cache_key:
+                response_cache.set(cache_key, final_text)
+            if semantic_ns:
+                semantic_payload = {"namespace": semantic_ns, "text": user_text, "answer": final_text}
+                if not job_queue.submit("cache.semantic_store", semantic_payload):
+                    semantic_cache.store(semantic_ns, user_text, final_text)
 
-            # 5. Save robot msg
-            msg_in = MessageInCreate(session_id=session_id, role="robot", content=final_text)
-            self._messages.create_message(data=msg_in)  # auto-title handled in repo
+            # 5. Save robot msg (deferred to the job queue when it runs)
+            self._persist_robot_message(session_id, final_text, turn)
 
             yield "event:done\ndata:ok\n\n"                   
 
@@ -223,6 +550,46 @@ class ChatSessionService:
             with suppress(Exception):
                 pass
 
+    def _load_history_window(self, session_id: int):
+        """
+        (total, window, from_cache): the prompt history window of a session. Hot
+        sessions are served from the write-through window cache after a primary-key
+        check of the counters; otherwise the window is read and cached.
+        """
+        counters = self._sessions.get_message_counters(session_id=session_id)
+        total, last_message_at = (counters.message_count, counters.last_message_at) if counters else (0, None)
+        start = history_window_start(total)
+        cached = session_window_cache.get(session_id, total, last_message_at)
+        if cached is not None:
+            return total, cached[-(total - start):] if total > start else [], True
+        version = session_window_cache.version(session_id)
+        msgs = self._messages.list_messages_by_session(
+            session_id=session_id, limit=HISTORY_WINDOW, offset=start, ascending=True,
+        )
+        session_window_cache.put(session_id, total, last_message_at, [CachedMessage.of(m) for m in msgs], version=version)
+        return total, msgs, False
+
+    def _replay_cached(self, session_id: int, text: str, turn=None) -> Generator[str, None, None]:
+        """Replay a cached answer as SSE and persist it like a generated one."""
+        yield from replay_as_sse(text)
+        self._persist_robot_message(session_id, text, turn)
+        yield "event:done\ndata:ok\n\n"
+
+    def _persist_robot_message(self, session_id: int, text: str, turn=None) -> None:
+        with tracer.span("db.persist_robot_message", parent=turn) as span:
+            payload = {"session_id": session_id, "role": "robot", "content": text}
+            deferred = job_queue.submit("chat.persist_robot_message", payload, key=session_job_key(session_id))
+            span.set_attribute("deferred", deferred)
+            if not deferred:
+                self._messages.create_message(data=MessageInCreate(**payload))
+
+    def _stream_robot(
+        self, payload: Dict, mode: int = 0, user_id: Optional[int] = None
+    ) -> Generator[str, None, None]:
+        """Yield the content deltas of one streamed completion, holding a scheduler slot."""
+        with scheduler.slot(mode, user_id):
+            yield from iter_content_deltas(llm_pool.stream_lines(payload))
+
     def stream_user_and_robot_message__(   # <- new method name for tool-calling
         self,
         session_id: int,
@@ -281,37 +648,28 @@ class ChatSessionService:
 
             tool_used_this_turn = False
 
-            with httpx.stream("POST", ROBOT_ENDPOINT, json=req_payload, timeout=None) as r:
-                for line in r.iter_lines():
-                    if not line or not line.startswith("data: "):
-                        continue
-
-                    data = line[len("data: "):]
-                    if data.strip() == "[DONE]":
-                        break
-
-                    obj = json.loads(data)
-                    delta = obj["choices"][0]["delta"]
-
-                    # Tool-calling branch: accumulate chunks until complete
-                    if "tool_calls" in delta:
-                        for d in delta["tool_calls"]:
-                            complete = tool_buf.add_delta(d)
-                            if complete:
-                                # append the assistant's tool_calls message (required by spec)
-                                history.append({"role": "assistant", "tool_calls": [complete]})
-                                # run the tool locally
-                                tool_msg = run_tool_call(complete)
-                                history.append(tool_msg)
-                                tool_used_this_turn = True
-                        # don't emit text for tool meta
-                        continue
-
-                    # Normal text delta
-                    content_piece = delta.get("content")
-                    if content_piece:
-                        pieces.append(content_piece)
-                        yield f"data:{content_piece}\n\n"
+            for obj in iter_sse_chunks(llm_pool.stream_lines(req_payload)):
+                delta = obj["choices"][0]["delta"]
+
+                # Tool-calling branch: accumulate chunks until complete
+                if "tool_calls" in delta:
+                    for d in delta["tool_calls"]:
+                        complete = tool_buf.add_delta(d)
+                        if complete:
+                            # append the assistant's tool_calls message (required by spec)
+                            history.append({"role": "assistant", "tool_calls": [complete]})
+                            # run the tool locally
+                            tool_msg = run_tool_call(complete)
+                            history.append(tool_msg)
+                            tool_used_this_turn = True
+                    # don't emit text for tool meta
+                    continue
+
+                # Normal text delta
+                content_piece = delta.get("content")
+                if content_piece:
+                    pieces.append(content_piece)
+                    yield f"data:{content_piece}\n\n"
 
             return tool_used_this_turn
 
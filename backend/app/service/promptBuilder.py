@@ -0,0 +1,89 @@
+import re
+from typing import Dict, List, Optional, Sequence
+
+# vLLM's automatic prefix caching reuses KV blocks only for a byte-identical token prefix.
+# Layout kept here, oldest to newest:
+#   [static system prompt][history window][volatile context block]
+# - the system prompt is a constant, never formatted per request
+# - the history window start only moves in HISTORY_WINDOW_STEP jumps, so between jumps
+#   every turn's prompt extends the previous one
+# - web/RAG context is request-specific, so it goes last where it can't break the
+#   prefix of later turns, rendered in a fixed order with normalized whitespace
+SYSTEM_PROMPT = (
+    "You are a helpful assistant. Do not reveal hidden reasoning. "
+    "Almost generate at lease 30 words but at more 200 words. "
+    "If web results are provided below, prefer them for facts and cite links in markdown. "
+    "If LOCAL FILE CONTEXT is provided, ground your answer in it and quote file names when relevant."
+)
+
+HISTORY_WINDOW = 100
+HISTORY_WINDOW_STEP = 20
+
+# Stored roles that the OpenAI chat format doesn't know about
+ROLE_MAP = {"robot": "assistant"}
+
+_TRAILING_SPACE = re.compile(r"[ \t]+\n")
+
+
+def history_window_start(
+    total: int, window: int = HISTORY_WINDOW, step: int = HISTORY_WINDOW_STEP
+) -> int:
+    """
+    Offset of the first message to send. Keeps the newest messages (at most `window`)
+    but only advances in multiples of `step`.
+    """
+    if total <= window:
+        return 0
+    overflow = total - window
+    return -(-overflow // step) * step
+
+
+def _normalize_block(text: str) -> str:
+    return _TRAILING_SPACE.sub("\n", text.replace("\r\n", "\n")).strip()
+
+
+def build_volatile_context(
+    web_results: Optional[str] = None, rag_docs: Optional[Sequence[str]] = None
+) -> Optional[str]:
+    """Render per-request context as one block; same inputs always give the same bytes."""
+    sections = []
+    if web_results:
+        sections.append(
+            "Web results (use if relevant; cite the links you rely on):\n\n"
+            f"{_normalize_block(web_results)}"
+        )
+    if rag_docs:
+        docs = "\n\n".join(_normalize_block(d) for d in rag_docs if d)
+        if docs:
+            sections.append(
+                "LOCAL FILE CONTEXT (use if relevant and cite the filename):\n\n"
+                f"{docs}"
+            )
+    return "\n\n".join(sections) if sections else None
+
+
+class PromptBuilder:
+    def __init__(self, system_prompt: str = SYSTEM_PROMPT):
+        self.system_prompt = system_prompt
+
+    def prefix(self) -> List[Dict[str, str]]:
+        return [{"role": "system", "content": self.system_prompt}]
+
+    def build(
+        self,
+        history: Sequence,
+        web_results: Optional[str] = None,
+        rag_docs: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        history: DB messages (anything with .role/.content), oldest first,
+                 already cut with history_window_start().
+        """
+        messages = self.prefix()
+        messages.extend(
+            {"role": ROLE_MAP.get(m.role, m.role), "content": m.content} for m in history
+        )
+        volatile = build_volatile_context(web_results=web_results, rag_docs=rag_docs)
+        if volatile:
+            messages.append({"role": "system", "content": volatile})
+        return messages
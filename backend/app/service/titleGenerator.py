@@ -0,0 +1,213 @@
+"""
+Session titles generated off the request path.
+
+New sessions are collected for TITLE_BATCH_WAIT_S (or until TITLE_BATCH_SIZE
+are pending) and titled together: one short non-streaming completion that
+titles every session in the batch, or, in extractive mode or when the model
+is unavailable, a cleaned-up first sentence of the first message. Titles are
+only written to sessions still carrying the default name, so a rename made
+in the meantime wins.
+"""
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+from decouple import config
+from sqlalchemy.orm import Session
+
+from app.core.jobQueue import job_queue
+from app.db.repository.chatRepo import ChatSessionRepository
+
+# "llm" batches sessions into one completion; "extractive" never calls the model
+TITLE_MODE = config("TITLE_MODE", default="llm")
+TITLE_BATCH_SIZE = config("TITLE_BATCH_SIZE", default=8, cast=int)
+TITLE_BATCH_WAIT_S = config("TITLE_BATCH_WAIT_S", default=2.0, cast=float)
+TITLE_MAX_WORDS = 6
+TITLE_MAX_CHARS = 60
+# Characters of each first message shown to the model
+TITLE_SOURCE_CHARS = 300
+
+TITLE_SYSTEM_PROMPT = (
+    "You write short titles for chat conversations. For each numbered first message, "
+    f"reply with a title of at most {TITLE_MAX_WORDS} words on its own line as `<number>: <title>`. "
+    "No quotes, no trailing punctuation, nothing else."
+)
+
+_CODE_BLOCK = re.compile(r"```.*?```", re.S)
+_MARKUP = re.compile(r"[`*_#>\[\]()]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s|\n")
+_FILLER = re.compile(
+    r"^(?:(?:hi|hello|hey|please|pls|so|ok|okay|can you|could you|would you|will you|"
+    r"i want to|i need to|i'd like to|help me|tell me)\b[\s,!.:]*)+",
+    re.I,
+)
+_THINK = re.compile(r"<think>.*?</think>", re.S)
+_NUMBERED = re.compile(r"^\s*(\d+)\s*[.:)\-]\s*(.+?)\s*$")
+
+
+def _clamp(title: str) -> str:
+    title = title.strip().strip("\"'").rstrip(" ?.!,:;").strip()
+    if len(title) > TITLE_MAX_CHARS:
+        title = title[:TITLE_MAX_CHARS].rsplit(" ", 1)[0]
+    return title
+
+
+def extractive_title(text: str) -> str:
+    """First sentence of the message without markup or conversational filler, a few words long."""
+    text = _MARKUP.sub(" ", _CODE_BLOCK.sub(" ", text or ""))
+    text = _FILLER.sub("", text.strip())
+    first = _SENTENCE_END.split(text, maxsplit=1)[0]
+    title = _clamp(" ".join(first.split()[:TITLE_MAX_WORDS]))
+    return title[:1].upper() + title[1:]
+
+
+def build_title_payload(model: str, messages: List[str]) -> Dict:
+    numbered = "\n".join(
+        f"{i}. {' '.join(text[:TITLE_SOURCE_CHARS].split())}" for i, text in enumerate(messages, start=1)
+    )
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": TITLE_SYSTEM_PROMPT},
+            {"role": "user", "content": numbered},
+        ],
+        "chat_template_kwargs": {"enable_thinking": False},
+        "temperature": 0.3,
+        "max_tokens": 24 * len(messages),
+    }
+
+
+def parse_titles(content: str, count: int) -> Dict[int, str]:
+    """{position (1-based): title} for the well-formed lines of the model's answer."""
+    titles = {}
+    for line in _THINK.sub("", content or "").splitlines():
+        match = _NUMBERED.match(line)
+        if not match:
+            continue
+        n, title = int(match.group(1)), _clamp(match.group(2))
+        if 1 <= n <= count and title and n not in titles:
+            titles[n] = title
+    return titles
+
+
+def _default_complete(payload: Dict) -> Dict:
+    from app.core.scheduler import scheduler
+    from app.service.chatService import llm_pool
+    # Take a slot of the non-interactive class: titles never hold up a chat turn
+    with scheduler.slot(mode=1):
+        return llm_pool.complete(payload, timeout_s=15.0)
+
+
+def _default_model() -> str:
+    from app.service.chatService import ROBOT_MODEL
+    return ROBOT_MODEL
+
+
+def _default_session_factory() -> Session:
+    from app.core.database import SessionLocal
+    return SessionLocal()
+
+
+class TitleGenerator:
+    def __init__(
+        self,
+        mode: str = TITLE_MODE,
+        batch_size: int = TITLE_BATCH_SIZE,
+        batch_wait_s: float = TITLE_BATCH_WAIT_S,
+        complete_fn: Callable[[Dict], Dict] = _default_complete,
+        model_fn: Callable[[], str] = _default_model,
+        session_factory: Callable[[], Session] = _default_session_factory,
+    ):
+        self.mode = mode
+        self.batch_size = batch_size
+        self.batch_wait_s = batch_wait_s
+        self._complete_fn = complete_fn
+        self._model_fn = model_fn
+        self._session_factory = session_factory
+        self._pending: List[int] = []
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._llm_titles = 0
+        self._extractive_titles = 0
+
+    def request(self, session_id: int) -> None:
+        """Queues a session for titling; returns immediately."""
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.append(session_id)
+            full = len(self._pending) >= self.batch_size
+            if full and self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if full or self._timer is None:
+                self._timer = threading.Timer(0 if full else self.batch_wait_s, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Hands every pending session to the job queue (or titles them here if it isn't running)."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._timer = None
+        for lo in range(0, len(batch), self.batch_size):
+            session_ids = batch[lo:lo + self.batch_size]
+            if not job_queue.submit("chat.generate_titles", {"session_ids": session_ids}):
+                self.generate(session_ids)
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.flush()
+
+    def titles_for(self, first_messages: Dict[int, str]) -> Dict[int, str]:
+        """{session_id: title}: one batched completion, extractive for whatever it didn't cover."""
+        titles: Dict[int, str] = {}
+        if self.mode == "llm" and first_messages:
+            session_ids = list(first_messages)
+            try:
+                response = self._complete_fn(build_title_payload(
+                    self._model_fn(), [first_messages[sid] for sid in session_ids]
+                ))
+                content = response["choices"][0]["message"]["content"]
+                for n, title in parse_titles(content, len(session_ids)).items():
+                    titles[session_ids[n - 1]] = title
+            except Exception as e:
+                print(f"title generation failed, using extractive titles: {e}")
+        with self._lock:
+            self._llm_titles += len(titles)
+        for sid, text in first_messages.items():
+            if sid not in titles:
+                title = extractive_title(text)
+                if title:
+                    titles[sid] = title
+                    with self._lock:
+                        self._extractive_titles += 1
+        return titles
+
+    def generate(self, session_ids: List[int]) -> int:
+        """Titles the still-unnamed sessions among `session_ids`; returns how many were renamed."""
+        with self._session_factory() as db:
+            repo = ChatSessionRepository(session=db)
+            first_messages = repo.untitled_first_messages(session_ids)
+            if not first_messages:
+                return 0
+            return repo.set_default_titles(self.titles_for(first_messages))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "llm_titles_total": self._llm_titles,
+                "extractive_titles_total": self._extractive_titles,
+            }
+
+
+title_generator = TitleGenerator()
+
+
+@job_queue.handler("chat.generate_titles")
+def _generate_titles_job(payload: Dict) -> None:
+    title_generator.generate(payload["session_ids"])
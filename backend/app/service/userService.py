@@ -1,13 +1,16 @@
 from app.db.repository.userRepo import UserRepository
+from app.db.repository.tokenRepo import TokenRepository
 from app.db.schema.user import UserOutput, UserInCreate, UserInLogin, UserWithToken
 from app.core.security.hashHelper import HashHelper
-from app.core.security.authHandler import AuthHandler
+from app.core.security.authHandler import AuthHandler, JWT_ACCESS_TOKEN_TTL
+from app.core.security.tokenRevocation import revocations
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
 class UserService:
     def __init__(self, session : Session):
         self.__userRepository = UserRepository(session=session)
+        self.__tokenRepository = TokenRepository(session=session)
     
     def signup(self, user_details : UserInCreate) -> UserOutput:
         if self.__userRepository.user_exist_by_email(email=user_details.email):
@@ -23,11 +26,43 @@ class UserService:
         
         user = self.__userRepository.get_user_by_email(email=login_details.email)
         if HashHelper.verify_password(plain_password=login_details.password, hashed_password=user.password):
-            token = AuthHandler.sign_jwt(user_id=user.id)
-            if token:
-                return UserWithToken(token=token)
-            raise HTTPException(status_code=500, detail="Unable to process request")
+            return self.__issue_tokens(user)
         raise HTTPException(status_code=400, detail="Please check your Credentials")
+
+    def __issue_tokens(self, user) -> UserWithToken:
+        token = AuthHandler.sign_jwt(user_id=user.id, username=user.username, email=user.email)
+        if token:
+            return UserWithToken(
+                token=token,
+                refresh_token=AuthHandler.sign_refresh_token(user_id=user.id),
+                expires_in=JWT_ACCESS_TOKEN_TTL,
+            )
+        raise HTTPException(status_code=500, detail="Unable to process request")
+
+    def refresh(self, refresh_token : str) -> UserWithToken:
+        """
+        Swaps a refresh token for a new access/refresh pair. The old refresh token
+        is revoked (rotation), so a stolen one works at most once.
+        """
+        claims = AuthHandler.decode_refresh_token(token=refresh_token)
+        if not claims or revocations.is_revoked(claims["jti"], repo=self.__tokenRepository):
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        user = self.__userRepository.get_user_by_id(user_id=claims["user_id"])
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        # the insert is the claim: of two concurrent refreshes only one succeeds
+        if not self.__tokenRepository.revoke(jti=claims["jti"], user_id=user.id, expires_at=claims["exp"]):
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        revocations.add(claims["jti"], claims["exp"], repo=self.__tokenRepository)
+        return self.__issue_tokens(user)
+
+    def logout(self, refresh_token : str) -> None:
+        """Revokes a refresh token; its access tokens stay valid until they expire."""
+        claims = AuthHandler.decode_refresh_token(token=refresh_token)
+        if not claims:
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        if self.__tokenRepository.revoke(jti=claims["jti"], user_id=claims["user_id"], expires_at=claims["exp"]):
+            revocations.add(claims["jti"], claims["exp"], repo=self.__tokenRepository)
     
     def get_user_by_id(self, user_id : int):
         user = self.__userRepository.get_user_by_id(user_id=user_id)
@@ -1,8 +1,15 @@
 # app/services/web_search.py
 import httpx
+from decouple import config
+
+from app.core.cache.ttlCache import TTLCache
 
 SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
 
+# Same query within the TTL reuses the previous SerpAPI answer; off unless set (e.g. 600)
+WEB_SEARCH_CACHE_TTL = config("WEB_SEARCH_CACHE_TTL", default=0, cast=int)
+_search_cache = TTLCache("web_search", max_entries=512, ttl_s=WEB_SEARCH_CACHE_TTL)
+
 def web_search_summary(
     query: str,
     max_results: int = 5,
@@ -19,6 +26,11 @@ def web_search_summary(
     if not (SERPAPI_KEY and query.strip()):
         return ""
 
+    cache_key = (query.strip(), max_results, engine, hl, gl)
+    cached = _search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     params = {
         "engine": engine,
         "q": query,
@@ -53,4 +65,7 @@ def web_search_summary(
         if url:
             bullets.append(f"- [{title}]({url}) — {snippet}")
 
-    return "\n".join(bullets)
+    summary = "\n".join(bullets)
+    if summary:
+        _search_cache.set(cache_key, summary)
+    return summary
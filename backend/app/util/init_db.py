@@ -1,6 +1,13 @@
-from app.core.database import Base, engine
+from app.core.database import Base, engine, SessionLocal
 from app.db.models import user
 from app.db.models import chat
+from app.util.sessionCounters import ensure_counter_columns, backfill
+from app.util.searchIndex import ensure_search_index
 
 def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    # Databases created before the session counters existed
+    if ensure_counter_columns(engine):
+        with SessionLocal() as session:
+            backfill(session)
+    ensure_search_index(engine)
\ No newline at end of file
@@ -25,7 +25,12 @@ def get_current_user(
 
     payload = AuthHandler.decode_jwt(token=authorization[len(AUTH_PREFIX):])
 
+    if payload and payload.get("username") and payload.get("email"):
+        # Access tokens carry the profile, so the hot path needs no DB read
+        return UserOutput(id=payload["user_id"], username=payload["username"], email=payload["email"])
+
     if payload and payload["user_id"]:
+        # Older tokens only carry the id
         try:
             user = UserService(session=session).get_user_by_id(payload["user_id"])
             return UserOutput(
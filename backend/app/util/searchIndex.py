@@ -0,0 +1,68 @@
+"""
+Full-text index over messages.content, created next to the ORM tables.
+
+- Postgres: a generated tsvector column (messages.search_vector) with a GIN index.
+- SQLite:   an external-content FTS5 table (messages_fts) kept in sync by triggers.
+
+The index lives outside the ORM models on purpose: the column/table only exists
+on the matching backend, and inserts (ORM, bulk INSERT, COPY) never touch it.
+"""
+from decouple import config
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+# Postgres text search configuration; "simple" doesn't stem, which suits mixed-language chats
+SEARCH_TS_CONFIG = config("SEARCH_TS_CONFIG", default="simple")
+
+SQLITE_FTS_TABLE = "messages_fts"
+
+_SQLITE_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE}
+        USING fts5(content, content='messages', content_rowid='id', tokenize='unicode61')""",
+    f"""CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END""",
+)
+
+
+def _ensure_postgres(conn: Connection) -> bool:
+    conn.execute(text(
+        "ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_TS_CONFIG}', coalesce(content, ''))) STORED"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_messages_search ON messages USING GIN (search_vector)"))
+    return True
+
+
+def _ensure_sqlite(conn: Connection) -> bool:
+    existed = inspect(conn).has_table(SQLITE_FTS_TABLE)
+    for ddl in _SQLITE_DDL:
+        conn.execute(text(ddl))
+    if not existed:
+        # index messages written before the FTS table existed
+        conn.execute(text(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')"))
+    return True
+
+
+def ensure_search_index(bind) -> bool:
+    """
+    Idempotently creates the index for the bound database. Accepts an Engine or a
+    Connection (tests run it inside their rolled-back transaction). Returns False
+    for backends without full-text support.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            return ensure_search_index(conn)
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        return _ensure_postgres(bind)
+    if dialect == "sqlite":
+        return _ensure_sqlite(bind)
+    return False
@@ -0,0 +1,108 @@
+"""
+Backfill and consistency checks for ChatSession.message_count / last_message_at.
+
+    python -m app.util.sessionCounters          # report drifted sessions
+    python -m app.util.sessionCounters --fix    # recompute them
+"""
+import argparse
+from typing import List
+
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.orm import Session
+
+from app.db.models.chat import ChatSession, Message
+
+
+def _actual_count():
+    return (
+        select(func.count(Message.id))
+        .where(Message.session_id == ChatSession.id)
+        .correlate(ChatSession)
+        .scalar_subquery()
+    )
+
+
+def _actual_last():
+    return (
+        select(func.max(Message.create_date))
+        .where(Message.session_id == ChatSession.id)
+        .correlate(ChatSession)
+        .scalar_subquery()
+    )
+
+
+def find_drift(session: Session, limit: int = 1000) -> List[Row]:
+    """Sessions whose stored counters disagree with their messages."""
+    actual_count = _actual_count()
+    actual_last = _actual_last()
+    q = (
+        select(
+            ChatSession.id,
+            ChatSession.message_count,
+            actual_count.label("actual_count"),
+            ChatSession.last_message_at,
+            actual_last.label("actual_last_message_at"),
+        )
+        .where(
+            (ChatSession.message_count != actual_count)
+            | (ChatSession.last_message_at.is_(None) != actual_last.is_(None))
+            | (ChatSession.last_message_at != actual_last)
+        )
+        .order_by(ChatSession.id)
+        .limit(limit)
+    )
+    return list(session.execute(q).all())
+
+
+def backfill(session: Session) -> int:
+    """Recomputes the counters of every session in one statement; returns rows updated."""
+    result = session.execute(
+        update(ChatSession).values(message_count=_actual_count(), last_message_at=_actual_last()),
+        execution_options={"synchronize_session": False},
+    )
+    session.commit()
+    return result.rowcount
+
+
+def ensure_counter_columns(engine: Engine) -> bool:
+    """
+    create_all() doesn't alter existing tables: add the counter columns and indexes
+    to a pre-existing chat_sessions table. Returns True if columns were added
+    (and so need a backfill).
+    """
+    columns = {c["name"] for c in inspect(engine).get_columns(ChatSession.__tablename__)}
+    added = False
+    with engine.begin() as conn:
+        if "message_count" not in columns:
+            conn.execute(text("ALTER TABLE chat_sessions ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0"))
+            added = True
+        if "last_message_at" not in columns:
+            column_type = ChatSession.__table__.c.last_message_at.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE chat_sessions ADD COLUMN last_message_at {column_type}"))
+            added = True
+    for table in (ChatSession.__table__, Message.__table__):
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    return added
+
+
+def main(argv=None):
+    from app.core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fix", action="store_true", help="recompute counters for every session")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as session:
+        drift = find_drift(session)
+        for row in drift[:20]:
+            print(f"session {row.id}: count {row.message_count} (actual {row.actual_count}), "
+                  f"last {row.last_message_at} (actual {row.actual_last_message_at})")
+        print(f"{len(drift)} session(s) out of sync")
+        if args.fix and drift:
+            print(f"backfilled {backfill(session)} session(s)")
+
+
+if __name__ == "__main__":
+    main()
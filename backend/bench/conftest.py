@@ -0,0 +1,94 @@
+"""
+Fixtures for the pytest-benchmark suite (bench/test_*Benchmarks.py).
+
+The suite is kept out of the default test run (pytest.ini: testpaths = test).
+Run it from backend/:
+
+    pip install pytest-benchmark
+    # compare against the committed bench/baseline.json (see benchmark.ini for the threshold)
+    python -m pytest -c benchmark.ini
+    # refresh the baseline after an intended change, with the gate's own options
+    python -m pytest -c benchmark.ini --benchmark-json=bench/baseline.json
+
+Timings are only comparable on the same machine, so refresh the baseline where
+the gate runs. By default the data lives in a temporary SQLite file; set
+BENCH_DATABASE_URL (e.g. postgresql://user:pw@localhost:5432/bench) to run against
+Postgres. BENCH_MESSAGES sets the size of the large seeded session.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.db.models.user import User
+from app.db.models.chat import ChatSession, Message
+from app.util.sessionCounters import backfill
+
+BENCH_MESSAGES = int(os.environ.get("BENCH_MESSAGES", "5000"))
+SEED_CHUNK = 1000
+
+
+@pytest.fixture(scope="session")
+def bench_engine(tmp_path_factory):
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if url:
+        engine = create_engine(url)
+    else:
+        path = tmp_path_factory.mktemp("bench") / "bench.db"
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def seeded(bench_engine):
+    """
+    One user with a large session (BENCH_MESSAGES alternating user/robot turns)
+    and a short one (20 messages). Returns their ids.
+    """
+    Session = sessionmaker(bind=bench_engine)
+    with Session() as db:
+        user = User(username="bench", email="bench@example.com", password="x")
+        db.add(user)
+        db.flush()
+        large = ChatSession(user_id=user.id, name="large")
+        small = ChatSession(user_id=user.id, name="small")
+        db.add_all([large, small])
+        db.flush()
+
+        start = datetime.now(timezone.utc) - timedelta(days=30)
+        for session_obj, count in ((large, BENCH_MESSAGES), (small, 20)):
+            rows = [
+                {
+                    "session_id": session_obj.id,
+                    "role": "user" if i % 2 == 0 else "robot",
+                    "content": f"message {i} " + "lorem ipsum dolor sit amet " * (3 if i % 2 == 0 else 20),
+                    "create_date": start + timedelta(seconds=i),
+                }
+                for i in range(count)
+            ]
+            for lo in range(0, len(rows), SEED_CHUNK):
+                db.execute(insert(Message), rows[lo:lo + SEED_CHUNK])
+        db.commit()
+        backfill(db)
+        return {"user_id": user.id, "large_session_id": large.id, "small_session_id": small.id}
+
+
+@pytest.fixture(scope="function")
+def db(bench_engine, seeded):
+    """Transactional session: whatever a benchmark writes is rolled back afterwards."""
+    connection = bench_engine.connect()
+    transaction = connection.begin()
+    session = sessionmaker(autocommit=False, autoflush=False, bind=connection)()
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
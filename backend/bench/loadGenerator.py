@@ -0,0 +1,215 @@
+"""
+Load generator for the chat backend.
+
+Each virtual user signs up (or logs in if the account exists), opens a chat session
+and sends messages to /chat/{id}/messages/stream back to back. --concurrency users run
+at once until --requests streams have finished (or --duration seconds have passed).
+
+Per stream it records:
+  - TTFT: request sent -> first `data:` frame
+  - ITL:  gaps between consecutive `data:` frames
+  - tokens (frames) and end-to-end latency
+and reports p50/p90/p99 for each plus aggregate request and token throughput.
+
+    python -m bench.mockLlmServer --port 8001 &
+    LLM_BACKENDS=http://localhost:8001/v1/chat/completions uvicorn main:app --port 8000 &
+    python -m bench.loadGenerator --base-url http://localhost:8000 --concurrency 32 --requests 500
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+
+@dataclass
+class StreamResult:
+    ok: bool
+    ttft_s: Optional[float] = None
+    itl_s: List[float] = field(default_factory=list)
+    tokens: int = 0
+    latency_s: float = 0.0
+    error: Optional[str] = None
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for no samples."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _dist(values: Sequence[float]) -> Dict[str, float]:
+    return {
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "n": len(values),
+    }
+
+
+def summarize(results: List[StreamResult], wall_s: float) -> Dict:
+    ok = [r for r in results if r.ok]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r.ok:
+            errors[r.error or "unknown"] = errors.get(r.error or "unknown", 0) + 1
+    tokens = sum(r.tokens for r in ok)
+    return {
+        "requests": len(results),
+        "succeeded": len(ok),
+        "errors": errors,
+        "wall_s": wall_s,
+        "requests_per_s": len(ok) / wall_s if wall_s else 0.0,
+        "tokens_per_s": tokens / wall_s if wall_s else 0.0,
+        "ttft_s": _dist([r.ttft_s for r in ok if r.ttft_s is not None]),
+        "itl_s": _dist([gap for r in ok for gap in r.itl_s]),
+        "latency_s": _dist([r.latency_s for r in ok]),
+        "tokens_per_stream": _dist([r.tokens for r in ok]),
+    }
+
+
+def _user_id_from_token(token: str) -> int:
+    """Login only returns the JWT; the user id is read from its (unverified) payload."""
+    payload = token.split(".")[1]
+    payload += "=" * (-len(payload) % 4)
+    return int(json.loads(base64.urlsafe_b64decode(payload))["user_id"])
+
+
+async def authenticate(client: httpx.AsyncClient, email: str, password: str) -> Dict:
+    signup = await client.post("/auth/signup", json={"username": email.split("@")[0], "email": email, "password": password})
+    if signup.status_code not in (201, 400, 409):
+        signup.raise_for_status()
+    login = await client.post("/auth/login", json={"email": email, "password": password})
+    login.raise_for_status()
+    token = login.json()["token"]
+    return {"token": token, "user_id": _user_id_from_token(token)}
+
+
+async def stream_once(client: httpx.AsyncClient, session_id: int, text: str, mode: int, headers: Dict) -> StreamResult:
+    started = time.perf_counter()
+    last = None
+    result = StreamResult(ok=False)
+    buffer = ""
+    try:
+        async with client.stream(
+            "POST", f"/chat/{session_id}/messages/stream",
+            json={"content": text, "mode": mode}, headers=headers,
+        ) as response:
+            if response.status_code != 200:
+                result.error = f"http_{response.status_code}"
+                return result
+            async for chunk in response.aiter_text():
+                buffer += chunk
+                while "\n\n" in buffer:
+                    frame, buffer = buffer.split("\n\n", 1)
+                    now = time.perf_counter()
+                    if frame.startswith("event:error"):
+                        result.error = "sse_error"
+                        return result
+                    if frame.startswith("event:done"):
+                        result.ok = True
+                        continue
+                    if not frame.startswith("data:"):
+                        continue
+                    if last is None:
+                        result.ttft_s = now - started
+                    else:
+                        result.itl_s.append(now - last)
+                    last = now
+                    result.tokens += 1
+        if not result.ok:
+            result.error = "no_done_event"
+    except httpx.HTTPError as e:
+        result.error = type(e).__name__
+    finally:
+        result.latency_s = time.perf_counter() - started
+    return result
+
+
+async def virtual_user(idx: int, args, client: httpx.AsyncClient, budget: Dict, results: List[StreamResult]):
+    email = f"{args.user_prefix}{idx}@loadtest.example.com"
+    auth = await authenticate(client, email, args.password)
+    headers = {"Authorization": f"Bearer {auth['token']}"}
+    session = await client.post("/chat", json={"user_id": auth["user_id"], "name": f"load {idx}"}, headers=headers)
+    session.raise_for_status()
+    session_id = session.json()["id"]
+
+    turn = 0
+    while budget["remaining"] > 0 and time.perf_counter() < budget["deadline"]:
+        budget["remaining"] -= 1
+        turn += 1
+        text = f"{args.prompt} (user {idx}, turn {turn})" if args.unique_prompts else args.prompt
+        results.append(await stream_once(client, session_id, text, args.mode, headers))
+        if args.turns_per_session and turn % args.turns_per_session == 0:
+            session = await client.post("/chat", json={"user_id": auth["user_id"]}, headers=headers)
+            session.raise_for_status()
+            session_id = session.json()["id"]
+
+
+async def run(args) -> Dict:
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    budget = {"remaining": args.requests, "deadline": time.perf_counter() + args.duration}
+    results: List[StreamResult] = []
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(virtual_user(i, args, client, budget, results) for i in range(args.concurrency)),
+            return_exceptions=True,
+        )
+        wall_s = time.perf_counter() - started
+    summary = summarize(results, wall_s)
+    setup_errors = [repr(o) for o in outcomes if isinstance(o, Exception)]
+    if setup_errors:
+        summary["user_errors"] = setup_errors[:5]
+    return summary
+
+
+def _print_report(summary: Dict) -> None:
+    print(f"requests      {summary['succeeded']}/{summary['requests']} ok in {summary['wall_s']:.1f}s "
+          f"({summary['requests_per_s']:.2f} req/s, {summary['tokens_per_s']:.1f} tokens/s)")
+    for key, unit, scale in (("ttft_s", "ms", 1000), ("itl_s", "ms", 1000), ("latency_s", "s", 1), ("tokens_per_stream", "", 1)):
+        d = summary[key]
+        print(f"{key:<18}p50 {d['p50'] * scale:9.1f}{unit}  p90 {d['p90'] * scale:9.1f}{unit}  "
+              f"p99 {d['p99'] * scale:9.1f}{unit}  (n={d['n']})")
+    if summary["errors"]:
+        print(f"errors        {summary['errors']}")
+    for err in summary.get("user_errors", []):
+        print(f"user setup failed: {err}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users streaming at once")
+    parser.add_argument("--requests", type=int, default=200, help="total streams to run")
+    parser.add_argument("--duration", type=float, default=600.0, help="stop after this many seconds")
+    parser.add_argument("--mode", type=int, default=0, help="0 chat, 1 think, 2 web search, 3 RAG")
+    parser.add_argument("--prompt", default="Explain how prefix caching speeds up chat completions.")
+    parser.add_argument("--unique-prompts", action="store_true", help="make every prompt distinct (defeats caching/coalescing)")
+    parser.add_argument("--turns-per-session", type=int, default=0, help="open a new session every N turns (0 = never)")
+    parser.add_argument("--user-prefix", default=f"load-{uuid.uuid4().hex[:6]}-")
+    parser.add_argument("--password", default="load-test-password")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        _print_report(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Mock OpenAI-compatible LLM server for load testing without a GPU.
+
+Speaks enough of vLLM's API for the backend: streaming and non-streaming
+/v1/chat/completions, /health, and a /metrics page with vllm:num_requests_running /
+vllm:num_requests_waiting so BackendPool's health checks work against it.
+
+Timing is simulated: first delta after --ttft seconds, then one word per token at
+--tps tokens/s (with optional jitter). Only --max-concurrency requests decode at a
+time; the rest wait, as on a saturated vLLM instance.
+
+Failure injection:
+  --fail-rate        fraction of requests answered with --fail-status before streaming
+  --midstream-rate   fraction of streams that drop the connection halfway through
+  --tool-call-rate   fraction of requests with `tools` that answer with a web_search tool call
+
+    python -m bench.mockLlmServer --port 8001 --ttft 0.25 --tps 40
+    LLM_BACKENDS=http://localhost:8001/v1/chat/completions uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncGenerator, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while streaming tokens from a mock "
+    "model that pretends to think about prefix caches schedulers and latency budgets"
+).split()
+
+
+@dataclass
+class MockConfig:
+    ttft_s: float = 0.2
+    tokens_per_s: float = 50.0
+    jitter: float = 0.1           # +/- fraction applied to every delay
+    max_tokens: int = 128         # used when the request has no max_tokens
+    max_concurrency: int = 64     # requests decoding at once; the rest queue
+    fail_rate: float = 0.0
+    fail_status: int = 503
+    midstream_rate: float = 0.0
+    tool_call_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+class MidStreamFailure(Exception):
+    pass
+
+
+def _chunk(completion_id: str, model: str, delta: Dict, finish_reason: Optional[str] = None) -> str:
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(body)}\n\n"
+
+
+def create_app(cfg: Optional[MockConfig] = None) -> FastAPI:
+    cfg = cfg or MockConfig()
+    rng = random.Random(cfg.seed)
+    slots = asyncio.Semaphore(cfg.max_concurrency)
+    state = {"running": 0, "waiting": 0, "requests": 0, "failures": 0}
+
+    app = FastAPI(title="mock-llm")
+    app.state.config = cfg
+    app.state.counters = state
+
+    def delay(base: float) -> float:
+        if base <= 0:
+            return 0.0
+        return max(0.0, base * (1 + rng.uniform(-cfg.jitter, cfg.jitter)))
+
+    def plan(body: Dict) -> Dict:
+        """Decides up front what this request will do, so stream and non-stream behave alike."""
+        want_tool = bool(body.get("tools")) and rng.random() < cfg.tool_call_rate
+        n_tokens = int(body.get("max_tokens") or cfg.max_tokens)
+        return {
+            "fail": rng.random() < cfg.fail_rate,
+            "midstream": rng.random() < cfg.midstream_rate,
+            "tool": want_tool,
+            "tokens": [WORDS[rng.randrange(len(WORDS))] for _ in range(max(n_tokens, 1))],
+            "model": body.get("model") or "mock",
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        }
+
+    async def decode(p: Dict) -> AsyncGenerator[str, None]:
+        state["waiting"] += 1
+        async with slots:
+            state["waiting"] -= 1
+            state["running"] += 1
+            try:
+                await asyncio.sleep(delay(cfg.ttft_s))
+                if p["tool"]:
+                    args = json.dumps({"query": " ".join(p["tokens"][:4])})
+                    yield {"tool_calls": [{
+                        "index": 0, "id": f"call_{p['id'][-8:]}", "type": "function",
+                        "function": {"name": "web_search", "arguments": args},
+                    }]}
+                    return
+                per_token = 1.0 / cfg.tokens_per_s if cfg.tokens_per_s > 0 else 0.0
+                half = len(p["tokens"]) // 2
+                for i, word in enumerate(p["tokens"]):
+                    if i:
+                        await asyncio.sleep(delay(per_token))
+                    if p["midstream"] and i == half:
+                        raise MidStreamFailure("injected mid-stream failure")
+                    yield {"content": word if i == 0 else f" {word}"}
+            finally:
+                state["running"] -= 1
+
+    async def stream_body(p: Dict) -> AsyncGenerator[str, None]:
+        yield _chunk(p["id"], p["model"], {"role": "assistant"})
+        try:
+            async for delta in decode(p):
+                yield _chunk(p["id"], p["model"], delta)
+        except MidStreamFailure:
+            state["failures"] += 1
+            raise
+        yield _chunk(p["id"], p["model"], {}, "tool_calls" if p["tool"] else "stop")
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        state["requests"] += 1
+        p = plan(body)
+        if p["fail"]:
+            state["failures"] += 1
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=cfg.fail_status)
+
+        if body.get("stream"):
+            return StreamingResponse(stream_body(p), media_type="text/event-stream")
+
+        content, tool_calls = [], None
+        try:
+            async for delta in decode(p):
+                if "tool_calls" in delta:
+                    tool_calls = delta["tool_calls"]
+                else:
+                    content.append(delta["content"])
+        except MidStreamFailure:
+            state["failures"] += 1
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=cfg.fail_status)
+        message = {"role": "assistant", "content": "".join(content) or None}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        return {
+            "id": p["id"],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": p["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+            "usage": {"completion_tokens": len(content)},
+        }
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/metrics")
+    async def metrics():
+        return PlainTextResponse(
+            f"vllm:num_requests_running {state['running']}\n"
+            f"vllm:num_requests_waiting {state['waiting']}\n"
+            f"mock:requests_total {state['requests']}\n"
+            f"mock:failures_total {state['failures']}\n"
+        )
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=MockConfig.ttft_s, help="seconds before the first token")
+    parser.add_argument("--tps", type=float, default=MockConfig.tokens_per_s, help="tokens per second per stream")
+    parser.add_argument("--jitter", type=float, default=MockConfig.jitter)
+    parser.add_argument("--max-tokens", type=int, default=MockConfig.max_tokens)
+    parser.add_argument("--max-concurrency", type=int, default=MockConfig.max_concurrency)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=MockConfig.fail_status)
+    parser.add_argument("--midstream-rate", type=float, default=0.0)
+    parser.add_argument("--tool-call-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    cfg = MockConfig(
+        ttft_s=args.ttft, tokens_per_s=args.tps, jitter=args.jitter, max_tokens=args.max_tokens,
+        max_concurrency=args.max_concurrency, fail_rate=args.fail_rate, fail_status=args.fail_status,
+        midstream_rate=args.midstream_rate, tool_call_rate=args.tool_call_rate, seed=args.seed,
+    )
+    uvicorn.run(create_app(cfg), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
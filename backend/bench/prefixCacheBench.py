@@ -0,0 +1,226 @@
+"""
+Prefix-cache benchmark for the chat prompt layout.
+
+Replays a synthetic multi-turn conversation (with web/RAG context on some turns)
+through three layouts:
+  - legacy: system prompt + the *oldest* 100 messages + context, robot role passed through
+            (past 100 messages the newest question is silently dropped)
+  - sliding: same, but the newest 100 messages; shifts the prefix on every turn
+  - stable: app.service.promptBuilder.PromptBuilder
+
+Offline (default) it uses a simple prefill model: every prompt is rendered in a
+ChatML-like form, the longest prefix shared with any earlier prompt + answer counts as
+cached (rounded down to whole KV blocks), and TTFT = base + uncached_tokens * per-token cost.
+
+With --endpoint it sends the prompts to an OpenAI-compatible server (vLLM or the
+bundled mock) and measures real TTFT; with --metrics-url it also reads vLLM's
+prefix cache counters before and after each layout.
+
+    python -m bench.prefixCacheBench --turns 80
+    python -m bench.prefixCacheBench --endpoint http://localhost:8000/v1/chat/completions \
+        --metrics-url http://localhost:8000/metrics
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.service.promptBuilder import (  # noqa: E402
+    PromptBuilder,
+    HISTORY_WINDOW,
+    history_window_start,
+)
+
+CHARS_PER_TOKEN = 4
+KV_BLOCK_TOKENS = 16
+# vLLM v1 and v0 metric names
+PREFIX_HIT_METRICS = ("vllm:prefix_cache_hits_total", "vllm:gpu_prefix_cache_hits_total")
+PREFIX_QUERY_METRICS = ("vllm:prefix_cache_queries_total", "vllm:gpu_prefix_cache_queries_total")
+
+LEGACY_SYSTEM_PROMPT = (
+    "You are a helpful assistant. Do not reveal hidden reasoning. "
+    "Almost generate at lease 30 words but at more 200 words"
+    "If web results are provided below, prefer them for facts and cite links in markdown. "
+    "If LOCAL FILE CONTEXT is provided, ground your answer in it and quote file names when relevant."
+)
+
+
+def _legacy(window: List[SimpleNamespace], web: Optional[str], rag: Optional[List[str]]) -> List[Dict]:
+    history = [{"role": "system", "content": LEGACY_SYSTEM_PROMPT}]
+    history.extend({"role": m.role, "content": m.content} for m in window)
+    if web:
+        history.append({"role": "system", "content": f"Web results (use if relevant; cite the links you rely on):\n\n{web}"})
+    if rag:
+        history.append({"role": "system", "content": "LOCAL FILE CONTEXT (use if relevant and cite the filename):\n\n" + "\n\n".join(rag)})
+    return history
+
+
+def legacy_layout(stored: List[SimpleNamespace], web: Optional[str], rag: Optional[List[str]]) -> List[Dict]:
+    return _legacy(stored[:HISTORY_WINDOW], web, rag)
+
+
+def sliding_layout(stored: List[SimpleNamespace], web: Optional[str], rag: Optional[List[str]]) -> List[Dict]:
+    return _legacy(stored[-HISTORY_WINDOW:], web, rag)
+
+
+def stable_layout(stored: List[SimpleNamespace], web: Optional[str], rag: Optional[List[str]]) -> List[Dict]:
+    start = history_window_start(len(stored))
+    return PromptBuilder().build(stored[start:start + HISTORY_WINDOW], web_results=web, rag_docs=rag)
+
+
+LAYOUTS = {"legacy": legacy_layout, "sliding": sliding_layout, "stable": stable_layout}
+
+
+def render(messages: List[Dict]) -> str:
+    """Approximation of the ChatML template Qwen uses."""
+    return "".join(f"<|im_start|>{m['role']}\n{m['content']}<|im_end|>\n" for m in messages)
+
+
+def shared_prefix_len(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def synthetic_turn(i: int) -> Tuple[str, Optional[str], Optional[List[str]]]:
+    user = f"Question {i}: explain topic number {i} in a few sentences."
+    web = f"- [Result {i}](https://example.com/{i}) — snippet about topic {i}" if i % 3 == 1 else None
+    rag = [f"File: notes_{i}.txt\nLocal notes for topic {i}."] if i % 3 == 2 else None
+    return user, web, rag
+
+
+def synthetic_answer(i: int) -> str:
+    return f"Answer {i}. " + "This is a plausible model answer. " * 6
+
+
+class PrefillModel:
+    """Prefix-cache simulator: cached tokens are free, the rest cost prefill time."""
+
+    def __init__(self, base_ms: float, per_token_ms: float):
+        self.base_ms = base_ms
+        self.per_token_ms = per_token_ms
+        self.seen: List[str] = []
+
+    def run(self, prompt: str) -> Tuple[int, int, float]:
+        best = max((shared_prefix_len(prompt, p) for p in self.seen), default=0)
+        total_tokens = len(prompt) // CHARS_PER_TOKEN
+        cached_tokens = (best // CHARS_PER_TOKEN) // KV_BLOCK_TOKENS * KV_BLOCK_TOKENS
+        ttft_ms = self.base_ms + (total_tokens - cached_tokens) * self.per_token_ms
+        return cached_tokens, total_tokens, ttft_ms
+
+    def remember(self, prompt: str, answer: str) -> None:
+        # generated tokens stay in the KV cache too
+        self.seen.append(f"{prompt}<|im_start|>assistant\n{answer}<|im_end|>\n")
+
+
+def scrape_prefix_counters(metrics_url: str) -> Optional[Tuple[float, float]]:
+    import httpx
+    text = httpx.get(metrics_url, timeout=10).text
+    values: Dict[str, float] = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        m = re.match(r"^([a-zA-Z_:]+)(\{[^}]*\})?\s+([0-9.eE+-]+)$", line)
+        if m:
+            values[m.group(1)] = values.get(m.group(1), 0.0) + float(m.group(3))
+    hits = next((values[n] for n in PREFIX_HIT_METRICS if n in values), None)
+    queries = next((values[n] for n in PREFIX_QUERY_METRICS if n in values), None)
+    if hits is None or queries is None:
+        return None
+    return hits, queries
+
+
+def stream_ttft(endpoint: str, model: str, messages: List[Dict], max_tokens: int) -> Tuple[float, str]:
+    import httpx
+    payload = {"model": model, "messages": messages, "stream": True, "max_tokens": max_tokens, "temperature": 0}
+    start = time.perf_counter()
+    ttft = None
+    pieces = []
+    with httpx.stream("POST", endpoint, json=payload, timeout=120) as r:
+        for line in r.iter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data.strip() == "[DONE]":
+                break
+            delta = json.loads(data)["choices"][0]["delta"].get("content")
+            if delta:
+                if ttft is None:
+                    ttft = (time.perf_counter() - start) * 1000
+                pieces.append(delta)
+    return (ttft if ttft is not None else (time.perf_counter() - start) * 1000), "".join(pieces)
+
+
+def run_layout(name: str, args) -> Dict:
+    layout = LAYOUTS[name]
+    stored: List[SimpleNamespace] = []
+    sim = PrefillModel(args.base_ms, args.per_token_ms)
+    ttfts: List[float] = []
+    cached = total = dropped = 0
+    before = scrape_prefix_counters(args.metrics_url) if args.metrics_url else None
+
+    for i in range(args.turns):
+        user, web, rag = synthetic_turn(i)
+        stored.append(SimpleNamespace(role="user", content=user))
+        messages = layout(stored, web, rag)
+        if not any(m["content"] == user for m in messages):
+            dropped += 1
+
+        prompt = render(messages)
+        c, t, sim_ttft = sim.run(prompt)
+        cached += c
+        total += t
+        if args.endpoint:
+            ttft, answer = stream_ttft(args.endpoint, args.model, messages, args.max_tokens)
+        else:
+            ttft, answer = sim_ttft, synthetic_answer(i)
+        ttfts.append(ttft)
+        sim.remember(prompt, answer)
+        stored.append(SimpleNamespace(role="robot", content=answer))
+
+    result = {
+        "layout": name,
+        "turns": args.turns,
+        "simulated_prefix_hit_rate": round(cached / total, 4) if total else 0.0,
+        "turns_missing_newest_question": dropped,
+        "ttft_ms_p50": round(statistics.median(ttfts), 2),
+        "ttft_ms_p95": round(sorted(ttfts)[int(0.95 * (len(ttfts) - 1))], 2),
+        "ttft_source": "endpoint" if args.endpoint else "simulated",
+    }
+    if before is not None:
+        after = scrape_prefix_counters(args.metrics_url)
+        if after is not None:
+            dq = after[1] - before[1]
+            result["vllm_prefix_hit_rate"] = round((after[0] - before[0]) / dq, 4) if dq else 0.0
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=80)
+    parser.add_argument("--layout", choices=["legacy", "sliding", "stable", "all"], default="all")
+    parser.add_argument("--endpoint", default=None, help="OpenAI-compatible /v1/chat/completions URL")
+    parser.add_argument("--metrics-url", default=None, help="vLLM /metrics URL for prefix cache counters")
+    parser.add_argument("--model", default="Qwen/Qwen3-0.6B")
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--base-ms", type=float, default=15.0, help="simulated fixed TTFT cost")
+    parser.add_argument("--per-token-ms", type=float, default=0.05, help="simulated prefill cost per uncached token")
+    args = parser.parse_args(argv)
+
+    names = list(LAYOUTS) if args.layout == "all" else [args.layout]
+    for name in names:
+        print(json.dumps(run_layout(name, args)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
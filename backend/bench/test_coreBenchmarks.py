@@ -0,0 +1,56 @@
+import json
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app.core.security.hashHelper import HashHelper
+from app.core.security import authHandler
+from app.core.security.authHandler import AuthHandler
+from app.core.llm.sseParser import iter_content_deltas
+
+PASSWORD = "correct horse battery staple"
+
+
+def test_password_hash(benchmark):
+    """bcrypt is deliberately slow; a few rounds are enough to catch cost-factor changes."""
+    hashed = benchmark.pedantic(HashHelper.get_password_hash, args=(PASSWORD,), rounds=5, warmup_rounds=1, iterations=1)
+    assert hashed.startswith("$2")
+
+
+def test_password_verify(benchmark):
+    hashed = HashHelper.get_password_hash(PASSWORD)
+    ok = benchmark.pedantic(HashHelper.verify_password, args=(PASSWORD, hashed), rounds=5, warmup_rounds=1, iterations=1)
+    assert ok is True
+
+
+def test_decode_jwt_verify(benchmark):
+    """Full signature verification (verified-token cache emptied before every call)."""
+    token = AuthHandler.sign_jwt(user_id=42)
+
+    def decode():
+        authHandler._verified_tokens.clear()
+        return AuthHandler.decode_jwt(token)
+
+    assert benchmark(decode)["user_id"] == 42
+
+
+def test_decode_jwt_cached(benchmark):
+    token = AuthHandler.sign_jwt(user_id=42)
+    AuthHandler.decode_jwt(token)
+    assert benchmark(AuthHandler.decode_jwt, token)["user_id"] == 42
+
+
+def _stream_lines(n_tokens: int):
+    lines = []
+    for i in range(n_tokens):
+        chunk = {"id": "c", "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": f" tok{i}"}}]}
+        lines.append(f"data: {json.dumps(chunk)}")
+        lines.append("")
+    lines.append("data: [DONE]")
+    return lines
+
+
+def test_sse_parser_1k_tokens(benchmark):
+    lines = _stream_lines(1000)
+    deltas = benchmark(lambda: list(iter_content_deltas(lines)))
+    assert len(deltas) == 1000
@@ -0,0 +1,85 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
+from app.db.schema.chat import ChatSessionInCreate, ChatSessionOutput, MessageInCreate
+from app.service.chatService import ChatSessionService
+from app.service.promptBuilder import HISTORY_WINDOW, history_window_start
+from bench.conftest import BENCH_MESSAGES
+
+
+def test_create_message_auto_title(benchmark, db, seeded):
+    """First message of a fresh session: insert + counter bump + auto-title in one commit."""
+    sessions = ChatSessionRepository(session=db)
+    messages = MessageRepository(session=db)
+
+    def setup():
+        chat = sessions.create_session(ChatSessionInCreate(user_id=seeded["user_id"]))
+        return (MessageInCreate(session_id=chat.id, role="user", content="How do I tune Postgres?"),), {}
+
+    msg = benchmark.pedantic(lambda data: messages.create_message(data=data), setup=setup, rounds=200, warmup_rounds=20)
+    assert msg.session.name == "How do I t"
+
+
+def test_create_message_in_large_session(benchmark, db, seeded):
+    """Appending to a long session; the denormalized counter keeps this independent of its size."""
+    messages = MessageRepository(session=db)
+    data = MessageInCreate(session_id=seeded["large_session_id"], role="user", content="one more question")
+    benchmark(messages.create_message, data=data)
+
+
+def test_list_messages_history_window(benchmark, db, seeded):
+    """The window the chat stream loads on every turn of a long session."""
+    messages = MessageRepository(session=db)
+    offset = history_window_start(BENCH_MESSAGES)
+    rows = benchmark(
+        messages.list_messages_by_session,
+        session_id=seeded["large_session_id"], limit=HISTORY_WINDOW, offset=offset, ascending=True,
+    )
+    assert len(rows) == min(HISTORY_WINDOW, BENCH_MESSAGES - offset)
+
+
+def test_list_messages_full_session(benchmark, db, seeded):
+    messages = MessageRepository(session=db)
+    rows = benchmark(
+        messages.list_messages_by_session,
+        session_id=seeded["large_session_id"], limit=BENCH_MESSAGES, offset=0,
+    )
+    assert len(rows) == BENCH_MESSAGES
+
+
+def test_get_session_with_messages(benchmark, db, seeded):
+    """Load plus response-model serialization, as GET /chat/{id}/with_messages does."""
+    service = ChatSessionService(session=db)
+
+    def load():
+        db.expire_all()  # don't let the identity map turn later rounds into no-ops
+        return ChatSessionOutput.model_validate(service.get_session_with_messages(seeded["large_session_id"]))
+
+    out = benchmark(load)
+    assert len(out.messages) == BENCH_MESSAGES
+
+
+def test_export_session_ndjson(benchmark, db, seeded):
+    """Streaming export of the large session, consumed end to end."""
+    service = ChatSessionService(session=db)
+
+    def export():
+        return sum(len(chunk) for chunk in service.export_session(seeded["large_session_id"], fmt="ndjson"))
+
+    assert benchmark(export) > 0
+
+
+def test_bulk_create_1k_messages(benchmark, db, seeded):
+    """Bulk import of 1000 messages into a fresh session (chunked INSERT / COPY)."""
+    sessions = ChatSessionRepository(session=db)
+    messages = MessageRepository(session=db)
+    items = [{"role": "user" if i % 2 == 0 else "robot", "content": f"imported {i}"} for i in range(1000)]
+
+    def setup():
+        chat = sessions.create_session(ChatSessionInCreate(user_id=seeded["user_id"]))
+        return (chat.id,), {}
+
+    inserted = benchmark.pedantic(lambda session_id: messages.bulk_create_messages(session_id, items), setup=setup, rounds=20, warmup_rounds=2)
+    assert inserted == 1000
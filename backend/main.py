@@ -1,4 +1,5 @@
 from fastapi import FastAPI, Depends
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.util.init_db import create_tables
@@ -6,19 +7,95 @@ from app.routers.auth import authRouter
 from app.routers.chat import chatRouter, messagesRouter
 from app.util.protectRoute import get_current_user
 from app.db.schema.user import UserOutput
+from app.core.cache.semanticCache import semantic_cache
+from app.core.historyIndex import history_index
+from app.core.jobQueue import job_queue
+from app.service.titleGenerator import title_generator
+from app.core.cache.sessionWindowCache import session_window_cache
+from app.service.chatService import llm_pool
+from app.core.admission import admission
+from app.core.scheduler import scheduler
+from app.core.llm.coalescer import coalescer
+from app.core.database import engine
+from app.core.metrics import registry, MetricsMiddleware
+from app.core.security.authHandler import verifier
+from app.core.queryCounter import QueryCounterMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app : FastAPI):
     # Intializes the db tables when the application starts up
     create_tables()
+    llm_pool.start_health_checks()
+    history_index.start()
+    job_queue.start()
     yield # seperation point
     # Application is closing
+    llm_pool.stop_health_checks()
+    title_generator.stop()
+    job_queue.stop()
+    history_index.stop()
 
 
 app = FastAPI(lifespan=lifespan)
 
 
+def runtime_metrics():
+    """Scrape-time gauges from the DB pool and the generation pipeline's own stats()."""
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        yield ("db_pool_connections", "gauge", "SQLAlchemy pool connections by state.", [
+            ({"state": "checked_out"}, pool.checkedout()),
+            ({"state": "checked_in"}, pool.checkedin()),
+            ({"state": "overflow"}, max(pool.overflow(), 0)),
+        ])
+        yield ("db_pool_size", "gauge", "Configured SQLAlchemy pool size.", [({}, pool.size())])
+
+    adm = admission.stats()
+    yield ("admission_in_flight", "gauge", "Admitted streams in flight.", [({}, adm["in_flight"])])
+    yield ("admission_queue_depth", "gauge", "Requests waiting for admission.", [({}, adm["queue_depth"])])
+    yield ("admission_admitted_total", "counter", "Requests admitted.", [({}, adm["admitted_total"])])
+    yield ("admission_rejected_total", "counter", "Requests rejected by reason.",
+           [({"reason": r}, n) for r, n in adm["rejected_total"].items()])
+    if "cluster_in_flight" in adm:
+        yield ("admission_cluster_in_flight", "gauge", "Admitted streams in flight across all workers.",
+               [({}, adm["cluster_in_flight"])])
+
+    sched = scheduler.stats()
+    yield ("scheduler_running", "gauge", "Upstream generations running by class.",
+           [({"class": c}, n) for c, n in sched["running"].items()])
+    yield ("scheduler_queued", "gauge", "Generations waiting for a slot by class/tier.",
+           [({"queue": q}, n) for q, n in sched["queued"].items()])
+
+    co = coalescer.stats()
+    yield ("coalescer_in_flight", "gauge", "Distinct upstream streams being shared.", [({}, co["in_flight"])])
+    yield ("coalescer_coalesced_total", "counter", "Requests served by joining an in-flight stream.", [({}, co["coalesced_total"])])
+
+    jobs = job_queue.stats()
+    yield ("job_queue_depth", "gauge", "Background jobs queued or running.", [({}, jobs["depth"])])
+    yield ("job_queue_rejected_total", "counter", "Jobs run inline because the queue was full.", [({}, jobs["rejected_total"])])
+
+    window = session_window_cache.stats()
+    yield ("session_window_cache_sessions", "gauge", "Sessions with a cached history window.", [({}, window["sessions"])])
+    yield ("session_window_cache_bytes", "gauge", "Approximate memory held by cached history windows.", [({}, window["bytes"])])
+
+    hist = history_index.stats()
+    yield ("history_index_queued", "gauge", "Messages/sessions waiting to be embedded.", [({}, hist["queued"])])
+    yield ("history_index_indexed_total", "counter", "Messages embedded into the history index.", [({}, hist["indexed_total"])])
+    yield ("history_index_dropped_total", "counter", "Index jobs dropped because the queue was full.", [({}, hist["dropped_total"])])
+
+    # 0 once tokens are being verified means every one is rejected as unknown_key
+    yield ("auth_verification_keys", "gauge", "JWT verification keys currently loaded.", [({}, len(verifier.keys))])
+
+    yield ("llm_backend_outstanding", "gauge", "Requests outstanding per LLM backend.",
+           [({"backend": b["url"], "state": b["state"]}, b["outstanding"]) for b in llm_pool.snapshot()])
+
+
+registry.register_collector(runtime_metrics)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryCounterMiddleware)
+
+
 origins = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -43,6 +120,36 @@ def health():
     return {"status" : "Running...."}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"semantic" : semantic_cache.stats()}
+
+
+@app.get("/llm/backends")
+def llm_backends():
+    return {"backends" : llm_pool.snapshot()}
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.stats()
+
+
+@app.get("/scheduler/stats")
+def scheduler_stats():
+    return {**scheduler.stats(), "coalescing" : coalescer.stats()}
+
+
+@app.get("/jobs/stats")
+def job_stats():
+    return {**job_queue.stats(), "titles" : title_generator.stats()}
+
+
 @app.get("/protected")
 def read_protected(user : UserOutput = Depends(get_current_user)):
     return {"data" : user}
\ No newline at end of file
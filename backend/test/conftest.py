@@ -1,10 +1,15 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 
 from main import app
 from app.core.database import Base, get_db
+from app.util.searchIndex import ensure_search_index, SQLITE_FTS_TABLE
+from app.core.cache.sessionWindowCache import session_window_cache
+from app.db.repository.chatRepo import session_owners
+from app.db.schema.user import UserOutput
+from app.util.protectRoute import get_current_user
 
 # Use an in-memory SQLite database for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -20,9 +25,24 @@ def db_engine():
     Provides a database engine for the entire test session.
     """
     Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
     yield engine
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}"))
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def clear_session_window_cache():
+    """
+    Session ids are reused once a test's transaction rolls back, so cached
+    history windows must not outlive the test.
+    """
+    session_window_cache.clear()
+    session_owners.clear()
+    yield
+    session_window_cache.clear()
+    session_owners.clear()
+
 @pytest.fixture(scope="function")
 def db_session(db_engine):
     """
@@ -51,4 +71,16 @@ def client(db_session):
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as test_client:
         yield test_client
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+
+@pytest.fixture
+def login_as(client):
+    """
+    Makes the client's requests authenticate as the given user id, e.g.
+    login_as(5) before calling the chat routes of user 5.
+    """
+    def login(user_id: int):
+        app.dependency_overrides[get_current_user] = lambda: UserOutput(
+            id=user_id, username=f"user{user_id}", email=f"user{user_id}@example.com"
+        )
+    return login
\ No newline at end of file
@@ -0,0 +1,121 @@
+import asyncio
+import gc
+import threading
+import time
+import pytest
+from app.core.admission import AdmissionController, AdmissionRejected
+
+def test_per_user_cap_rejects_immediately():
+    """
+    Tests that a user over their cap is rejected without queueing.
+    """
+    ctl = AdmissionController(max_in_flight=10, max_per_user=1, max_queue=5, queue_timeout_s=1)
+    held = ctl.acquire(user_id=1)
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        ctl.acquire(user_id=1)
+    assert exc_info.value.reason == "per_user"
+    assert exc_info.value.retry_after >= 1
+    # other users are unaffected
+    assert ctl.acquire(user_id=2).user_id == 2
+
+def test_queue_full_rejects():
+    """
+    Tests that the bounded queue rejects once full.
+    """
+    ctl = AdmissionController(max_in_flight=1, max_per_user=5, max_queue=0, queue_timeout_s=1)
+    held = ctl.acquire(user_id=1)
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        ctl.acquire(user_id=2)
+    assert exc_info.value.reason == "queue_full"
+
+def test_queued_request_times_out():
+    """
+    Tests that a waiter gives up after the queue timeout and frees its reservation.
+    """
+    ctl = AdmissionController(max_in_flight=1, max_per_user=1, max_queue=5, queue_timeout_s=0.05)
+    held = ctl.acquire(user_id=1)
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        ctl.acquire(user_id=2)
+    assert exc_info.value.reason == "timeout"
+    stats = ctl.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["rejected_total"]["timeout"] == 1
+    assert 2 not in ctl._per_user
+
+def test_waiter_is_admitted_when_slot_frees():
+    """
+    Tests that a queued request proceeds once a running one releases.
+    """
+    ctl = AdmissionController(max_in_flight=1, max_per_user=5, max_queue=5, queue_timeout_s=2)
+    first = ctl.acquire(user_id=1)
+    admitted = []
+
+    t = threading.Thread(target=lambda: admitted.append(ctl.acquire(user_id=2)))
+    t.start()
+    time.sleep(0.05)
+    assert ctl.stats()["queue_depth"] == 1
+
+    first.release()
+    t.join(timeout=2)
+    assert len(admitted) == 1
+    stats = ctl.stats()
+    assert stats["in_flight"] == 1
+    assert stats["wait_seconds"]["count"] == 2
+    assert stats["wait_seconds"]["max"] >= 0.05
+
+def test_async_waiter_queues_off_the_event_loop():
+    """
+    Tests that acquire_async waits in the queue on its own thread while the event loop keeps running.
+    """
+    ctl = AdmissionController(max_in_flight=1, max_per_user=5, max_queue=5, queue_timeout_s=2)
+    first = ctl.acquire(user_id=1)
+
+    async def scenario():
+        waiter = asyncio.create_task(ctl.acquire_async(user_id=2))
+        await asyncio.sleep(0.05)
+        assert ctl.stats()["queue_depth"] == 1
+        assert not waiter.done()
+        first.release()
+        return await asyncio.wait_for(waiter, timeout=2)
+
+    lease = asyncio.run(scenario())
+    assert lease.user_id == 2
+    assert ctl.stats()["in_flight"] == 1
+
+def test_guard_releases_when_stream_finishes_or_is_dropped():
+    """
+    Tests that the slot is freed after the stream completes, and when it is never iterated.
+    """
+    ctl = AdmissionController(max_in_flight=1, max_per_user=1, max_queue=0, queue_timeout_s=0)
+
+    assert list(ctl.guard(ctl.acquire(user_id=1), iter(["a", "b"]))) == ["a", "b"]
+    assert ctl.stats()["in_flight"] == 0
+
+    stream = ctl.guard(ctl.acquire(user_id=1), iter(["a"]))
+    del stream
+    gc.collect()
+    assert ctl.stats()["in_flight"] == 0
+    ctl.acquire(user_id=1)
+
+def test_unreferenced_lease_is_released():
+    """
+    Tests that a lease dropped without release() still frees its slot.
+    """
+    ctl = AdmissionController(max_in_flight=1, max_per_user=1, max_queue=0, queue_timeout_s=0)
+    ctl.acquire(user_id=1)
+    gc.collect()
+    assert ctl.stats()["in_flight"] == 0
+
+def test_release_is_idempotent():
+    """
+    Tests that releasing twice doesn't free a second slot.
+    """
+    ctl = AdmissionController(max_in_flight=2, max_per_user=2, max_queue=0, queue_timeout_s=0)
+    lease = ctl.acquire(user_id=1)
+    held = ctl.acquire(user_id=1)
+    lease.release()
+    lease.release()
+    assert ctl.stats()["in_flight"] == 1
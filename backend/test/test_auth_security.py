@@ -30,6 +30,15 @@ def test_sign_jwt_success():
     # Assert that the expiration time is in the future
     assert decoded_payload["expires"] > time.time()
 
+def test_signed_token_round_trips():
+    """
+    Tests that a token from sign_jwt verifies and carries the standard claims.
+    """
+    decoded_payload = AuthHandler.decode_jwt(AuthHandler.sign_jwt(42))
+
+    assert decoded_payload["user_id"] == 42
+    assert decoded_payload["iat"] <= time.time() < decoded_payload["exp"]
+
 def test_decode_jwt_expired_token():
     """
     Tests decoding an expired JWT token.
@@ -52,4 +61,16 @@ def test_decode_jwt_invalid_token():
     # The decode_jwt method will return None in this case due to the try-except block
     decoded_payload = AuthHandler.decode_jwt(invalid_token)
     
-    assert decoded_payload is None
\ No newline at end of file
+    assert decoded_payload is None
+
+def test_refresh_tokens_are_not_access_tokens():
+    """
+    Tests that each decoder only accepts its own kind of token.
+    """
+    refresh = AuthHandler.sign_refresh_token(7)
+    access = AuthHandler.sign_jwt(7, username="u", email="u@example.com")
+
+    assert AuthHandler.decode_jwt(refresh) is None
+    assert AuthHandler.decode_refresh_token(access) is None
+    assert AuthHandler.decode_refresh_token(refresh)["jti"]
+    assert AuthHandler.decode_jwt(access)["email"] == "u@example.com"
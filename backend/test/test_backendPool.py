@@ -0,0 +1,218 @@
+import json
+import time
+import httpx
+import pytest
+from app.core.llm.backendPool import BackendPool, NoBackendAvailable, UpstreamRejected, OPEN, HALF_OPEN
+from app.core.llm.sseParser import iter_sse_chunks, iter_content_deltas
+
+A = "http://gpu-a:8000/v1/chat/completions"
+B = "http://gpu-b:8000/v1/chat/completions"
+
+def sse_body(*pieces):
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': p}}]})}" for p in pieces]
+    return ("\n\n".join(lines) + "\n\ndata: [DONE]\n\n").encode()
+
+def make_pool(handler, **kwargs):
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    return BackendPool(endpoints=[A, B], client=client, **kwargs)
+
+# --- SSE parser ---
+
+def test_iter_sse_chunks_stops_at_done_and_skips_noise():
+    """
+    Tests that comments, blank lines and everything after [DONE] are ignored.
+    """
+    lines = [": keep-alive", "", 'data: {"a": 1}', "event: x", 'data:{"a": 2}', "data: [DONE]", 'data: {"a": 3}']
+    assert list(iter_sse_chunks(lines)) == [{"a": 1}, {"a": 2}]
+
+def test_iter_content_deltas_skips_empty_deltas():
+    """
+    Tests that role-only and empty deltas produce no text.
+    """
+    lines = [
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        'data: {"choices": [{"delta": {"content": "Hi"}}]}',
+        'data: {"choices": []}',
+        "data: [DONE]",
+    ]
+    assert list(iter_content_deltas(lines)) == ["Hi"]
+
+# --- routing ---
+
+def test_picks_least_outstanding_backend():
+    """
+    Tests that a new request goes to the backend with fewer requests in flight.
+    """
+    seen = []
+    def handler(request):
+        seen.append(str(request.url))
+        return httpx.Response(200, content=sse_body("x"))
+
+    pool = make_pool(handler)
+    pool.backends[0].outstanding = 3
+
+    list(pool.stream_lines({"stream": True}))
+    assert seen == [B]
+
+def test_queue_depth_counts_towards_load():
+    """
+    Tests that a backend with a long server-side queue is avoided.
+    """
+    seen = []
+    def handler(request):
+        seen.append(str(request.url))
+        return httpx.Response(200, content=sse_body("x"))
+
+    pool = make_pool(handler)
+    pool.backends[1].queue_depth = 5
+
+    list(pool.stream_lines({}))
+    assert seen == [A]
+
+def test_fails_over_before_first_byte():
+    """
+    Tests that a connection error on one backend is retried on the other.
+    """
+    def handler(request):
+        if request.url.host == "gpu-a":
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, content=sse_body("Hel", "lo"))
+
+    pool = make_pool(handler)
+    lines = list(pool.stream_lines({}))
+
+    assert list(iter_content_deltas(lines)) == ["Hel", "lo"]
+    assert pool.backends[0].consecutive_failures == 1
+    assert pool.backends[0].outstanding == 0 and pool.backends[1].outstanding == 0
+
+def test_5xx_is_retried_but_4xx_is_not():
+    """
+    Tests that server errors fail over while client errors surface immediately.
+    """
+    pool = make_pool(lambda r: httpx.Response(503) if r.url.host == "gpu-a" else httpx.Response(200, content=sse_body("ok")))
+    assert list(iter_content_deltas(pool.stream_lines({}))) == ["ok"]
+
+    calls = []
+    def bad_request(request):
+        calls.append(request.url.host)
+        return httpx.Response(400, json={"error": "bad"})
+    pool = make_pool(bad_request)
+    with pytest.raises(UpstreamRejected) as exc_info:
+        list(pool.stream_lines({}))
+    assert exc_info.value.status_code == 400
+    assert len(calls) == 1
+    assert all(b.consecutive_failures == 0 for b in pool.backends)
+
+def test_no_retry_after_first_byte():
+    """
+    Tests that a stream that breaks mid-way is not replayed on another backend.
+    """
+    class Broken(httpx.SyncByteStream):
+        def __iter__(self):
+            yield b'data: {"choices": [{"delta": {"content": "partial"}}]}\n\n'
+            raise httpx.ReadError("connection reset")
+
+    calls = []
+    def handler(request):
+        calls.append(request.url.host)
+        return httpx.Response(200, stream=Broken())
+
+    pool = make_pool(handler)
+    with pytest.raises(httpx.ReadError):
+        list(pool.stream_lines({}))
+    assert len(calls) == 1
+
+def test_keepalives_before_first_data_line_still_fail_over():
+    """
+    Tests that a stream which only sent blank keep-alives before breaking is retried elsewhere.
+    """
+    class KeepaliveThenReset(httpx.SyncByteStream):
+        def __iter__(self):
+            yield b": keep-alive\n\n"
+            raise httpx.ReadError("connection reset")
+
+    def handler(request):
+        if request.url.host == "gpu-a":
+            return httpx.Response(200, stream=KeepaliveThenReset())
+        return httpx.Response(200, content=sse_body("ok"))
+
+    pool = make_pool(handler)
+    assert list(iter_content_deltas(pool.stream_lines({}))) == ["ok"]
+
+def test_all_backends_down_raises():
+    """
+    Tests that NoBackendAvailable is raised once every backend has failed.
+    """
+    def handler(request):
+        raise httpx.ConnectError("refused")
+
+    with pytest.raises(NoBackendAvailable):
+        list(make_pool(handler).stream_lines({}))
+
+# --- circuit breaker ---
+
+def test_circuit_opens_and_half_opens():
+    """
+    Tests that repeated failures open the circuit and a trial is allowed after the cooldown.
+    """
+    def handler(request):
+        if request.url.host == "gpu-a":
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, content=sse_body("ok"))
+
+    pool = make_pool(handler, failure_threshold=2, cooldown_s=60)
+    a = pool.backends[0]
+    for _ in range(2):
+        pool.backends[1].outstanding = 10  # force A to be tried first
+        list(pool.stream_lines({}))
+        pool.backends[1].outstanding = 0
+
+    assert a.state(60, time.time()) == OPEN
+    assert pool._acquire(exclude={B}) is None
+
+    a.opened_at = time.time() - 61
+    assert a.state(60, time.time()) == HALF_OPEN
+    assert pool._acquire(exclude={B}) == (a, True)
+    # only one trial request at a time
+    assert pool._acquire(exclude={B}) is None
+    pool._release(a, True, is_trial=True)
+    assert a.opened_at is None and a.consecutive_failures == 0
+
+def test_straggler_release_keeps_the_trial_exclusive():
+    """
+    Tests that a request started before the circuit opened doesn't end the half-open trial.
+    """
+    pool = make_pool(lambda request: httpx.Response(200), cooldown_s=60)
+    a = pool.backends[0]
+    pool.backends[1].outstanding = 10
+    straggler, straggler_is_trial = pool._acquire(exclude={B})
+    assert straggler is a and not straggler_is_trial
+
+    a.consecutive_failures = 3
+    a.opened_at = time.time() - 61
+    assert a.state(60, time.time()) == HALF_OPEN
+    assert pool._acquire(exclude={B}) == (a, True)
+
+    pool._release(a, None, straggler_is_trial)
+    assert a.trial_in_flight
+    assert pool._acquire(exclude={B}) is None
+
+# --- health checks ---
+
+def test_check_health_reads_queue_depth():
+    """
+    Tests that health checks mark dead backends and scrape vLLM's waiting queue.
+    """
+    def handler(request):
+        if request.url.host == "gpu-b":
+            raise httpx.ConnectError("down")
+        if request.url.path == "/health":
+            return httpx.Response(200)
+        return httpx.Response(200, text='# HELP x\nvllm:num_requests_waiting{model_name="q"} 4.0\nvllm:num_requests_running 2\n')
+
+    pool = make_pool(handler)
+    pool.check_health()
+
+    assert pool.backends[0].healthy is True
+    assert pool.backends[0].queue_depth == 4.0
+    assert pool.backends[1].healthy is False
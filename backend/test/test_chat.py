@@ -25,10 +25,11 @@ def test_user(db_session):
     # We will skip protected routes until the auth token is managed in test setup.
     return user
 
-def test_create_chat_session(client):
+def test_create_chat_session(client, login_as):
     """
     Tests creating a new chat session.
     """
+    login_as(1)
     payload = {"user_id": 1, "name": "Test Session"}
     response = client.post("/chat", json=payload)
     
@@ -38,10 +39,11 @@ def test_create_chat_session(client):
     assert data["user_id"] == 1
     assert data["name"] == "Test Session"
 
-def test_get_chat_session(client):
+def test_get_chat_session(client, login_as):
     """
     Tests getting a single chat session by ID.
     """
+    login_as(1)
     # First, create a session to retrieve
     payload = {"user_id": 1, "name": "Session for GET"}
     create_res = client.post("/chat", json=payload)
@@ -55,18 +57,20 @@ def test_get_chat_session(client):
     assert data["id"] == session_id
     assert data["name"] == "Session for GET"
 
-def test_get_nonexistent_chat_session(client):
+def test_get_nonexistent_chat_session(client, login_as):
     """
     Tests getting a chat session that does not exist.
     """
+    login_as(1)
     response = client.get("/chat/999")
     assert response.status_code == 404
     assert response.json()["detail"] == "Chat session not found"
 
-def test_list_sessions_by_user(client):
+def test_list_sessions_by_user(client, login_as):
     """
     Tests listing chat sessions for a specific user.
     """
+    login_as(2)
     user_id = 2
     # Create multiple sessions for the user
     client.post("/chat", json={"user_id": user_id, "name": "Session A"})
@@ -79,10 +83,11 @@ def test_list_sessions_by_user(client):
     assert len(data) == 2
     assert data[0]["name"] == "Session B" # Newest first is default
 
-def test_update_chat_session(client):
+def test_update_chat_session(client, login_as):
     """
     Tests renaming a chat session.
     """
+    login_as(3)
     # Create a session first
     create_res = client.post("/chat", json={"user_id": 3, "name": "Old Name"})
     session_id = create_res.json()["id"]
@@ -95,10 +100,11 @@ def test_update_chat_session(client):
     data = response.json()
     assert data["name"] == "New Name"
 
-def test_delete_chat_session(client):
+def test_delete_chat_session(client, login_as):
     """
     Tests deleting a chat session.
     """
+    login_as(4)
     # Create a session
     create_res = client.post("/chat", json={"user_id": 4, "name": "To Be Deleted"})
     session_id = create_res.json()["id"]
@@ -111,10 +117,11 @@ def test_delete_chat_session(client):
     get_res = client.get(f"/chat/{session_id}")
     assert get_res.status_code == 404
 
-def test_create_message_in_session(client):
+def test_create_message_in_session(client, login_as):
     """
     Tests creating a new message inside a chat session.
     """
+    login_as(5)
     # Create a session first
     create_res = client.post("/chat", json={"user_id": 5, "name": "Message Test Session"})
     session_id = create_res.json()["id"]
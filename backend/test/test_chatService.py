@@ -13,6 +13,8 @@ from app.db.schema.chat import (
 from app.db.schema.chat import MessageInUpdate
 from app.db.models.chat import ChatSession, Message
 from app.service import chatService
+from app.db.repository.chatRepo import SessionNotFound
+from app.core.llm.backendPool import UpstreamRejected
 
 # This fixture provides a mocked ChatSessionService for testing
 @pytest.fixture
@@ -112,6 +114,36 @@ def test_create_message_not_found(chat_service, mocker):
     assert exc_info.value.status_code == 404
     assert exc_info.value.detail == "Chat session not found"
 
+def test_write_to_session_deleted_elsewhere_is_404(chat_service, mocker):
+    """
+    Tests that a session which passes the (cached) owner check but is gone on insert
+    answers 404, and ends a stream with an error event instead of failing mid-response.
+    """
+    mocker.patch.object(chat_service._sessions, 'session_exists', return_value=True)
+    mocker.patch.object(chat_service._messages, 'create_message', side_effect=SessionNotFound(5))
+
+    with pytest.raises(HTTPException) as exc_info:
+        chat_service.create_message(session_id=5, payload=MessageInCreateBody(role="user", content="hi"))
+    assert exc_info.value.status_code == 404
+
+    frames = list(chat_service.stream_user_and_robot_message(session_id=5, user_text="hi", mode=0))
+    assert frames == ["event:error\ndata:Chat session not found\n\n"]
+
+def test_stream_reports_rejected_request_as_error_event(chat_service, mocker):
+    """
+    Tests that a 4xx from the LLM backend ends the stream with an error event.
+    """
+    mocker.patch.object(chat_service._sessions, 'session_exists', return_value=True)
+    mocker.patch.object(chat_service._sessions, 'get_message_counters', return_value=MagicMock(message_count=1, last_message_at=None))
+    mocker.patch.object(chat_service._messages, 'list_messages_by_session', return_value=[])
+    save = mocker.patch.object(chat_service._messages, 'create_message')
+    mocker.patch.object(ChatSessionService, '_stream_robot', side_effect=UpstreamRejected(400, "context too long"))
+
+    frames = list(chat_service.stream_user_and_robot_message(session_id=1, user_text="hi", mode=0))
+
+    assert frames[-1] == "event:error\ndata:LLM rejected the request\n\n"
+    assert save.call_count == 1  # only the user message
+
 def test_list_messages_for_session_not_found(chat_service, mocker):
     """
     Tests that list_messages_for_session raises 404 for a non-existent session.
@@ -182,6 +214,7 @@ def test_stream_mode_2_web_search(chat_service, mocker):
 
     # Mock dependencies
     mocker.patch.object(chat_service._sessions, 'session_exists', return_value=True)
+    mocker.patch.object(chat_service._sessions, 'get_message_counters', return_value=MagicMock(message_count=0, last_message_at=None))
     mocker.patch.object(chat_service._messages, 'list_messages_by_session', return_value=[])
     
     # Patch the function at the module level where it is used
@@ -207,6 +240,7 @@ def test_stream_mode_3_rag(chat_service, mocker):
 
     # Mock dependencies
     mocker.patch.object(chat_service._sessions, 'session_exists', return_value=True)
+    mocker.patch.object(chat_service._sessions, 'get_message_counters', return_value=MagicMock(message_count=0, last_message_at=None))
     mocker.patch.object(chat_service._messages, 'list_messages_by_session', return_value=[])
     
     # Patch the function at the module level where it is used
@@ -220,4 +254,75 @@ def test_stream_mode_3_rag(chat_service, mocker):
         list(chat_service.stream_user_and_robot_message(session_id=1, user_text=user_text, mode=3))
 
     # Assertions
-    mocked_query_rag_db.assert_called_once_with(user_text, k=4)
\ No newline at end of file
+    mocked_query_rag_db.assert_called_once_with(user_text, k=4)
+
+def _session_with_messages(db_session, n):
+    from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
+    from app.db.schema.chat import ChatSessionInCreate, MessageInCreate
+    chat = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=1, name="export"))
+    repo = MessageRepository(session=db_session)
+    for i in range(n):
+        repo.create_message(MessageInCreate(session_id=chat.id, role="user" if i % 2 == 0 else "robot", content=f"m{i} \"quoted\""))
+    return chat.id
+
+def test_export_session_ndjson(db_session):
+    """
+    Tests that the NDJSON export emits a session line followed by every message in order, in batches.
+    """
+    import json
+    session_id = _session_with_messages(db_session, 5)
+    chunks = list(ChatSessionService(session=db_session).export_session(session_id, fmt="ndjson", batch_size=2))
+    lines = [json.loads(line) for line in "".join(chunks).splitlines()]
+
+    assert len(chunks) == 4  # header + 3 message batches
+    assert lines[0]["type"] == "session"
+    assert lines[0]["message_count"] == 5
+    assert [l["content"] for l in lines[1:]] == [f"m{i} \"quoted\"" for i in range(5)]
+    assert all(l["session_id"] == session_id for l in lines[1:])
+
+def test_export_session_json_matches_output_schema(db_session):
+    """
+    Tests that the incrementally written JSON parses into the ChatSessionOutput shape.
+    """
+    import json
+    from app.db.schema.chat import ChatSessionOutput
+    session_id = _session_with_messages(db_session, 3)
+    body = "".join(ChatSessionService(session=db_session).export_session(session_id, fmt="json", batch_size=2))
+    out = ChatSessionOutput.model_validate(json.loads(body))
+    assert out.id == session_id
+    assert [m.content for m in out.messages] == [f"m{i} \"quoted\"" for i in range(3)]
+
+def test_export_empty_session_json(db_session):
+    """
+    Tests the JSON export of a session without messages.
+    """
+    import json
+    session_id = _session_with_messages(db_session, 0)
+    body = "".join(ChatSessionService(session=db_session).export_session(session_id, fmt="json"))
+    assert json.loads(body)["messages"] == []
+
+def test_export_session_not_found(chat_service, mocker):
+    """
+    Tests that exporting a missing session raises a 404 before streaming starts.
+    """
+    mocker.patch.object(chat_service._sessions, 'get_session_by_id', return_value=None)
+    with pytest.raises(HTTPException) as exc:
+        chat_service.export_session(999)
+    assert exc.value.status_code == 404
+
+def test_export_user_ndjson(db_session):
+    """
+    Tests that a user's export lists each session followed by its messages, including empty sessions.
+    """
+    import json
+    from app.db.repository.chatRepo import ChatSessionRepository
+    from app.db.schema.chat import ChatSessionInCreate
+    first = _session_with_messages(db_session, 2)
+    empty = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=1, name="empty")).id
+    lines = [json.loads(l) for l in "".join(ChatSessionService(session=db_session).export_user(user_id=1, batch_size=2)).splitlines()]
+
+    sessions = [l["id"] for l in lines if l["type"] == "session"]
+    assert first in sessions and empty in sessions
+    start = lines.index(next(l for l in lines if l["type"] == "session" and l["id"] == first))
+    assert [l["type"] for l in lines[start:start + 3]] == ["session", "message", "message"]
+    assert all(l["session_id"] == first for l in lines[start + 1:start + 3])
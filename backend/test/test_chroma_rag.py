@@ -1,9 +1,15 @@
 import pytest
 import os
 from unittest.mock import MagicMock
+from app import chroma_rag
 from app.chroma_rag import init_rag_system, query_rag_db, CHROMA_DB_DIR, DOC_DIR
 from langchain.docstore.document import Document
 
+@pytest.fixture(autouse=True)
+def fresh_embeddings(mocker):
+    """The embedding model is a process-wide singleton; each test builds its own (mocked) one."""
+    mocker.patch.object(chroma_rag, '_shared_embeddings', None)
+
 # --- Tests for init_rag_system ---
 
 def test_init_rag_system_success(fs, mocker, capsys):
@@ -137,4 +143,19 @@ def test_query_rag_db_no_results(fs, mocker):
     results = query_rag_db(query="unlikely query")
     
     # Assertions
-    assert results == []
\ No newline at end of file
+    assert results == []
+
+def test_query_rag_db_reuses_embedding_model(fs, mocker):
+    """
+    Tests that repeated queries share one embedding model instead of loading it per call.
+    """
+    embeddings_class = mocker.patch('app.chroma_rag.SentenceTransformerEmbeddings')
+    chroma_class = mocker.patch('app.chroma_rag.Chroma')
+    chroma_class.return_value.similarity_search.return_value = []
+    fs.create_dir(CHROMA_DB_DIR)
+
+    query_rag_db(query="first")
+    query_rag_db(query="second")
+
+    embeddings_class.assert_called_once()
+    assert all(c.kwargs["embedding_function"] is embeddings_class.return_value for c in chroma_class.call_args_list)
@@ -0,0 +1,205 @@
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from app.core.llm.coalescer import StreamCoalescer
+from app.service.chatService import ChatSessionService
+from app.service import chatService
+
+def slow_upstream(calls, chunks=("a", "b", "c"), delay=0.02, gate=None):
+    def factory():
+        calls.append(1)
+        if gate is not None:
+            gate.wait(2)
+        for c in chunks:
+            time.sleep(delay)
+            yield c
+    return factory
+
+def _collect(co, key, factory, out):
+    out.append(list(co.stream(key, factory)))
+
+def test_concurrent_identical_requests_share_one_upstream():
+    """
+    Tests that subscribers to the same key trigger a single upstream call and all get every chunk.
+    """
+    co = StreamCoalescer(enabled=True)
+    calls, results = [], []
+    gate = threading.Event()
+    factory = slow_upstream(calls, gate=gate)
+
+    threads = [threading.Thread(target=_collect, args=(co, "k", factory, results)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join(timeout=2)
+
+    assert len(calls) == 1
+    assert results == [["a", "b", "c"]] * 5
+    assert co.stats()["coalesced_total"] == 4
+    assert co.stats()["in_flight"] == 0
+
+def test_late_joiner_replays_from_start():
+    """
+    Tests that a subscriber joining mid-stream still receives the earlier chunks.
+    """
+    co = StreamCoalescer(enabled=True)
+    calls, results = [], []
+    factory = slow_upstream(calls, delay=0.03)
+
+    first = threading.Thread(target=_collect, args=(co, "k", factory, results))
+    first.start()
+    time.sleep(0.05)
+    _collect(co, "k", factory, results)
+    first.join(timeout=2)
+
+    assert len(calls) == 1
+    assert results == [["a", "b", "c"], ["a", "b", "c"]]
+
+def test_different_keys_do_not_share():
+    """
+    Tests that distinct payloads get their own upstream streams.
+    """
+    co = StreamCoalescer(enabled=True)
+    calls = []
+    assert list(co.stream("k1", slow_upstream(calls, delay=0))) == ["a", "b", "c"]
+    assert list(co.stream("k2", slow_upstream(calls, delay=0))) == ["a", "b", "c"]
+    assert len(calls) == 2
+
+def test_upstream_error_reaches_every_subscriber():
+    """
+    Tests that an upstream failure is re-raised to the subscribers.
+    """
+    co = StreamCoalescer(enabled=True)
+
+    def failing():
+        yield "a"
+        raise RuntimeError("backend down")
+
+    with pytest.raises(RuntimeError):
+        list(co.stream("k", failing))
+
+def test_upstream_cancelled_when_all_subscribers_leave():
+    """
+    Tests that the shared upstream stops once nobody is listening.
+    """
+    co = StreamCoalescer(enabled=True)
+    produced = []
+
+    def endless():
+        for i in range(1000):
+            time.sleep(0.005)
+            produced.append(i)
+            yield str(i)
+
+    stream = co.stream("k", endless)
+    next(stream)
+    stream.close()
+    time.sleep(0.1)
+    count = len(produced)
+    time.sleep(0.1)
+    assert len(produced) == count < 1000
+
+def test_rejoin_after_all_subscribers_left_starts_new_upstream():
+    """
+    Tests that a caller arriving after the last subscriber left (while the abandoned upstream
+    is still blocked) gets a full answer from a new upstream instead of a truncated one.
+    """
+    co = StreamCoalescer(enabled=True)
+    calls = []
+    gate = threading.Event()
+
+    def factory():
+        calls.append(1)
+        yield "a"
+        gate.wait(2)
+        yield "b"
+        yield "c"
+
+    leaver = co.stream("k", factory)
+    assert next(leaver) == "a"
+    leaver.close()
+
+    result = []
+    rejoin = threading.Thread(target=_collect, args=(co, "k", factory, result))
+    rejoin.start()
+    time.sleep(0.05)
+    gate.set()
+    rejoin.join(timeout=2)
+
+    assert result == [["a", "b", "c"]]
+    assert len(calls) == 2
+
+def test_sampled_requests_are_not_shared():
+    """
+    Tests that shared=False (non-deterministic requests) always gets its own upstream.
+    """
+    co = StreamCoalescer(enabled=True)
+    calls, results = [], []
+    gate = threading.Event()
+    factory = slow_upstream(calls, gate=gate)
+    threads = [
+        threading.Thread(target=lambda: results.append(list(co.stream("k", factory, shared=False))))
+        for _ in range(2)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join(timeout=2)
+    assert len(calls) == 2
+    assert results == [["a", "b", "c"]] * 2
+
+def test_disabled_passes_through():
+    """
+    Tests that a disabled coalescer calls the factory directly every time.
+    """
+    co = StreamCoalescer(enabled=False)
+    calls = []
+    list(co.stream("k", slow_upstream(calls, delay=0)))
+    list(co.stream("k", slow_upstream(calls, delay=0)))
+    assert len(calls) == 2
+
+def test_stream_persists_shared_answer_to_each_session(mocker):
+    """
+    Tests that coalesced turns from two sessions each save the answer to their own session.
+    """
+    mocker.patch.object(chatService, 'coalescer', StreamCoalescer(enabled=True))
+    calls = []
+    gate = threading.Event()
+
+    def fake_stream_robot(self, payload, mode=0, user_id=None):
+        calls.append(1)
+        gate.wait(2)
+        yield "Hel"
+        yield "lo"
+
+    mocker.patch.object(ChatSessionService, '_stream_robot', fake_stream_robot)
+    services, saved, frames = [], [], []
+    for _ in range(2):
+        service = ChatSessionService(session=MagicMock())
+        mocker.patch.object(service._sessions, 'session_exists', return_value=True)
+        mocker.patch.object(service._sessions, 'get_message_counters', return_value=MagicMock(message_count=1, last_message_at=None))
+        mocker.patch.object(service._messages, 'list_messages_by_session', return_value=[SimpleNamespace(role="user", content="hi")])
+        mocker.patch.object(service._messages, 'create_message', side_effect=lambda data, **kwargs: saved.append(data))
+        services.append(service)
+
+    threads = [
+        threading.Thread(target=lambda sid=sid, svc=svc: frames.append(list(svc.stream_user_and_robot_message(session_id=sid, user_text="hi", mode=0, temperature=0))))
+        for sid, svc in [(11, services[0]), (22, services[1])]
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join(timeout=2)
+
+    assert len(calls) == 1
+    robot_saves = {m.session_id: m.content for m in saved if m.role == "robot"}
+    assert robot_saves == {11: "Hello", 22: "Hello"}
+    assert all(f[-1] == "event:done\ndata:ok\n\n" for f in frames)
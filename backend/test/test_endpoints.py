@@ -43,4 +43,49 @@ def test_signup_existing_user(client):
     response = client.post("/auth/signup", json=signup_data)
     
     assert response.status_code == 400
-    assert response.json() == {"detail": "Please Login"}
\ No newline at end of file
+    assert response.json() == {"detail": "Please Login"}
+
+def login(client, email):
+    client.post("/auth/signup", json={"username": "tokenuser", "email": email, "password": "password"})
+    response = client.post("/auth/login", json={"email": email, "password": "password"})
+    assert response.status_code == 200
+    return response.json()
+
+def test_access_token_identifies_user_without_db(client, mocker):
+    """
+    Tests that the access token from login carries the profile used by protected routes.
+    """
+    tokens = login(client, "claims@example.com")
+    assert tokens["refresh_token"] and tokens["expires_in"] > 0
+    lookup = mocker.patch("app.service.userService.UserService.get_user_by_id")
+
+    response = client.get("/protected", headers={"Authorization": f"Bearer {tokens['token']}"})
+
+    assert response.status_code == 200
+    assert response.json()["data"]["username"] == "tokenuser"
+    lookup.assert_not_called()
+
+def test_refresh_rotates_and_rejects_reuse(client):
+    """
+    Tests that a refresh token buys a new pair once, and is refused afterwards.
+    """
+    tokens = login(client, "refresh@example.com")
+
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    renewed = response.json()
+    assert renewed["refresh_token"] != tokens["refresh_token"]
+    assert client.get("/protected", headers={"Authorization": f"Bearer {renewed['token']}"}).status_code == 200
+
+    reused = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert reused.status_code == 401
+
+def test_logout_revokes_refresh_token(client):
+    """
+    Tests that a logged-out refresh token can't be used, and that access tokens aren't accepted as refresh tokens.
+    """
+    tokens = login(client, "logout@example.com")
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["token"]}).status_code == 401
+
+    assert client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 204
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
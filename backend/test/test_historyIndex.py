@@ -0,0 +1,136 @@
+import uuid
+import pytest
+import chromadb
+from sqlalchemy.orm import Session
+from app.core.historyIndex import HistoryIndex, REINDEX_SESSION
+from app.db.models.chat import Message
+from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
+from app.db.schema.chat import ChatSessionInCreate, MessageInCreate, MessageBulkIn
+from app.service.chatService import ChatSessionService
+from app.service import chatService
+
+# Tiny bag-of-words embedder: messages sharing words land close together
+VOCAB = ["docker", "compose", "network", "pasta", "recipe", "tomato", "lisbon", "trip", "flight"]
+
+def fake_embed(texts):
+    out = []
+    for text in texts:
+        words = text.lower().replace("?", "").replace(".", "").split()
+        out.append([float(words.count(w)) + 0.01 for w in VOCAB])
+    return out
+
+@pytest.fixture
+def index(db_session):
+    client = chromadb.EphemeralClient()
+    index = HistoryIndex(
+        enabled=True,
+        batch_size=2,
+        collection_name=f"test-{uuid.uuid4().hex}",
+        client_factory=lambda: client,
+        embed_fn=fake_embed,
+        session_factory=lambda: Session(bind=db_session.connection()),
+    )
+    index.watch(db_session)
+    yield index
+    index.unwatch(db_session)
+
+def _chat(db_session, user_id, name, *contents):
+    chat = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=user_id, name=name))
+    repo = MessageRepository(session=db_session)
+    messages = [repo.create_message(MessageInCreate(session_id=chat.id, role="user", content=c)) for c in contents]
+    return chat, messages
+
+def test_created_messages_are_indexed_per_user(db_session, index):
+    """
+    Tests that committed messages are embedded in the background pass and scoped by user.
+    """
+    docker, _ = _chat(db_session, 401, "Infra", "docker compose network is down", "docker again")
+    _chat(db_session, 401, "Food", "pasta recipe with tomato")
+    _chat(db_session, 402, "Other user", "docker compose network question")
+
+    assert index.stats()["queued"] > 0
+    index.run_pending()
+    assert index.stats()["indexed_total"] == 4
+
+    hits = index.search(user_id=401, q="docker network", k=2)
+    assert [hit["session_id"] for hit in hits] == [docker.id, docker.id]
+    assert hits[0]["content"] == "docker compose network is down"
+    assert hits[0]["similarity"] >= hits[1]["similarity"]
+
+def test_updates_and_deletes_follow_the_rows(db_session, index):
+    """
+    Tests that edited, deleted messages and deleted sessions leave the index.
+    """
+    chat, (msg, other) = _chat(db_session, 403, "Trip", "lisbon trip", "flight times")
+    messages = MessageRepository(session=db_session)
+
+    messages.update_message(msg.id, content="pasta recipe")
+    messages.delete_message(other.id)
+    index.run_pending()
+    assert [hit["content"] for hit in index.search(user_id=403, q="pasta", k=5)] == ["pasta recipe"]
+
+    ChatSessionRepository(session=db_session).delete_session(chat.id)
+    index.run_pending()
+    assert index.search(user_id=403, q="pasta", k=5) == []
+
+def test_rolled_back_writes_are_not_indexed(db_session, index):
+    """
+    Tests that changes flushed but rolled back never reach the queue.
+    """
+    chat, _ = _chat(db_session, 404, "Chat")
+    index.run_pending()
+    nested = db_session.begin_nested()
+    db_session.add(Message(session_id=chat.id, role="user", content="never committed"))
+    db_session.flush()
+    nested.rollback()
+    db_session.commit()
+    assert index.stats()["queued"] == 0
+
+def test_bulk_import_reindexes_session(db_session, index, mocker):
+    """
+    Tests that bulk imports, which bypass the ORM, queue a session reindex.
+    """
+    mocker.patch.object(chatService, "history_index", index)
+    chat, _ = _chat(db_session, 405, "Imported")
+    payload = MessageBulkIn(messages=[{"role": "user", "content": "tomato pasta"}, {"role": "robot", "content": "recipe"}])
+
+    ChatSessionService(session=db_session).bulk_create_messages(chat.id, payload)
+    index.run_pending()
+
+    assert {hit["content"] for hit in index.search(user_id=405, q="pasta recipe", k=5)} == {"tomato pasta", "recipe"}
+
+def test_background_worker_drains_queue(db_session, index):
+    """
+    Tests that the worker thread processes jobs queued by commits.
+    """
+    chat, _ = _chat(db_session, 406, "Chat", "docker compose", "lisbon flight")
+    index.enqueue(REINDEX_SESSION, chat.id)
+    index.start()
+    index.flush()
+    index.stop()
+    assert len(index.search(user_id=406, q="docker", k=5)) == 2
+
+def test_semantic_search_groups_by_session(db_session, index, mocker):
+    """
+    Tests the service result: sessions ranked by best hit, other users' sessions dropped.
+    """
+    mocker.patch.object(chatService, "history_index", index)
+    food, _ = _chat(db_session, 407, "Food", "pasta recipe tomato", "tomato")
+    _chat(db_session, 407, "Trip", "lisbon trip")
+    index.run_pending()
+
+    result = ChatSessionService(session=db_session).semantic_search(user_id=407, q="tomato pasta recipe", k=3)
+
+    assert result.sessions[0].session_id == food.id
+    assert result.sessions[0].session_name == "Food"
+    assert [m.content for m in result.sessions[0].messages][0] == "pasta recipe tomato"
+    assert result.sessions[0].similarity == result.sessions[0].messages[0].similarity
+
+def test_semantic_search_disabled(db_session, mocker):
+    """
+    Tests that the endpoint reports 503 while the index is turned off.
+    """
+    mocker.patch.object(chatService, "history_index", HistoryIndex(enabled=False))
+    with pytest.raises(Exception) as exc:
+        ChatSessionService(session=db_session).semantic_search(user_id=1, q="anything")
+    assert exc.value.status_code == 503
@@ -0,0 +1,162 @@
+import threading
+import pytest
+from unittest.mock import MagicMock
+from app.core.jobQueue import JobQueue, _DurableLog
+from app.service.chatService import ChatSessionService, session_job_key
+from app.service import chatService
+
+@pytest.fixture
+def queue():
+    q = JobQueue(enabled=True, workers=2, max_size=10, max_attempts=3, retry_base_s=0.001, durable_path="")
+    yield q
+    q.stop()
+
+def test_jobs_run_in_background(queue):
+    """
+    Tests that submitted jobs run on the workers and are counted.
+    """
+    seen = []
+    queue.handler("record")(lambda payload: seen.append(payload["n"]))
+    queue.start()
+    for n in range(5):
+        assert queue.submit("record", {"n": n}) is True
+    assert queue.join()
+    assert sorted(seen) == [0, 1, 2, 3, 4]
+    assert queue.stats()["completed_total"] == 5
+    assert queue.stats()["depth"] == 0
+
+def test_submit_returns_false_when_not_running(queue):
+    """
+    Tests that callers are told to run the work inline when the queue is stopped.
+    """
+    queue.handler("noop")(lambda payload: None)
+    assert queue.submit("noop", {}) is False
+    with pytest.raises(KeyError):
+        queue.submit("unknown", {})
+
+def test_failed_jobs_are_retried(queue):
+    """
+    Tests exponential-backoff retries, and giving up after max_attempts.
+    """
+    attempts = {"flaky": 0, "broken": 0}
+
+    def flaky(payload):
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 3:
+            raise RuntimeError("try again")
+
+    def broken(payload):
+        attempts["broken"] += 1
+        raise RuntimeError("always")
+
+    queue.handler("flaky")(flaky)
+    queue.handler("broken")(broken)
+    queue.start()
+    queue.submit("flaky", {})
+    queue.submit("broken", {})
+    assert queue.join()
+
+    stats = queue.stats()
+    assert attempts == {"flaky": 3, "broken": 3}
+    assert stats["completed_total"] == 1
+    assert stats["failed_total"] == 1
+    assert stats["retried_total"] == 4
+
+def test_bounded_queue_rejects_overflow():
+    """
+    Tests that a full queue rejects new jobs instead of growing.
+    """
+    gate = threading.Event()
+    q = JobQueue(enabled=True, workers=1, max_size=2, durable_path="")
+    q.handler("wait")(lambda payload: gate.wait(2))
+    q.start()
+    try:
+        assert q.submit("wait", {}) and q.submit("wait", {})
+        assert q.submit("wait", {}) is False
+        assert q.stats()["rejected_total"] == 1
+    finally:
+        gate.set()
+        q.stop()
+
+def test_drain_waits_for_jobs_of_a_key(queue):
+    """
+    Tests that drain() blocks until the key's jobs are finished, and times out otherwise.
+    """
+    gate = threading.Event()
+    queue.handler("wait")(lambda payload: gate.wait(2))
+    queue.start()
+    queue.submit("wait", {}, key="session:1")
+
+    assert queue.drain("session:1", timeout=0.05) is False
+    assert queue.drain("session:2", timeout=0.05) is True
+    gate.set()
+    assert queue.drain("session:1", timeout=2) is True
+
+def test_durable_jobs_survive_a_restart(tmp_path):
+    """
+    Tests that jobs left in the SQLite log are replayed by the next start.
+    """
+    path = str(tmp_path / "jobs.sqlite3")
+    gate = threading.Event()
+    first = JobQueue(enabled=True, workers=1, durable_path=path)
+    first.handler("work")(lambda payload: gate.wait(5))
+    first.start()
+    first.submit("work", {"n": 1})
+    first.submit("work", {"n": 2})
+    first.stop(timeout=0.05)  # dies with jobs outstanding
+    gate.set()
+
+    seen = []
+    second = JobQueue(enabled=True, workers=1, durable_path=path)
+    second.handler("work")(lambda payload: seen.append(payload["n"]))
+    second.start()
+    assert second.join()
+    second.stop()
+    assert sorted(seen) == [1, 2]
+
+def test_durable_log_only_replays_jobs_of_dead_workers(tmp_path):
+    """
+    Tests that a worker sharing the job log leaves the jobs of a live sibling alone.
+    """
+    path = str(tmp_path / "jobs.sqlite3")
+    alive = {101}
+    live = _DurableLog(path, pid=101, alive=alive.__contains__)
+    dead = _DurableLog(path, pid=102, alive=alive.__contains__)
+    live.add("work", {"n": 1}, None)
+    dead.add("work", {"n": 2}, None)
+
+    starting = _DurableLog(path, pid=103, alive=alive.__contains__)
+    assert [payload for _, _, payload, _ in starting.claim_orphans()] == [{"n": 2}]
+    # claimed once: a second newcomer finds nothing while 103 is alive
+    alive.add(103)
+    assert _DurableLog(path, pid=104, alive=alive.__contains__).claim_orphans() == []
+    for log in (live, dead, starting):
+        log.close()
+
+def test_stream_defers_robot_message_and_title(mocker, queue):
+    """
+    Tests that with the queue running the answer is persisted and the session
+    titled by jobs, not inline, and that the next turn drains them first.
+    """
+    mocker.patch.object(chatService, "job_queue", queue)
+    persisted = []
+    queue.handler("chat.persist_robot_message")(persisted.append)
+    titled = mocker.patch.object(chatService.title_generator, "request")
+    queue.handler("cache.semantic_store")(lambda payload: None)
+    queue.start()
+
+    service = ChatSessionService(session=MagicMock())
+    mocker.patch.object(service._sessions, "session_exists", return_value=True)
+    mocker.patch.object(service._sessions, "get_message_counters", return_value=MagicMock(message_count=1, last_message_at=None))
+    mocker.patch.object(service._messages, "list_messages_by_session", return_value=[])
+    create = mocker.patch.object(service._messages, "create_message")
+    mocker.patch.object(ChatSessionService, "_stream_robot", lambda self, payload, mode=0, user_id=None: iter(["Hi"]))
+
+    frames = list(service.stream_user_and_robot_message(session_id=3, user_text="hello", mode=0))
+
+    assert frames[-1] == "event:done\ndata:ok\n\n"
+    assert create.call_count == 1
+    assert create.call_args.kwargs["auto_title"] is False
+    assert queue.drain(session_job_key(3))
+    titled.assert_called_once_with(3)
+    assert {"session_id": 3, "role": "robot", "content": "Hi"} in persisted
@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+import jwt
+import pytest
+from app.core.cache.ttlCache import TTLCache
+from app.core.security.jwtVerifier import JWTVerifier, KeyRing, TokenRejected, key_load_failures, pem_dir_loader
+
+SECRET = "s3cret-" + "x" * 32
+
+def make_verifier(keys=None, leeway_s=30, cache=None, **kwargs):
+    keys = keys if keys is not None else {None: SECRET.encode()}
+    return JWTVerifier(KeyRing(lambda: keys), algorithms=["HS256"], leeway_s=leeway_s, cache=cache, **kwargs)
+
+def token(claims, key=SECRET, kid=None, algorithm="HS256"):
+    return jwt.encode(claims, key, algorithm=algorithm, headers={"kid": kid} if kid else None)
+
+def forged_hs256(claims, secret: bytes, kid=None):
+    """An HS256 token built by hand; PyJWT refuses to encode with a PEM as the HMAC secret."""
+    def b64(data: bytes) -> bytes:
+        return base64.urlsafe_b64encode(data).rstrip(b"=")
+    header = {"alg": "HS256", "typ": "JWT", **({"kid": kid} if kid else {})}
+    signing_input = b64(json.dumps(header).encode()) + b"." + b64(json.dumps(claims).encode())
+    return (signing_input + b"." + b64(hmac.new(secret, signing_input, hashlib.sha256).digest())).decode()
+
+def test_valid_token_returns_claims():
+    """
+    Tests that a token with standard claims verifies.
+    """
+    now = int(time.time())
+    claims = make_verifier().verify(token({"user_id": 7, "iat": now, "nbf": now, "exp": now + 60}))
+    assert claims["user_id"] == 7
+
+def test_expiry_allows_clock_skew():
+    """
+    Tests that exp is checked with the configured leeway.
+    """
+    expired = token({"user_id": 7, "exp": int(time.time()) - 10})
+    assert make_verifier(leeway_s=30).verify(expired)["user_id"] == 7
+    with pytest.raises(TokenRejected) as exc_info:
+        make_verifier(leeway_s=0).verify(expired)
+    assert exc_info.value.reason == "expired"
+
+def test_not_yet_valid_token_is_rejected():
+    """
+    Tests that a token whose nbf is beyond the leeway is rejected.
+    """
+    now = int(time.time())
+    with pytest.raises(TokenRejected) as exc_info:
+        make_verifier(leeway_s=5).verify(token({"user_id": 7, "nbf": now + 60, "exp": now + 120}))
+    assert exc_info.value.reason == "not_yet_valid"
+
+def test_legacy_expires_claim():
+    """
+    Tests that tokens carrying only the old `expires` claim are still honoured.
+    """
+    verifier = make_verifier(leeway_s=0)
+    assert verifier.verify(token({"user_id": 7, "expires": time.time() + 60}))["user_id"] == 7
+    with pytest.raises(TokenRejected) as exc_info:
+        verifier.verify(token({"user_id": 7, "expires": time.time() - 60}))
+    assert exc_info.value.reason == "expired"
+    with pytest.raises(TokenRejected) as exc_info:
+        verifier.verify(token({"user_id": 7}))
+    assert exc_info.value.reason == "no_expiry"
+
+def test_rejects_wrong_signature_and_algorithm():
+    """
+    Tests that a foreign secret or an algorithm we don't accept fails verification.
+    """
+    exp = int(time.time()) + 60
+    with pytest.raises(TokenRejected) as exc_info:
+        make_verifier().verify(token({"user_id": 7, "exp": exp}, key="other" * 8))
+    assert exc_info.value.reason == "signature"
+    with pytest.raises(TokenRejected) as exc_info:
+        make_verifier().verify(token({"user_id": 7, "exp": exp}, key=None, algorithm="none"))
+    assert exc_info.value.reason == "algorithm"
+    with pytest.raises(TokenRejected) as exc_info:
+        make_verifier().verify("not-a-token")
+    assert exc_info.value.reason == "malformed"
+
+def test_issuer_and_audience_are_enforced():
+    """
+    Tests that a configured issuer/audience must match the token.
+    """
+    exp = int(time.time()) + 60
+    verifier = make_verifier(issuer="auth", audience="chat")
+    assert verifier.verify(token({"user_id": 7, "exp": exp, "iss": "auth", "aud": "chat"}))["user_id"] == 7
+    with pytest.raises(TokenRejected):
+        verifier.verify(token({"user_id": 7, "exp": exp, "iss": "elsewhere", "aud": "chat"}))
+    with pytest.raises(TokenRejected):
+        verifier.verify(token({"user_id": 7, "exp": exp, "aud": "chat"}))
+
+def test_unknown_kid_reloads_keys_for_rotation():
+    """
+    Tests that a token signed with a newly rotated-in key is accepted after a reload,
+    and that unknown kids don't reload more often than the interval allows.
+    """
+    keys = {"2026-09": b"old" * 8}
+    calls = []
+    def loader():
+        calls.append(1)
+        return dict(keys)
+    verifier = JWTVerifier(KeyRing(loader, reload_interval_s=0), algorithms=["HS256"])
+    exp = int(time.time()) + 60
+    assert verifier.verify(token({"user_id": 1, "exp": exp}, key="old" * 8, kid="2026-09"))["user_id"] == 1
+
+    keys["2026-10"] = b"new" * 8
+    assert verifier.verify(token({"user_id": 2, "exp": exp}, key="new" * 8, kid="2026-10"))["user_id"] == 2
+    assert len(calls) == 2
+
+    throttled = JWTVerifier(KeyRing(loader, reload_interval_s=3600), algorithms=["HS256"])
+    for _ in range(3):
+        with pytest.raises(TokenRejected) as exc_info:
+            throttled.verify(token({"user_id": 3, "exp": exp}, key="x" * 32, kid="bogus"))
+        assert exc_info.value.reason == "unknown_key"
+    assert len(calls) == 3
+
+def test_failed_reload_keeps_existing_keys(capsys):
+    """
+    Tests that an unreachable key source doesn't drop the keys already loaded.
+    """
+    responses = [{"a": b"key-a" * 8}]
+    def loader():
+        if not responses:
+            raise OSError("jwks down")
+        return responses.pop()
+    keys = KeyRing(loader, reload_interval_s=0)
+    verifier = JWTVerifier(keys, algorithms=["HS256"])
+    exp = int(time.time()) + 60
+    failures = key_load_failures.value()
+    assert verifier.verify(token({"user_id": 1, "exp": exp}, key="key-a" * 8, kid="a"))
+    with pytest.raises(TokenRejected):
+        verifier.verify(token({"user_id": 1, "exp": exp}, key="key-b" * 8, kid="b"))
+    assert "jwks down" in capsys.readouterr().err
+    assert "jwks down" in keys.last_error
+    assert key_load_failures.value() == failures + 1
+    assert verifier.verify(token({"user_id": 1, "exp": exp + 1}, key="key-a" * 8, kid="a"))
+
+def test_verified_tokens_are_cached(mocker):
+    """
+    Tests that repeat verification of a token is served from the cache.
+    """
+    verifier = make_verifier(cache=TTLCache("test_auth", max_entries=8, ttl_s=60))
+    decode = mocker.spy(jwt, "decode")
+    t = token({"user_id": 7, "exp": int(time.time()) + 60})
+    assert verifier.verify(t) == verifier.verify(t)
+    assert decode.call_count == 1
+
+@pytest.mark.parametrize("algorithm", ["RS256", "EdDSA"])
+def test_asymmetric_tokens_verify_with_public_keys(tmp_path, algorithm):
+    """
+    Tests RS256/EdDSA verification from a directory of <kid>.pem public keys.
+    """
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    private = rsa.generate_private_key(65537, 2048) if algorithm == "RS256" else ed25519.Ed25519PrivateKey.generate()
+    (tmp_path / "k1.pem").write_bytes(private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    ))
+    verifier = JWTVerifier(KeyRing(pem_dir_loader(str(tmp_path), algorithm)), algorithms=[algorithm])
+
+    signed = token({"user_id": 7, "exp": int(time.time()) + 60}, key=private, kid="k1", algorithm=algorithm)
+    assert verifier.verify(signed)["user_id"] == 7
+    # a public key can't be used as an HMAC secret to forge tokens
+    forged = forged_hs256({"user_id": 1, "exp": int(time.time()) + 60}, (tmp_path / "k1.pem").read_bytes(), kid="k1")
+    with pytest.raises(TokenRejected) as exc_info:
+        verifier.verify(forged)
+    assert exc_info.value.reason == "algorithm"
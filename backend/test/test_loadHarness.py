@@ -0,0 +1,110 @@
+import json
+import asyncio
+import pytest
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from bench.mockLlmServer import create_app, MockConfig
+from bench.loadGenerator import percentile, summarize, stream_once, StreamResult
+from app.core.llm.sseParser import iter_content_deltas, iter_sse_chunks
+
+def fast_config(**overrides):
+    cfg = dict(ttft_s=0, tokens_per_s=0, jitter=0, max_tokens=5, seed=1)
+    cfg.update(overrides)
+    return MockConfig(**cfg)
+
+def test_mock_streams_openai_chunks():
+    """
+    Tests that the mock server streams OpenAI-style deltas the backend's SSE parser understands.
+    """
+    client = TestClient(create_app(fast_config()))
+    with client.stream("POST", "/v1/chat/completions", json={"model": "m", "messages": [], "stream": True}) as r:
+        assert r.status_code == 200
+        lines = list(r.iter_lines())
+    deltas = list(iter_content_deltas(lines))
+    assert len(deltas) == 5
+    assert "data: [DONE]" in lines
+
+def test_mock_non_streaming_completion():
+    """
+    Tests that a non-streaming request returns a full chat.completion body.
+    """
+    client = TestClient(create_app(fast_config(max_tokens=3)))
+    body = client.post("/v1/chat/completions", json={"model": "m", "messages": []}).json()
+    assert body["object"] == "chat.completion"
+    assert len(body["choices"][0]["message"]["content"].split()) == 3
+
+def test_mock_emits_tool_calls_when_tools_offered():
+    """
+    Tests that tool-call emission streams a web_search call and finishes with reason tool_calls.
+    """
+    client = TestClient(create_app(fast_config(tool_call_rate=1.0)))
+    payload = {"model": "m", "messages": [], "stream": True, "tools": [{"type": "function"}]}
+    with client.stream("POST", "/v1/chat/completions", json=payload) as r:
+        chunks = list(iter_sse_chunks(r.iter_lines()))
+    calls = [c["choices"][0]["delta"]["tool_calls"] for c in chunks if c["choices"][0]["delta"].get("tool_calls")]
+    assert calls[0][0]["function"]["name"] == "web_search"
+    assert json.loads(calls[0][0]["function"]["arguments"])["query"]
+    assert chunks[-1]["choices"][0]["finish_reason"] == "tool_calls"
+
+def test_mock_failure_injection_and_metrics():
+    """
+    Tests that injected failures return the configured status and show up on /metrics.
+    """
+    client = TestClient(create_app(fast_config(fail_rate=1.0, fail_status=429)))
+    r = client.post("/v1/chat/completions", json={"model": "m", "messages": [], "stream": True})
+    assert r.status_code == 429
+    text = client.get("/metrics").text
+    assert "vllm:num_requests_waiting 0" in text
+    assert "mock:failures_total 1" in text
+
+def test_percentile_nearest_rank():
+    """
+    Tests nearest-rank percentiles, including the empty case.
+    """
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 90) == 0.0
+
+def test_summarize_counts_errors_and_throughput():
+    """
+    Tests that the summary separates failures and computes token throughput over wall time.
+    """
+    results = [
+        StreamResult(ok=True, ttft_s=0.1, itl_s=[0.01, 0.02], tokens=3, latency_s=0.2),
+        StreamResult(ok=True, ttft_s=0.3, itl_s=[0.03], tokens=2, latency_s=0.4),
+        StreamResult(ok=False, error="http_429"),
+    ]
+    summary = summarize(results, wall_s=1.0)
+    assert summary["succeeded"] == 2
+    assert summary["errors"] == {"http_429": 1}
+    assert summary["tokens_per_s"] == 5
+    assert summary["ttft_s"]["p99"] == 0.3
+    assert summary["itl_s"]["n"] == 3
+
+def test_stream_once_measures_frames():
+    """
+    Tests that stream_once counts data frames, records TTFT/ITL and requires the done event.
+    """
+    app = FastAPI()
+
+    @app.post("/chat/{session_id}/messages/stream")
+    def stream(session_id: int):
+        def gen():
+            for word in ("a", "b", "c"):
+                yield f"data:{word}\n\n"
+            yield "event:done\ndata:ok\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await stream_once(client, 1, "hi", 0, {})
+
+    result = asyncio.run(go())
+    assert result.ok
+    assert result.tokens == 3
+    assert result.ttft_s is not None
+    assert len(result.itl_s) == 2
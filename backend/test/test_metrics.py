@@ -0,0 +1,116 @@
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.core import metrics
+from app.core.metrics import Registry, MetricsMiddleware
+from app.core.cache.ttlCache import TTLCache
+
+def test_render_counter_and_histogram():
+    """
+    Tests that counters and histograms render in the Prometheus text format with cumulative buckets.
+    """
+    registry = Registry()
+    requests = registry.counter("demo_requests_total", "Demo requests.", ("route",))
+    latency = registry.histogram("demo_latency_seconds", "Demo latency.", ("route",), buckets=(0.1, 1.0))
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5, route="/a")
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{route="/a"} 3' in text
+    assert 'demo_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'demo_latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_latency_seconds_count{route="/a"} 3' in text
+    assert 'demo_latency_seconds_sum{route="/a"} 5.55' in text
+
+def test_collector_failure_does_not_break_scrape():
+    """
+    Tests that a failing collector is skipped while the rest of the registry still renders.
+    """
+    registry = Registry()
+    registry.gauge("demo_up", "Demo gauge.").set(1)
+
+    def broken():
+        raise RuntimeError("boom")
+        yield
+
+    registry.register_collector(broken)
+    registry.register_collector(lambda: [("demo_collected", "gauge", "Collected.", [({"k": "v"}, 4)])])
+    text = registry.render()
+    assert "demo_up 1" in text
+    assert 'demo_collected{k="v"} 4' in text
+
+def test_ttl_cache_counts_hits_and_expires():
+    """
+    Tests that TTLCache records hits and misses and drops entries past their expiry.
+    """
+    cache = TTLCache("unit_test_cache", max_entries=2, ttl_s=60)
+    hits = lambda: metrics.cache_lookups.value(cache="unit_test_cache", result="hit")
+    misses = lambda: metrics.cache_lookups.value(cache="unit_test_cache", result="miss")
+    before_hits, before_misses = hits(), misses()
+
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    cache.set("b", 2, expires_at=time.time() - 1)
+    assert cache.get("b") is None
+    cache.set("c", 3)
+    cache.set("d", 4)  # evicts the least recently used entry
+    assert len(cache) == 2
+
+    assert hits() - before_hits == 1
+    assert misses() - before_misses == 2
+
+def test_disabled_ttl_cache_never_stores():
+    """
+    Tests that a TTL of zero turns the cache into a pass-through.
+    """
+    cache = TTLCache("unit_test_disabled", ttl_s=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+@pytest.fixture
+def metrics_app():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/stream")
+    def stream():
+        def gen():
+            assert metrics.sse_active.value() >= 1
+            yield "data:hi\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    return TestClient(app)
+
+def test_middleware_labels_requests_by_route_template(metrics_app):
+    """
+    Tests that requests are counted under the route template rather than the raw path.
+    """
+    before = metrics.http_requests.value(method="GET", route="/items/{item_id}", status="200")
+    metrics_app.get("/items/1")
+    metrics_app.get("/items/2")
+    metrics_app.get("/does-not-exist")
+    assert metrics.http_requests.value(method="GET", route="/items/{item_id}", status="200") - before == 2
+    assert metrics.http_requests.value(method="GET", route="unmatched", status="404") >= 1
+    assert metrics.http_latency.count(method="GET", route="/items/{item_id}") >= 2
+
+def test_middleware_tracks_active_sse_streams(metrics_app):
+    """
+    Tests that the active SSE gauge goes up while a stream is open and back down afterwards.
+    """
+    before = metrics.sse_active.value()
+    response = metrics_app.get("/stream")
+    assert response.text == "data:hi\n\n"
+    assert metrics.sse_active.value() == before
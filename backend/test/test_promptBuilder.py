@@ -0,0 +1,71 @@
+import json
+from types import SimpleNamespace
+from app.service.promptBuilder import (
+    PromptBuilder,
+    SYSTEM_PROMPT,
+    build_volatile_context,
+    history_window_start,
+)
+
+def _msgs(*pairs):
+    return [SimpleNamespace(role=r, content=c) for r, c in pairs]
+
+def _render(messages):
+    return "".join(json.dumps(m, ensure_ascii=False) for m in messages)
+
+def test_history_window_start_moves_in_steps():
+    """
+    Tests that the window start stays put until a whole step has overflowed.
+    """
+    assert history_window_start(50, window=100, step=20) == 0
+    assert history_window_start(100, window=100, step=20) == 0
+    assert history_window_start(101, window=100, step=20) == 20
+    assert history_window_start(120, window=100, step=20) == 20
+    assert history_window_start(121, window=100, step=20) == 40
+
+def test_history_window_keeps_newest_messages():
+    """
+    Tests that the newest message is always inside the window.
+    """
+    for total in range(1, 400):
+        start = history_window_start(total, window=100, step=20)
+        assert 0 < total - start <= 100
+
+def test_build_maps_robot_role_and_keeps_system_prompt_first():
+    """
+    Tests role normalization and the static system prefix.
+    """
+    messages = PromptBuilder().build(_msgs(("user", "hi"), ("robot", "hello")))
+
+    assert messages[0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert [m["role"] for m in messages[1:]] == ["user", "assistant"]
+
+def test_consecutive_turns_share_prefix():
+    """
+    Tests that the previous turn's prompt (minus volatile context) is a prefix of the next one.
+    """
+    builder = PromptBuilder()
+    turn1 = builder.build(_msgs(("user", "q1")), web_results="- [a](http://a) — x")
+    turn2 = builder.build(_msgs(("user", "q1"), ("robot", "a1"), ("user", "q2")), web_results="- [b](http://b) — y")
+
+    stable = _render(turn1[:-1])
+    assert _render(turn2).startswith(stable)
+    assert turn2[-1]["role"] == "system"
+    assert "http://b" in turn2[-1]["content"]
+
+def test_volatile_context_is_deterministic():
+    """
+    Tests that whitespace noise in context doesn't change the rendered bytes.
+    """
+    a = build_volatile_context(web_results="- x  \r\n- y", rag_docs=["doc one ", "doc two"])
+    b = build_volatile_context(web_results="- x\n- y", rag_docs=["doc one", "doc two"])
+
+    assert a == b
+    assert a.index("Web results") < a.index("LOCAL FILE CONTEXT")
+
+def test_no_volatile_block_without_context():
+    """
+    Tests that no trailing system message is emitted when there is no context.
+    """
+    messages = PromptBuilder().build(_msgs(("user", "hi")), web_results="", rag_docs=[])
+    assert [m["role"] for m in messages] == ["system", "user"]
@@ -0,0 +1,98 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.core.queryCounter import track, assert_query_budget, QueryCounterMiddleware
+from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
+from app.db.schema.chat import ChatSessionInCreate, MessageInCreate
+from app.service.chatService import ChatSessionService
+
+def _session_with_message(db_session):
+    chat = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=1))
+    msg = MessageRepository(session=db_session).create_message(
+        MessageInCreate(session_id=chat.id, role="user", content="hello there")
+    )
+    return chat, msg
+
+def test_track_counts_statements_and_repeats(db_session):
+    """
+    Tests that track() counts each executed statement and groups identical SQL.
+    """
+    with track() as stats:
+        for _ in range(3):
+            db_session.execute(text("SELECT 1")).scalar()
+        db_session.execute(text("SELECT 2")).scalar()
+    assert stats.count == 4
+    assert stats.total_ms >= 0
+    assert stats.repeated(threshold=3) == [("SELECT 1", 3)]
+
+def test_statements_outside_track_are_not_counted(db_session):
+    """
+    Tests that nothing is recorded once the tracking context has exited.
+    """
+    with track() as stats:
+        db_session.execute(text("SELECT 1"))
+    db_session.execute(text("SELECT 1"))
+    assert stats.count == 1
+
+def test_query_budget_exceeded_lists_statements(db_session):
+    """
+    Tests that going over the budget fails with the offending statements listed.
+    """
+    with pytest.raises(AssertionError) as exc:
+        with assert_query_budget(1):
+            db_session.execute(text("SELECT 1"))
+            db_session.execute(text("SELECT 1"))
+    assert "ran 2" in str(exc.value)
+    assert "2x SELECT 1" in str(exc.value)
+
+def test_create_message_query_budget(db_session):
+    """
+    Tests the statement budget of create_message, with and without auto-titling:
+    session lookup, insert, one counters/title update and the refresh.
+    """
+    chat_id = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=1)).id
+    repo = MessageRepository(session=db_session)
+    with assert_query_budget(4):
+        repo.create_message(MessageInCreate(session_id=chat_id, role="user", content="first message"))
+    with assert_query_budget(4):
+        repo.create_message(MessageInCreate(session_id=chat_id, role="robot", content="reply"))
+
+def test_delete_message_query_budget(db_session):
+    """
+    Tests the statement budget of ChatSessionService.delete_message.
+    """
+    chat, msg = _session_with_message(db_session)
+    chat_id, msg_id = chat.id, msg.id
+    with assert_query_budget(5):
+        ChatSessionService(session=db_session).delete_message(chat_id, msg_id)
+
+def test_middleware_sets_dev_headers(db_session):
+    """
+    Tests that in dev mode responses carry the request's statement count and DB time.
+    """
+    app = FastAPI()
+    app.add_middleware(QueryCounterMiddleware, dev_mode=True)
+
+    @app.get("/q")
+    def q():
+        db_session.execute(text("SELECT 1"))
+        db_session.execute(text("SELECT 1"))
+        return {}
+
+    response = TestClient(app).get("/q")
+    assert response.headers["x-db-queries"] == "2"
+    assert float(response.headers["x-db-time-ms"]) >= 0
+
+def test_middleware_without_dev_mode_adds_no_headers():
+    """
+    Tests that the headers are off unless dev mode is enabled.
+    """
+    app = FastAPI()
+    app.add_middleware(QueryCounterMiddleware, dev_mode=False)
+
+    @app.get("/q")
+    def q():
+        return {}
+
+    assert "x-db-queries" not in TestClient(app).get("/q").headers
@@ -4,6 +4,7 @@ from app.db.models.user import User
 from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
 from app.db.schema.chat import ChatSessionInCreate, MessageInCreate
 import pytest
+from unittest.mock import MagicMock
 
 def test_create_user(db_session):
     """
@@ -73,6 +74,30 @@ def test_create_message_success_with_auto_title(db_session):
     updated_session = session_repo.get_session_by_id(chat_session.id)
     assert updated_session.name == "Test messa" # SNIPPET_LEN is 10
 
+def test_deferred_auto_title(db_session):
+    """
+    Tests that auto_title=False leaves the name alone for the background titler,
+    which only renames sessions still carrying the default name.
+    """
+    session_repo = ChatSessionRepository(session=db_session)
+    untitled = session_repo.create_session(data=ChatSessionInCreate(user_id=1))
+    renamed = session_repo.create_session(data=ChatSessionInCreate(user_id=1))
+    msg_repo = MessageRepository(session=db_session)
+    for chat in (untitled, renamed):
+        msg_repo.create_message(data=MessageInCreate(session_id=chat.id, role="user", content="Deferred title"), auto_title=False)
+        msg_repo.create_message(data=MessageInCreate(session_id=chat.id, role="robot", content="Reply"), auto_title=False)
+    untitled_id, renamed_id = untitled.id, renamed.id
+    assert session_repo.get_session_by_id(untitled_id).name == "New Chat"
+
+    first_messages = session_repo.untitled_first_messages([untitled_id, renamed_id])
+    assert first_messages == {untitled_id: "Deferred title", renamed_id: "Deferred title"}
+
+    session_repo.rename_session(renamed_id, "Named by the user")
+    assert session_repo.set_default_titles({untitled_id: "Deferred", renamed_id: "Deferred"}) == 1
+    assert session_repo.get_session_by_id(untitled_id).name == "Deferred"
+    assert session_repo.get_session_by_id(renamed_id).name == "Named by the user"
+    assert session_repo.untitled_first_messages([untitled_id, renamed_id]) == {}
+
 def test_create_message_without_auto_title(db_session):
     """
     Tests creating a message in an existing session (no auto-titling).
@@ -312,4 +337,152 @@ def test_update_message_no_payload(db_session):
     
     # Assertions
     assert updated_message.content == "No update"
-    assert updated_message.role == "user"
\ No newline at end of file
+    assert updated_message.role == "user"
+
+def _seed_summaries(db_session, user_id=77):
+    from datetime import datetime, timedelta, timezone
+    from app.db.models.chat import ChatSession, Message
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    sessions = []
+    # session i gets i+1 messages; its last message is i hours after base
+    for i in range(3):
+        chat = ChatSession(user_id=user_id, name=f"chat {i}", create_date=base)
+        db_session.add(chat)
+        db_session.flush()
+        for j in range(i + 1):
+            db_session.add(Message(
+                session_id=chat.id, role="user" if j % 2 == 0 else "robot",
+                content=f"chat {i} message {j} " + "x" * 200,
+                create_date=base + timedelta(hours=i, minutes=j - i),
+            ))
+        sessions.append(chat)
+    empty = ChatSession(user_id=user_id, name="empty", create_date=base - timedelta(days=1))
+    db_session.add(empty)
+    db_session.add(ChatSession(user_id=user_id + 1, name="someone else", create_date=base))
+    db_session.commit()
+    # messages were inserted directly, so derive the session counters from them
+    from app.util.sessionCounters import backfill
+    backfill(db_session)
+    return sessions, empty
+
+def test_list_session_summaries(db_session):
+    """
+    Tests that summaries carry counts and last-message previews: empty sessions first,
+    then newest activity first.
+    """
+    from app.db.repository.chatRepo import PREVIEW_LEN
+    sessions, empty = _seed_summaries(db_session)
+    rows = ChatSessionRepository(session=db_session).list_session_summaries(user_id=77)
+
+    assert [r.id for r in rows] == [empty.id, sessions[2].id, sessions[1].id, sessions[0].id]
+    assert [r.message_count for r in rows] == [0, 3, 2, 1]
+    assert rows[0].last_message_at is None
+    assert rows[0].last_message_preview is None
+    assert rows[1].last_message_preview.startswith("chat 2 message 2")
+    assert len(rows[1].last_message_preview) == PREVIEW_LEN
+    assert rows[2].last_message_role == "robot"
+
+def test_list_session_summaries_keyset_pages(db_session):
+    """
+    Tests that following next_cursor walks every session exactly once.
+    """
+    from app.service.chatService import ChatSessionService
+    sessions, empty = _seed_summaries(db_session)
+    service = ChatSessionService(session=db_session)
+
+    seen, cursor = [], None
+    while True:
+        page = service.list_session_summaries(user_id=77, limit=1, cursor=cursor)
+        seen.extend(item.id for item in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == [empty.id, sessions[2].id, sessions[1].id, sessions[0].id]
+
+def test_list_session_summaries_single_statement(db_session):
+    """
+    Tests that the summary listing is one round trip regardless of session count.
+    """
+    from app.core.queryCounter import assert_query_budget
+    _seed_summaries(db_session)
+    with assert_query_budget(1):
+        ChatSessionRepository(session=db_session).list_session_summaries(user_id=77)
+
+def test_list_session_summaries_invalid_cursor(db_session):
+    """
+    Tests that a malformed cursor is rejected with a 400.
+    """
+    from fastapi import HTTPException
+    from app.service.chatService import ChatSessionService
+    with pytest.raises(HTTPException) as exc:
+        ChatSessionService(session=db_session).list_session_summaries(user_id=77, cursor="not-a-cursor")
+    assert exc.value.status_code == 400
+
+def test_bulk_create_messages(db_session, mocker):
+    """
+    Tests that bulk insert uses chunked statements, keeps order, updates counters and skips auto-title.
+    """
+    from app.db.repository import chatRepo
+    from app.core.queryCounter import track
+    from app.util.sessionCounters import find_drift
+    mocker.patch.object(chatRepo, 'BULK_INSERT_CHUNK', 2)
+    session_repo = ChatSessionRepository(session=db_session)
+    chat_id = session_repo.create_session(ChatSessionInCreate(user_id=1)).id
+    msg_repo = MessageRepository(session=db_session)
+
+    items = [{"role": "user" if i % 2 == 0 else "robot", "content": f"imported {i}"} for i in range(5)]
+    with track() as stats:
+        inserted = msg_repo.bulk_create_messages(session_id=chat_id, items=items)
+
+    assert inserted == 5
+    inserts = sum(n for sql, n in stats.statements.items() if sql.startswith("INSERT"))
+    assert inserts == 3  # ceil(5 / 2)
+    rows = msg_repo.list_messages_by_session(session_id=chat_id)
+    assert [m.content for m in rows] == [f"imported {i}" for i in range(5)]
+    chat = session_repo.get_session_by_id(chat_id)
+    assert chat.name == "New Chat"
+    assert chat.message_count == 5
+    assert find_drift(db_session) == []
+
+def test_bulk_create_messages_missing_session(db_session):
+    """
+    Tests that bulk insert into a missing session raises ValueError.
+    """
+    with pytest.raises(ValueError):
+        MessageRepository(session=db_session).bulk_create_messages(session_id=999999, items=[{"role": "user", "content": "x"}])
+
+
+def test_session_ownership_checks(db_session, mocker):
+    """
+    Tests owner-scoped lookups, and that a known owner answers session_exists without a query.
+    """
+    session_repo = ChatSessionRepository(session=db_session)
+    chat_session = session_repo.create_session(data=ChatSessionInCreate(user_id=7, name="Mine"))
+    message = MessageRepository(session=db_session).create_message(
+        data=MessageInCreate(session_id=chat_session.id, role="user", content="hello")
+    )
+
+    assert session_repo.get_session_by_id(chat_session.id, user_id=8) is None
+    assert session_repo.get_session_by_id(chat_session.id, user_id=7).id == chat_session.id
+    assert MessageRepository(session=db_session).update_message(message.id, content="x", user_id=8) is None
+    assert not session_repo.delete_session(chat_session.id, user_id=8)
+
+    execute = mocker.spy(db_session, "execute")
+    assert session_repo.session_exists(chat_session.id, user_id=7)
+    assert not session_repo.session_exists(chat_session.id, user_id=8)
+    assert execute.call_count == 0
+
+def test_list_session_summaries_uses_lateral_on_postgres(db_session, mocker):
+    """
+    Tests that on Postgres the previews come from one LATERAL ... LIMIT 1 join, not per-column subqueries.
+    """
+    from sqlalchemy.dialects import postgresql
+    pg = postgresql.dialect()
+    mocker.patch.object(db_session, "get_bind", return_value=MagicMock(dialect=pg))
+    execute = mocker.patch.object(db_session, "execute")
+
+    ChatSessionRepository(session=db_session).list_session_summaries(user_id=77)
+
+    sql = str(execute.call_args.args[0].compile(dialect=pg))
+    assert "LEFT OUTER JOIN LATERAL" in sql
+    assert sql.count("FROM messages") == 1
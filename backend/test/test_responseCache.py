@@ -0,0 +1,150 @@
+import pytest
+from unittest.mock import MagicMock
+from app.core.cache.responseCache import (
+    ResponseCache,
+    make_cache_key,
+    is_cacheable,
+    replay_as_sse,
+)
+from app.service.chatService import ChatSessionService
+from app.service import chatService
+
+
+def test_cache_key_ignores_whitespace_differences():
+    """
+    Tests that prompts differing only in whitespace hash to the same key.
+    """
+    a = make_cache_key("m", 0, [{"role": "user", "content": "hi  there "}], {"temperature": 0})
+    b = make_cache_key("m", 0, [{"role": "user", "content": "hi there"}], {"temperature": 0})
+    assert a == b
+
+def test_cache_key_depends_on_mode_and_sampling():
+    """
+    Tests that mode and sampling params are part of the key.
+    """
+    msgs = [{"role": "user", "content": "hi"}]
+    base = make_cache_key("m", 0, msgs, {"temperature": 0})
+    assert base != make_cache_key("m", 1, msgs, {"temperature": 0})
+    assert base != make_cache_key("m", 0, msgs, {"temperature": 0.7})
+
+def test_is_cacheable():
+    """
+    Tests that only temperature-0 or explicitly cacheable requests are eligible.
+    """
+    assert is_cacheable(0, False) is True
+    assert is_cacheable(None, False) is False
+    assert is_cacheable(0.7, False) is False
+    assert is_cacheable(0.7, True) is True
+
+def test_memory_tier_evicts_least_recently_used():
+    """
+    Tests the LRU memory tier eviction order.
+    """
+    cache = ResponseCache(enabled=True, max_entries=2, path="")
+    cache.set("a", "A")
+    cache.set("b", "B")
+    cache.get("a")
+    cache.set("c", "C")
+
+    assert cache.get("a") == "A"
+    assert cache.get("b") is None
+    assert cache.get("c") == "C"
+
+def test_persistent_tier_survives_new_instance(tmp_path):
+    """
+    Tests that answers stored in the SQLite tier are served by a fresh cache.
+    """
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(enabled=True, max_entries=2, path=path).set("k", "stored answer")
+
+    assert ResponseCache(enabled=True, max_entries=2, path=path).get("k") == "stored answer"
+
+def test_expired_entries_are_not_served(tmp_path):
+    """
+    Tests that entries past their TTL are treated as misses.
+    """
+    cache = ResponseCache(enabled=True, max_entries=2, ttl_s=-1, path=str(tmp_path / "c.sqlite3"))
+    cache.set("k", "old")
+    assert cache.get("k") is None
+
+def test_persistent_tier_keeps_one_connection_per_thread(tmp_path, mocker):
+    """
+    Tests that SQLite tier lookups reuse the thread's connection instead of opening one per call.
+    """
+    import sqlite3
+    import threading
+    connect = mocker.patch("app.core.cache.responseCache.sqlite3.connect", side_effect=sqlite3.connect)
+    cache = ResponseCache(enabled=True, max_entries=1, path=str(tmp_path / "c.sqlite3"))
+    for i in range(5):
+        cache.set(f"k{i}", "answer")
+        cache._memory.clear()
+        assert cache.get(f"k{i}") == "answer"
+    assert connect.call_count == 1
+
+    thread = threading.Thread(target=cache.get, args=("k0",))
+    thread.start()
+    thread.join()
+    assert connect.call_count == 2
+
+def test_disabled_cache_is_noop():
+    """
+    Tests that a disabled cache never stores or returns anything.
+    """
+    cache = ResponseCache(enabled=False, path="")
+    cache.set("k", "v")
+    assert cache.get("k") is None
+
+def test_replay_as_sse_reassembles_text():
+    """
+    Tests that replayed SSE frames concatenate back to the original answer.
+    """
+    text = "Hello there, this is a cached answer."
+    frames = list(replay_as_sse(text, chunk_words=2))
+
+    assert len(frames) > 1
+    assert all(f.startswith("data:") and f.endswith("\n\n") for f in frames)
+    assert "".join(f[len("data:"):-2] for f in frames) == text
+
+def test_stream_replays_cached_answer_without_calling_robot(mocker):
+    """
+    Tests that a cache hit is replayed as SSE and the robot endpoint is skipped.
+    """
+    service = ChatSessionService(session=MagicMock())
+    mocker.patch.object(service._sessions, 'session_exists', return_value=True)
+    mocker.patch.object(service._sessions, 'get_message_counters', return_value=MagicMock(message_count=0, last_message_at=None))
+    mocker.patch.object(service._messages, 'list_messages_by_session', return_value=[])
+    create_message = mocker.patch.object(service._messages, 'create_message')
+    stream_robot = mocker.patch.object(service, '_stream_robot')
+
+    cache = ResponseCache(enabled=True, max_entries=8, path="")
+    mocker.patch.object(chatService, 'response_cache', cache)
+    mocker.patch.object(cache, 'get', return_value="cached hello")
+
+    frames = list(service.stream_user_and_robot_message(session_id=1, user_text="hi", mode=0, temperature=0))
+
+    stream_robot.assert_not_called()
+    assert frames[0] == "data:cached hello\n\n"
+    assert frames[-1] == "event:done\ndata:ok\n\n"
+    assert create_message.call_args_list[-1].kwargs["data"].content == "cached hello"
+
+def test_stream_stores_answer_for_deterministic_request(mocker):
+    """
+    Tests that a temperature-0 generation is written to the cache.
+    """
+    service = ChatSessionService(session=MagicMock())
+    mocker.patch.object(service._sessions, 'session_exists', return_value=True)
+    mocker.patch.object(service._sessions, 'get_message_counters', return_value=MagicMock(message_count=0, last_message_at=None))
+    mocker.patch.object(service._messages, 'list_messages_by_session', return_value=[])
+    mocker.patch.object(service._messages, 'create_message')
+    mocker.patch.object(service, '_stream_robot', return_value=iter(["Hel", "lo"]))
+
+    cache = ResponseCache(enabled=True, max_entries=8, path="")
+    mocker.patch.object(chatService, 'response_cache', cache)
+
+    list(service.stream_user_and_robot_message(session_id=1, user_text="hi", mode=0, temperature=0))
+    assert len(cache._memory._entries) == 1
+
+    # sampled requests bypass the cache
+    mocker.patch.object(service, '_stream_robot', return_value=iter(["x"]))
+    list(service.stream_user_and_robot_message(session_id=1, user_text="hi", mode=0, temperature=0.8))
+    assert len(cache._memory._entries) == 1
@@ -70,8 +70,9 @@ def test_login_wrong_credentials(client: TestClient):
 # --- Test chatRouter ---
 # These tests cover CRUD for chat sessions.
 
-def test_create_chat_session_success(client: TestClient):
+def test_create_chat_session_success(client: TestClient, login_as):
     """Tests creating a chat session for a user."""
+    login_as(1)
     payload = {"user_id": 1, "name": "New Chat"}
     response = client.post("/chat", json=payload)
     
@@ -81,8 +82,9 @@ def test_create_chat_session_success(client: TestClient):
     assert data["user_id"] == 1
     assert data["name"] == "New Chat"
 
-def test_get_chat_session_success(client: TestClient):
+def test_get_chat_session_success(client: TestClient, login_as):
     """Tests retrieving a specific chat session."""
+    login_as(1)
     create_payload = {"user_id": 1, "name": "Session to Get"}
     create_response = client.post("/chat", json=create_payload)
     session_id = create_response.json()["id"]
@@ -94,8 +96,9 @@ def test_get_chat_session_success(client: TestClient):
     assert data["id"] == session_id
     assert data["name"] == "Session to Get"
 
-def test_list_sessions_by_user_success(client: TestClient):
+def test_list_sessions_by_user_success(client: TestClient, login_as):
     """Tests listing chat sessions for a specific user."""
+    login_as(2)
     user_id = 2
     client.post("/chat", json={"user_id": user_id, "name": "Chat A"})
     client.post("/chat", json={"user_id": user_id, "name": "Chat B"})
@@ -107,8 +110,68 @@ def test_list_sessions_by_user_success(client: TestClient):
     assert len(data) == 2
     assert data[0]["name"] == "Chat B"
 
-def test_update_chat_session_success(client: TestClient):
+def test_list_session_summaries_success(client: TestClient, login_as):
+    """Tests the sidebar summaries endpoint with counts, previews and a next cursor."""
+    login_as(5)
+    user_id = 5
+    first = client.post("/chat", json={"user_id": user_id, "name": "Chat A"}).json()
+    client.post(f"/chat/{first['id']}/messages", json={"role": "user", "content": "hello"})
+    client.post("/chat", json={"user_id": user_id, "name": "Chat B"})
+
+    response = client.get(f"/chat/summaries?user_id={user_id}&limit=1")
+
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["items"]) == 1
+    assert page["next_cursor"]
+
+    response = client.get(f"/chat/summaries?user_id={user_id}&limit=1&cursor={page['next_cursor']}")
+    rest = response.json()
+    items = page["items"] + rest["items"]
+    assert {item["name"] for item in items} == {"Chat A", "Chat B"}
+    assert sum(item["message_count"] for item in items) == 1
+    assert rest["next_cursor"] is None
+
+def test_search_messages_success(client: TestClient, login_as):
+    """Tests full-text search: user scoping, highlighted snippets and offset paging."""
+    login_as(6)
+    user_id = 6
+    chat = client.post("/chat", json={"user_id": user_id, "name": "Trips"}).json()
+    client.post(f"/chat/{chat['id']}/messages", json={"role": "user", "content": "Plan a trip to Lisbon in May"})
+    client.post(f"/chat/{chat['id']}/messages", json={"role": "robot", "content": "Lisbon is lovely in spring"})
+    login_as(user_id + 1)
+    other = client.post("/chat", json={"user_id": user_id + 1, "name": "Not mine"}).json()
+    client.post(f"/chat/{other['id']}/messages", json={"role": "user", "content": "Lisbon again"})
+    login_as(user_id)
+
+    response = client.get(f"/chat/search?user_id={user_id}&q=lisbon&limit=1")
+
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["items"]) == 1
+    assert page["next_offset"] == 1
+    assert "<mark>Lisbon</mark>" in page["items"][0]["snippet"]
+    assert page["items"][0]["session_name"] == "Trips"
+
+    rest = client.get(f"/chat/search?user_id={user_id}&q=lisbon&limit=1&offset=1").json()
+    assert rest["next_offset"] is None
+    assert {hit["session_id"] for hit in page["items"] + rest["items"]} == {chat["id"]}
+
+def test_search_messages_requires_query(client: TestClient, login_as):
+    """Tests that an empty search query is rejected."""
+    login_as(1)
+    response = client.get("/chat/search?user_id=1&q=")
+    assert response.status_code == 422
+
+def test_semantic_search_disabled_by_default(client: TestClient, login_as):
+    """Tests that semantic history search answers 503 until the index is enabled."""
+    login_as(1)
+    response = client.get("/chat/semantic_search?user_id=1&q=that docker conversation")
+    assert response.status_code == 503
+
+def test_update_chat_session_success(client: TestClient, login_as):
     """Tests updating the name of a chat session."""
+    login_as(3)
     create_response = client.post("/chat", json={"user_id": 3, "name": "Old Name"})
     session_id = create_response.json()["id"]
     
@@ -119,8 +182,9 @@ def test_update_chat_session_success(client: TestClient):
     data = response.json()
     assert data["name"] == "New Name"
 
-def test_delete_chat_session_success(client: TestClient):
+def test_delete_chat_session_success(client: TestClient, login_as):
     """Tests deleting a chat session."""
+    login_as(4)
     create_response = client.post("/chat", json={"user_id": 4, "name": "To Be Deleted"})
     session_id = create_response.json()["id"]
     
@@ -133,10 +197,11 @@ def test_delete_chat_session_success(client: TestClient):
 
 # --- New tests for chatRouter and messagesRouter ---
 
-def test_list_messages_for_session_success(client: TestClient):
+def test_list_messages_for_session_success(client: TestClient, login_as):
     """
     Tests listing messages for a specific chat session.
     """
+    login_as(10)
     user_id = 10
     session_id = client.post("/chat", json={"user_id": user_id, "name": "Message List Session"}).json()["id"]
     client.post(f"/chat/{session_id}/messages", json={"role": "user", "content": "Msg 1"})
@@ -149,10 +214,11 @@ def test_list_messages_for_session_success(client: TestClient):
     assert len(data) == 2
     assert data[0]["content"] == "Msg 1"
 
-def test_create_message_for_session_success(client: TestClient):
+def test_create_message_for_session_success(client: TestClient, login_as):
     """
     Tests creating a new message inside a chat session.
     """
+    login_as(5)
     create_response = client.post("/chat", json={"user_id": 5, "name": "Message Test Session"})
     session_id = create_response.json()["id"]
     
@@ -165,10 +231,11 @@ def test_create_message_for_session_success(client: TestClient):
     assert data["session_id"] == session_id
     assert data["content"] == "Hello, world!"
     
-def test_get_session_with_messages_success(client: TestClient):
+def test_get_session_with_messages_success(client: TestClient, login_as):
     """
     Tests retrieving a chat session with its messages eagerly loaded.
     """
+    login_as(20)
     user_id = 20
     session_id = client.post("/chat", json={"user_id": user_id, "name": "Session with Messages"}).json()["id"]
     client.post(f"/chat/{session_id}/messages", json={"role": "user", "content": "Hello"})
@@ -183,10 +250,53 @@ def test_get_session_with_messages_success(client: TestClient):
     assert len(data["messages"]) == 2
     assert data["messages"][0]["content"] == "Hello"
 
-def test_delete_message_in_session_success(client: TestClient):
+def test_stream_session_with_messages_success(client: TestClient, login_as):
+    """
+    Tests the streaming transcript export in both formats, and its 404.
+    """
+    login_as(5)
+    import json
+    session_id = client.post("/chat", json={"user_id": 5, "name": "Export"}).json()["id"]
+    client.post(f"/chat/{session_id}/messages", json={"role": "user", "content": "Msg 1"})
+    client.post(f"/chat/{session_id}/messages", json={"role": "robot", "content": "Msg 2"})
+
+    response = client.get(f"/chat/{session_id}/with_messages/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [l["type"] for l in lines] == ["session", "message", "message"]
+
+    response = client.get(f"/chat/{session_id}/with_messages/stream?format=json")
+    assert [m["content"] for m in response.json()["messages"]] == ["Msg 1", "Msg 2"]
+
+    assert client.get("/chat/999999/with_messages/stream").status_code == 404
+
+def test_bulk_import_and_user_export(client: TestClient, login_as):
+    """
+    Tests bulk-importing messages into a session and exporting the user's history.
+    """
+    login_as(6)
+    import json
+    user_id = 6
+    session_id = client.post("/chat", json={"user_id": user_id}).json()["id"]
+    messages = [{"role": "user", "content": f"row {i}"} for i in range(50)]
+
+    response = client.post(f"/chat/{session_id}/messages/bulk", json={"messages": messages})
+    assert response.status_code == 201
+    assert response.json() == {"session_id": session_id, "inserted": 50}
+    assert client.post("/chat/999999/messages/bulk", json={"messages": messages}).status_code == 404
+
+    response = client.get(f"/chat/export?user_id={user_id}")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["type"] == "session" and lines[0]["message_count"] == 50
+    assert [l["content"] for l in lines[1:]] == [m["content"] for m in messages]
+
+def test_delete_message_in_session_success(client: TestClient, login_as):
     """
     Tests deleting a message within a session.
     """
+    login_as(30)
     user_id = 30
     session_id = client.post("/chat", json={"user_id": user_id, "name": "Session with Deletable Message"}).json()["id"]
     message_id = client.post(f"/chat/{session_id}/messages", json={"role": "user", "content": "Delete me"}).json()["id"]
@@ -199,10 +309,11 @@ def test_delete_message_in_session_success(client: TestClient):
     get_response = client.get(f"/chat/{session_id}/messages")
     assert len(get_response.json()) == 0
 
-def test_update_message_success(client: TestClient):
+def test_update_message_success(client: TestClient, login_as):
     """
     Tests updating a message's content via the messagesRouter PUT endpoint.
     """
+    login_as(40)
     user_id = 40
     session_id = client.post("/chat", json={"user_id": user_id, "name": "Session to Update Message"}).json()["id"]
     message_id = client.post(f"/chat/{session_id}/messages", json={"role": "user", "content": "Old content"}).json()["id"]
@@ -215,10 +326,11 @@ def test_update_message_success(client: TestClient):
     assert data["content"] == "New content"
     assert data["role"] == "robot"
     
-def test_stream_message_success(client: TestClient, mocker):
+def test_stream_message_success(client: TestClient, login_as, mocker):
     """
     Tests the streaming message endpoint.
     """
+    login_as(50)
     user_id = 50
     session_id = client.post("/chat", json={"user_id": user_id, "name": "Streaming Test Session"}).json()["id"]
     
@@ -242,4 +354,44 @@ def test_stream_message_success(client: TestClient, mocker):
     streamed_data = response.content.decode('utf-8')
     assert "data: Hello\n\n" in streamed_data
     assert "data: world!\n\n" in streamed_data
-    assert "event:done\ndata:ok\n\n" in streamed_data
\ No newline at end of file
+    assert "event:done\ndata:ok\n\n" in streamed_data
+def test_stream_message_rejected_over_capacity(client: TestClient, login_as, mocker):
+    """
+    Tests that the streaming endpoint answers 429 with Retry-After when admission fails.
+    """
+    login_as(51)
+    from app.core.admission import AdmissionRejected
+
+    session_id = client.post("/chat", json={"user_id": 51, "name": "Busy Session"}).json()["id"]
+    mocker.patch('app.routers.chat.admission.acquire', side_effect=AdmissionRejected("per_user", 7))
+
+    response = client.post(f"/chat/{session_id}/messages/stream", json={"content": "hi", "mode": 0})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "7"
+
+
+def test_chat_routes_require_authentication(client: TestClient):
+    """Tests that chat routes reject requests without a valid token."""
+    assert client.get("/chat").status_code == 401
+    assert client.post("/chat", json={"user_id": 1}).status_code == 401
+    assert client.get("/chat/1/messages").status_code == 401
+
+def test_chat_routes_enforce_ownership(client: TestClient, login_as):
+    """Tests that another user's sessions look like they don't exist, and other users' listings are refused."""
+    login_as(60)
+    session_id = client.post("/chat", json={"user_id": 60, "name": "Private"}).json()["id"]
+    message_id = client.post(f"/chat/{session_id}/messages", json={"role": "user", "content": "secret"}).json()["id"]
+
+    login_as(61)
+    assert client.get(f"/chat/{session_id}").status_code == 404
+    assert client.get(f"/chat/{session_id}/messages").status_code == 404
+    assert client.post(f"/chat/{session_id}/messages", json={"role": "user", "content": "hi"}).status_code == 404
+    assert client.put(f"/messages/{message_id}", json={"content": "edited"}).status_code == 404
+    assert client.delete(f"/chat/{session_id}").status_code == 404
+    assert client.post(f"/chat/{session_id}/messages/stream", json={"content": "hi", "mode": 0}).status_code == 404
+    assert client.get("/chat?user_id=60").status_code == 403
+    assert client.post("/chat", json={"user_id": 60}).status_code == 403
+
+    login_as(60)
+    assert client.get(f"/chat/{session_id}").status_code == 200
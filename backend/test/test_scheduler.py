@@ -0,0 +1,98 @@
+import threading
+import time
+import pytest
+from app.core.scheduler import (
+    GenerationScheduler,
+    SchedulerTimeout,
+    INTERACTIVE,
+    THINKING,
+    STANDARD,
+    PREMIUM,
+)
+
+def _queue_up(sched, jobs, order):
+    """Start one thread per (mode, user_id) job; each records its turn and releases at once."""
+    threads = []
+    for mode, user_id in jobs:
+        def run(mode=mode, user_id=user_id):
+            key = sched.acquire(mode, user_id)
+            order.append(key)
+            sched.release(key)
+        t = threading.Thread(target=run)
+        t.start()
+        threads.append(t)
+        time.sleep(0.01)
+    return threads
+
+def test_classify_by_mode_and_tier():
+    """
+    Tests mode 1 maps to the thinking class and listed users to the premium tier.
+    """
+    sched = GenerationScheduler(premium_users=[7])
+    assert sched.classify(1, 3) == (THINKING, STANDARD)
+    assert sched.classify(2, 7) == (INTERACTIVE, PREMIUM)
+    assert sched.classify(0, None) == (INTERACTIVE, STANDARD)
+
+def test_interactive_jobs_overtake_queued_thinking_jobs():
+    """
+    Tests that chat turns queued behind several thinking jobs are dispatched first.
+    """
+    sched = GenerationScheduler(slots=1, reserved_interactive=0, wait_timeout_s=5)
+    blocker = sched.acquire(0, 1)
+    order = []
+    threads = _queue_up(sched, [(1, 1), (1, 2), (1, 3), (0, 4)], order)
+
+    sched.release(blocker)
+    for t in threads:
+        t.join(timeout=5)
+
+    classes = [cls for cls, _ in order]
+    assert classes.index(INTERACTIVE) < 2
+    assert classes.count(THINKING) == 3
+
+def test_thinking_jobs_still_progress_under_chat_load():
+    """
+    Tests weighted fairness: thinking jobs are not starved by a stream of chat turns.
+    """
+    sched = GenerationScheduler(slots=1, reserved_interactive=0, wait_timeout_s=5)
+    blocker = sched.acquire(0, 1)
+    order = []
+    threads = _queue_up(sched, [(1, 1)] + [(0, u) for u in range(2, 26)], order)
+
+    sched.release(blocker)
+    for t in threads:
+        t.join(timeout=5)
+
+    assert [cls for cls, _ in order].index(THINKING) < len(order) - 1
+
+def test_thinking_cap_reserves_interactive_slots():
+    """
+    Tests that thinking jobs cannot occupy the reserved interactive slots.
+    """
+    sched = GenerationScheduler(slots=2, reserved_interactive=1, wait_timeout_s=0.05)
+    held = sched.acquire(1, 1)
+
+    with pytest.raises(SchedulerTimeout):
+        sched.acquire(1, 2)
+    # a chat turn still gets the reserved slot
+    assert sched.acquire(0, 3) == (INTERACTIVE, STANDARD)
+    sched.release(held)
+
+def test_priority_hint():
+    """
+    Tests vLLM priority values, and that nothing is sent when disabled.
+    """
+    sched = GenerationScheduler(premium_users=[9], vllm_priority=True)
+    assert sched.priority_hint(0, 1) < sched.priority_hint(1, 1)
+    assert sched.priority_hint(1, 9) < sched.priority_hint(1, 1)
+    assert GenerationScheduler(vllm_priority=False).priority_hint(0, 1) is None
+
+def test_slot_context_manager_releases():
+    """
+    Tests that the slot is returned even when the body raises.
+    """
+    sched = GenerationScheduler(slots=1, reserved_interactive=0)
+    with pytest.raises(RuntimeError):
+        with sched.slot(0, 1):
+            raise RuntimeError("boom")
+    assert sched.stats()["running"] == {INTERACTIVE: 0, THINKING: 0}
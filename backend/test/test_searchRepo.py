@@ -0,0 +1,87 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from app.core.database import Base
+from app.db.models.chat import Message
+from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
+from app.db.repository.searchRepo import MessageSearchRepository, fts5_query
+from app.db.schema.chat import ChatSessionInCreate, MessageInCreate
+from app.util.searchIndex import ensure_search_index, SQLITE_FTS_TABLE
+
+def _chat_with(db_session, user_id, *contents, name="Chat"):
+    chat = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=user_id, name=name))
+    repo = MessageRepository(session=db_session)
+    messages = [repo.create_message(MessageInCreate(session_id=chat.id, role="user", content=c)) for c in contents]
+    return chat, messages
+
+def test_fts5_query_quotes_words():
+    """
+    Tests that user input becomes quoted terms with a prefix match on the last word.
+    """
+    assert fts5_query('docker "compose" OR up-') == '"docker" "compose" "OR" "up"*'
+    assert fts5_query("  ***  ") == ""
+
+def test_search_ranks_and_highlights(db_session):
+    """
+    Tests that matches are ranked, highlighted and scoped to the user.
+    """
+    chat, _ = _chat_with(
+        db_session, 301,
+        "postgres tuning: postgres vacuum and postgres indexes",
+        "a passing mention of postgres",
+        "nothing relevant here",
+        name="DB notes",
+    )
+    _chat_with(db_session, 302, "postgres from another user")
+
+    hits = MessageSearchRepository(session=db_session).search(user_id=301, q="postgres")
+
+    assert len(hits) == 2
+    assert hits[0].rank >= hits[1].rank
+    assert hits[0].snippet.count("<mark>postgres</mark>") == 3
+    assert {hit.session_id for hit in hits} == {chat.id}
+    assert hits[0].session_name == "DB notes"
+
+def test_search_prefix_and_session_filter(db_session):
+    """
+    Tests prefix matching on the last word and the session_id filter.
+    """
+    first, _ = _chat_with(db_session, 303, "kubernetes deployment failed")
+    second, _ = _chat_with(db_session, 303, "kubernetes deployment succeeded")
+    repo = MessageSearchRepository(session=db_session)
+
+    assert len(repo.search(user_id=303, q="kubernetes deploy")) == 2
+    hits = repo.search(user_id=303, q="kubernetes", session_id=second.id)
+    assert [hit.session_id for hit in hits] == [second.id]
+    assert repo.search(user_id=303, q='"') == []
+
+def test_index_follows_updates_and_deletes(db_session):
+    """
+    Tests that the triggers keep the index in sync with edited and deleted messages.
+    """
+    _, (msg,) = _chat_with(db_session, 304, "original wording")
+    messages = MessageRepository(session=db_session)
+    repo = MessageSearchRepository(session=db_session)
+
+    messages.update_message(msg.id, content="rewritten text")
+    assert repo.search(user_id=304, q="original") == []
+    assert [hit.message_id for hit in repo.search(user_id=304, q="rewritten")] == [msg.id]
+
+    messages.delete_message(msg.id)
+    assert repo.search(user_id=304, q="rewritten") == []
+
+def test_ensure_search_index_indexes_existing_rows(tmp_path):
+    """
+    Tests that creating the index on an existing database indexes the old messages.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.insert().values(session_id=1, role="user", content="written before search"))
+
+    assert ensure_search_index(engine) is True
+    assert ensure_search_index(engine) is True
+    assert SQLITE_FTS_TABLE in inspect(engine).get_table_names()
+    with engine.connect() as conn:
+        count = conn.exec_driver_sql(f"SELECT count(*) FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH 'before'").scalar()
+    assert count == 1
+    engine.dispose()
@@ -0,0 +1,100 @@
+import uuid
+import pytest
+import chromadb
+from unittest.mock import MagicMock
+from app.core.cache.semanticCache import SemanticCache
+from app.service.chatService import ChatSessionService
+from app.service import chatService
+
+# Tiny bag-of-words embedder: paraphrases sharing words land close together
+VOCAB = ["capital", "japan", "tokyo", "what", "is", "the", "weather", "poem", "city"]
+
+def fake_embed(text):
+    words = text.lower().replace("?", "").split()
+    return [float(words.count(w)) + 0.01 for w in VOCAB]
+
+@pytest.fixture
+def cache():
+    client = chromadb.EphemeralClient()
+    return SemanticCache(
+        enabled=True,
+        threshold=0.9,
+        max_entries=2,
+        collection_name=f"test-{uuid.uuid4().hex}",
+        client_factory=lambda: client,
+        embed_fn=fake_embed,
+    )
+
+def test_lookup_serves_paraphrase_above_threshold(cache):
+    """
+    Tests that a near-duplicate question returns the stored answer.
+    """
+    ns = SemanticCache.namespace("m", 0)
+    cache.store(ns, "What is the capital of Japan?", "Tokyo.")
+
+    assert cache.lookup(ns, "what is the capital of japan") == "Tokyo."
+    assert cache.lookup(ns, "write a poem") is None
+
+def test_namespaces_are_isolated(cache):
+    """
+    Tests that answers stored for one mode are not served to another.
+    """
+    cache.store(SemanticCache.namespace("m", 0), "capital of japan", "Tokyo.")
+    assert cache.lookup(SemanticCache.namespace("m", 3), "capital of japan") is None
+
+def test_stats_report_hit_rate(cache):
+    """
+    Tests hit/miss counters per namespace.
+    """
+    ns = SemanticCache.namespace("m", 0)
+    cache.store(ns, "capital of japan", "Tokyo.")
+    cache.lookup(ns, "capital of japan")
+    cache.lookup(ns, "weather poem")
+
+    assert cache.stats()[ns] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+def test_evict_drops_least_recently_hit(cache):
+    """
+    Tests that eviction keeps max_entries, preferring recently hit entries.
+    """
+    ns = SemanticCache.namespace("m", 0)
+    cache.store(ns, "capital of japan", "Tokyo.")
+    cache.store(ns, "weather", "Sunny.")
+    cache.store(ns, "poem", "Roses.")
+    cache.lookup(ns, "capital of japan")
+
+    assert cache.evict(ns) == 1
+    assert cache.lookup(ns, "capital of japan") == "Tokyo."
+    assert cache.lookup(ns, "poem") == "Roses."
+    assert cache.lookup(ns, "weather") is None
+
+def test_expired_entries_are_missed_and_evicted(cache):
+    """
+    Tests that entries past the TTL are not served and are removed by evict().
+    """
+    cache._ttl_s = -1
+    ns = SemanticCache.namespace("m", 0)
+    cache.store(ns, "capital of japan", "Tokyo.")
+
+    assert cache.lookup(ns, "capital of japan") is None
+    assert cache.evict(ns) == 1
+
+def test_stream_serves_semantic_hit_on_first_turn(cache, mocker):
+    """
+    Tests that a first-turn semantic hit skips web search and the robot call.
+    """
+    service = ChatSessionService(session=MagicMock())
+    mocker.patch.object(service._sessions, 'session_exists', return_value=True)
+    mocker.patch.object(service._sessions, 'get_message_counters', return_value=MagicMock(message_count=1, last_message_at=None))
+    mocker.patch.object(service._messages, 'list_messages_by_session', return_value=[MagicMock(role="user", content="capital of japan")])
+    mocker.patch.object(service._messages, 'create_message')
+    stream_robot = mocker.patch.object(service, '_stream_robot')
+    web_search = mocker.patch('app.service.chatService.web_search_summary')
+    mocker.patch.object(chatService, 'semantic_cache', cache)
+
+    cache.store(cache.namespace(chatService.ROBOT_MODEL, 2), "Capital of Japan?", "Tokyo.")
+    frames = list(service.stream_user_and_robot_message(session_id=1, user_text="capital of japan", mode=2, temperature=0))
+
+    stream_robot.assert_not_called()
+    web_search.assert_not_called()
+    assert frames == ["data:Tokyo.\n\n", "event:done\ndata:ok\n\n"]
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from app.db.models.chat import ChatSession, Message
+from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
+from app.db.schema.chat import ChatSessionInCreate, MessageInCreate
+from app.util.sessionCounters import find_drift, backfill, ensure_counter_columns
+
+def _new_session(db_session):
+    return ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=1))
+
+def test_create_message_maintains_counters(db_session):
+    """
+    Tests that inserting messages bumps message_count and last_message_at.
+    """
+    chat = _new_session(db_session)
+    repo = MessageRepository(session=db_session)
+    assert chat.message_count == 0
+    assert chat.last_message_at is None
+
+    repo.create_message(MessageInCreate(session_id=chat.id, role="user", content="hi"))
+    last = repo.create_message(MessageInCreate(session_id=chat.id, role="robot", content="hello"))
+
+    db_session.refresh(chat)
+    assert chat.message_count == 2
+    assert chat.last_message_at == last.create_date
+    assert ChatSessionRepository(session=db_session).count_messages(chat.id) == 2
+    assert find_drift(db_session) == []
+
+def test_delete_message_maintains_counters(db_session):
+    """
+    Tests that deleting the latest message decrements the count and rewinds last_message_at.
+    """
+    chat = _new_session(db_session)
+    repo = MessageRepository(session=db_session)
+    first = repo.create_message(MessageInCreate(session_id=chat.id, role="user", content="hi"))
+    second = repo.create_message(MessageInCreate(session_id=chat.id, role="robot", content="hello"))
+
+    assert repo.delete_message(second.id) is True
+    db_session.refresh(chat)
+    assert chat.message_count == 1
+    assert chat.last_message_at == first.create_date
+
+    assert repo.delete_message(first.id) is True
+    db_session.refresh(chat)
+    assert chat.message_count == 0
+    assert chat.last_message_at is None
+    assert find_drift(db_session) == []
+
+def test_find_drift_and_backfill(db_session):
+    """
+    Tests that out-of-band message inserts are reported and repaired by backfill.
+    """
+    chat = _new_session(db_session)
+    db_session.add(Message(session_id=chat.id, role="user", content="inserted behind the repo's back"))
+    db_session.commit()
+
+    drift = find_drift(db_session)
+    assert [(row.id, row.message_count, row.actual_count) for row in drift] == [(chat.id, 0, 1)]
+
+    backfill(db_session)
+    assert find_drift(db_session) == []
+    db_session.refresh(chat)
+    assert chat.message_count == 1
+
+def test_ensure_counter_columns_upgrades_old_schema(tmp_path):
+    """
+    Tests that a chat_sessions table from before the counters gets the columns and indexes.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(50), email VARCHAR(75), password VARCHAR(250))"))
+        conn.execute(text("CREATE TABLE chat_sessions (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, create_date DATETIME)"))
+        conn.execute(text("CREATE TABLE messages (id INTEGER PRIMARY KEY, session_id INTEGER NOT NULL, role VARCHAR(20) NOT NULL, content TEXT NOT NULL, create_date DATETIME)"))
+
+    assert ensure_counter_columns(engine) is True
+    columns = {c["name"] for c in inspect(engine).get_columns("chat_sessions")}
+    assert {"message_count", "last_message_at"} <= columns
+    assert "ix_chat_sessions_user_last_message" in {i["name"] for i in inspect(engine).get_indexes("chat_sessions")}
+    assert "ix_messages_session_created" in {i["name"] for i in inspect(engine).get_indexes("messages")}
+    assert ensure_counter_columns(engine) is False
+    engine.dispose()
@@ -0,0 +1,115 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.core.cache.sessionWindowCache import SessionWindowCache, CachedMessage, session_window_cache
+from app.core.queryCounter import track
+from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
+from app.db.schema.chat import ChatSessionInCreate, MessageInCreate
+from app.service.chatService import ChatSessionService
+
+def _msg(i, content="x"):
+    return CachedMessage(i, "user", content, datetime(2026, 1, 1, 0, 0, i % 60))
+
+def test_append_keeps_newest_window():
+    """
+    Tests that write-through appends track the counters and trim to the window.
+    """
+    cache = SessionWindowCache(window=3)
+    cache.put(1, 2, _msg(2).create_date, [_msg(1), _msg(2)])
+    for i in (3, 4):
+        cache.append(1, _msg(i))
+
+    assert [m.id for m in cache.get(1, 4, _msg(4).create_date)] == [2, 3, 4]
+    assert cache.get(1, 5, _msg(4).create_date) is None  # counters moved on elsewhere
+    assert len(cache) == 0
+
+def test_append_ignores_uncached_sessions():
+    """
+    Tests that appends don't create partial entries for sessions never read.
+    """
+    cache = SessionWindowCache()
+    cache.append(7, _msg(1))
+    assert len(cache) == 0
+
+def test_memory_cap_evicts_least_recent():
+    """
+    Tests eviction by approximate size, least recently used first.
+    """
+    cache = SessionWindowCache(max_bytes=1000)
+    cache.put(1, 1, None, [_msg(1, "a" * 300)])
+    cache.put(2, 1, None, [_msg(1, "b" * 300)])
+    cache.get(1, 1, None)
+    cache.put(3, 1, None, [_msg(1, "c" * 300)])
+
+    assert cache.get(2, 1, None) is None
+    assert cache.get(1, 1, None) is not None
+    assert cache.stats()["bytes"] <= 1000
+
+def test_disabled_cache_stores_nothing():
+    """
+    Tests that a disabled cache never serves entries.
+    """
+    cache = SessionWindowCache(enabled=False)
+    cache.put(1, 0, None, [])
+    assert cache.get(1, 0, None) is None
+
+def test_hot_session_history_skips_message_reads(db_session):
+    """
+    Tests that after the first load, new messages are written through and the next
+    history load only checks the session counters.
+    """
+    chat_id = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=1)).id
+    repo = MessageRepository(session=db_session)
+    service = ChatSessionService(session=db_session)
+    repo.create_message(MessageInCreate(session_id=chat_id, role="user", content="hi"))
+
+    total, window, cached = service._load_history_window(chat_id)
+    assert (total, cached) == (1, False)
+
+    repo.create_message(MessageInCreate(session_id=chat_id, role="robot", content="hello"))
+    with track() as stats:
+        total, window, cached = service._load_history_window(chat_id)
+    assert (total, cached) == (2, True)
+    assert [m.content for m in window] == ["hi", "hello"]
+    assert stats.count == 1
+    assert "messages" not in list(stats.statements)[0].split("FROM")[1]
+
+@pytest.mark.parametrize("change", ["update", "delete", "delete_session"])
+def test_writes_invalidate_the_window(db_session, change):
+    """
+    Tests that edits, deletes and session deletes drop the cached window.
+    """
+    chat = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=1))
+    repo = MessageRepository(session=db_session)
+    msg = repo.create_message(MessageInCreate(session_id=chat.id, role="user", content="hi"))
+    ChatSessionService(session=db_session)._load_history_window(chat.id)
+    assert len(session_window_cache) == 1
+
+    if change == "update":
+        repo.update_message(msg.id, content="edited")
+    elif change == "delete":
+        repo.delete_message(msg.id)
+    else:
+        ChatSessionRepository(session=db_session).delete_session(chat.id)
+    assert len(session_window_cache) == 0
+
+def test_window_follows_history_window_start(db_session):
+    """
+    Tests that a cached window matches what the DB path returns once the window slides.
+    """
+    chat = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=1))
+    repo = MessageRepository(session=db_session)
+    service = ChatSessionService(session=db_session)
+    repo.bulk_create_messages(chat.id, [{"role": "user", "content": f"m{i}"} for i in range(100)])
+    service._load_history_window(chat.id)
+
+    for i in range(100, 105):
+        repo.create_message(MessageInCreate(session_id=chat.id, role="user", content=f"m{i}"))
+    total, window, cached = service._load_history_window(chat.id)
+
+    session_window_cache.clear()
+    _, expected, from_db = service._load_history_window(chat.id)
+    assert cached is True and from_db is False
+    assert total == 105
+    assert [m.content for m in window] == [m.content for m in expected]
+    assert window[0].content == "m20"
@@ -0,0 +1,287 @@
+import threading
+import time
+import pytest
+from app.core.admission import AdmissionController, AdmissionRejected
+from app.core.cache.sessionOwnerCache import SessionOwnerCache
+from app.core.cache.sessionWindowCache import CachedMessage, SessionWindowCache
+from app.core.sharedState import (
+    MemoryState, RedisState, SqliteState, bump_cache_version, cache_version, create_state,
+)
+
+class FakeRedis:
+    """The slice of the redis-py client RedisState uses, with expiry."""
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        if key in self.expiry and self.expiry[key] < time.time():
+            self.values.pop(key, None)
+            self.expiry.pop(key, None)
+        return self.values.get(key)
+
+    def get(self, key):
+        with self.lock:
+            return self._live(key)
+
+    def set(self, key, value, ex=None):
+        with self.lock:
+            self.values[key] = str(value)
+            self.expiry.pop(key, None)
+            if ex:
+                self.expiry[key] = time.time() + ex
+
+    def delete(self, key):
+        with self.lock:
+            self.values.pop(key, None)
+            self.expiry.pop(key, None)
+
+    def incrby(self, key, amount):
+        with self.lock:
+            value = int(self._live(key) or 0) + amount
+            self.values[key] = str(value)
+            return value
+
+    def expire(self, key, seconds):
+        with self.lock:
+            self.expiry[key] = time.time() + seconds
+
+    def _zset(self, name):
+        return self._live(name) if isinstance(self._live(name), dict) else self.values.setdefault(name, {})
+
+    def zadd(self, name, mapping, xx=False):
+        with self.lock:
+            zset = self._zset(name)
+            for member, score in mapping.items():
+                if member in zset or not xx:
+                    zset[member] = score
+
+    def zrem(self, name, member):
+        with self.lock:
+            self._zset(name).pop(member, None)
+
+    def zcard(self, name):
+        with self.lock:
+            return len(self._zset(name))
+
+    def zremrangebyscore(self, name, lo, hi):
+        with self.lock:
+            zset = self._zset(name)
+            for member in [m for m, s in zset.items() if float(lo) <= s <= float(hi)]:
+                del zset[member]
+
+    def zcount(self, name, lo, hi):
+        with self.lock:
+            return sum(1 for s in self._zset(name).values() if float(lo) <= s <= float(hi))
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def state(request, tmp_path):
+    if request.param == "memory":
+        return MemoryState()
+    if request.param == "sqlite":
+        return SqliteState(str(tmp_path / "shared.sqlite3"))
+    return RedisState(FakeRedis(), prefix="test:")
+
+def test_get_set_delete_and_incr(state):
+    """
+    Tests the basic operations every backend provides.
+    """
+    assert state.get("a") is None
+    state.set("a", "1")
+    assert state.get("a") == "1"
+    state.delete("a")
+    assert state.get("a") is None
+
+    assert state.incr("n") == 1
+    assert state.incr("n", 4) == 5
+    assert state.incr("n", -2) == 3
+    assert state.get("n") == "3"
+
+def test_keys_expire(state, mocker):
+    """
+    Tests that a TTL ages a key out.
+    """
+    state.set("a", "1", ttl_s=10)
+    state.incr("n", ttl_s=10)
+    now = time.time()
+    mocker.patch("time.time", return_value=now + 11)
+    assert state.get("a") is None
+    assert state.incr("n") == 1
+
+def test_sqlite_state_is_shared_between_connections(tmp_path):
+    """
+    Tests that two SqliteState instances on one file (two workers) see each other's counters.
+    """
+    path = str(tmp_path / "shared.sqlite3")
+    a, b = SqliteState(path), SqliteState(path)
+
+    def bump():
+        for _ in range(50):
+            a.incr("n")
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert b.incr("n", 0) == 200
+
+def test_create_state_picks_backend_from_url(tmp_path):
+    """
+    Tests URL parsing, including that redis:// goes through the client factory.
+    """
+    assert isinstance(create_state("memory://"), MemoryState)
+    assert not create_state("memory://").shared
+    assert isinstance(create_state(f"sqlite:///{tmp_path}/s.sqlite3"), SqliteState)
+    urls = []
+    redis = create_state("redis://cache:6379/0", redis_factory=lambda url: urls.append(url) or FakeRedis())
+    assert isinstance(redis, RedisState) and redis.shared
+    assert urls == ["redis://cache:6379/0"]
+    with pytest.raises(ValueError):
+        create_state("mongodb://nope")
+
+def test_cache_versions(state):
+    """
+    Tests that bumping a cache namespace changes its version.
+    """
+    assert cache_version("rag", state) == 0
+    assert bump_cache_version("rag", state) == 1
+    assert cache_version("rag", state) == 1
+
+def test_admission_caps_hold_across_workers():
+    """
+    Tests that two controllers sharing state enforce one global and per-user cap.
+    """
+    shared = RedisState(FakeRedis())
+    a = AdmissionController(max_in_flight=2, max_per_user=1, max_queue=0, queue_timeout_s=0.1, state=shared)
+    b = AdmissionController(max_in_flight=2, max_per_user=1, max_queue=0, queue_timeout_s=0.1, state=shared)
+
+    lease = a.acquire(user_id=1)
+    with pytest.raises(AdmissionRejected) as exc_info:
+        b.acquire(user_id=1)
+    assert exc_info.value.reason == "per_user"
+
+    other = b.acquire(user_id=2)
+    with pytest.raises(AdmissionRejected) as exc_info:
+        a.acquire(user_id=3)
+    assert exc_info.value.reason == "queue_full"
+    assert a.stats()["cluster_in_flight"] == 2
+
+    lease.release()
+    assert b.acquire(user_id=1).user_id == 1
+    other.release()
+    assert shared.lease_count("admission:user:2") == 0
+
+def test_queued_request_sees_release_in_another_worker():
+    """
+    Tests that a waiter in one worker is admitted when a slot frees up in another.
+    """
+    shared = MemoryState()
+    a = AdmissionController(max_in_flight=1, max_per_user=5, max_queue=5, queue_timeout_s=2, state=shared)
+    b = AdmissionController(max_in_flight=1, max_per_user=5, max_queue=5, queue_timeout_s=2, state=shared)
+    lease = a.acquire(user_id=1)
+    threading.Timer(0.1, lease.release).start()
+
+    started = time.monotonic()
+    assert b.acquire(user_id=2).user_id == 2
+    assert time.monotonic() - started >= 0.05
+
+def test_session_window_invalidation_reaches_other_workers():
+    """
+    Tests that an invalidation in one worker drops the window cached by another.
+    """
+    shared = MemoryState()
+    a = SessionWindowCache(state=shared)
+    b = SessionWindowCache(state=shared)
+    msgs = [CachedMessage(1, "user", "hi", None)]
+    b.put(7, 1, None, msgs)
+    assert b.get(7, 1, None) == msgs
+
+    a.invalidate(7)  # e.g. an edit handled by worker a
+    assert b.get(7, 1, None) is None
+
+def test_window_put_keeps_version_read_before_the_db():
+    """
+    Tests that an invalidation racing with a DB read leaves the stored window stale.
+    """
+    shared = MemoryState()
+    cache = SessionWindowCache(state=shared)
+    version = cache.version(7)
+    SessionWindowCache(state=shared).invalidate(7)  # lands between our read and put
+    cache.put(7, 1, None, [CachedMessage(1, "user", "old", None)], version=version)
+    assert cache.get(7, 1, None) is None
+
+def test_session_delete_reaches_owner_cache_of_other_workers():
+    """
+    Tests that deleting a session in one worker stops another from answering its owner from cache.
+    """
+    shared = MemoryState()
+    a = SessionOwnerCache(state=shared)
+    b = SessionOwnerCache(state=shared)
+    b.set(7, 42)
+    assert b.get(7) == 42
+
+    a.invalidate(7)  # the session is deleted through worker a
+    assert b.get(7) is None
+
+    version = b.version(8)
+    a.invalidate(8)  # lands between b's DB read and its set
+    b.set(8, 42, version=version)
+    assert b.get(8) is None
+
+def test_lease_sets(state, mocker):
+    """
+    Tests that lease sets cap their live members, and that only unrefreshed members expire.
+    """
+    assert state.lease_acquire("l", "a", ttl_s=10, limit=2)
+    assert state.lease_acquire("l", "b", ttl_s=10, limit=2)
+    assert not state.lease_acquire("l", "c", ttl_s=10, limit=2)
+    assert state.lease_count("l") == 2
+
+    state.lease_release("l", "a")
+    assert state.lease_acquire("l", "c", ttl_s=10, limit=2)
+
+    now = time.time()
+    mocker.patch("app.core.sharedState.time.time", return_value=now + 8)
+    state.lease_refresh("l", ["b"], ttl_s=10)
+    mocker.patch("app.core.sharedState.time.time", return_value=now + 12)
+    assert state.lease_count("l") == 1  # c expired, b was refreshed
+    state.lease_refresh("l", ["c"], ttl_s=10)
+    assert state.lease_count("l") == 1  # an expired member isn't revived
+
+def test_crashed_workers_slots_expire_under_traffic(tmp_path):
+    """
+    Tests that slots held by a worker that stopped beating free up while others keep admitting.
+    """
+    shared = SqliteState(str(tmp_path / "shared.sqlite3"))
+    crashed = AdmissionController(max_in_flight=3, max_per_user=5, max_queue=5, queue_timeout_s=0.5, state=shared, lease_ttl_s=1)
+    alive = AdmissionController(max_in_flight=3, max_per_user=5, max_queue=5, queue_timeout_s=0.5, state=shared, lease_ttl_s=1)
+    held = [crashed.acquire(user_id=1), crashed.acquire(user_id=1)]
+    crashed.stop()
+
+    deadline = time.monotonic() + 1.5
+    while time.monotonic() < deadline:
+        alive.acquire(user_id=2).release()
+        time.sleep(0.1)
+
+    assert alive.stats()["cluster_in_flight"] == 0
+    leases = [alive.acquire(user_id=2) for _ in range(3)]
+    assert alive.stats()["cluster_in_flight"] == 3
+    for lease in leases + held:
+        lease.release()
+
+def test_heartbeat_keeps_live_leases(tmp_path):
+    """
+    Tests that a running worker's lease outlives the lease TTL.
+    """
+    shared = SqliteState(str(tmp_path / "shared.sqlite3"))
+    ctl = AdmissionController(max_in_flight=1, max_per_user=1, max_queue=0, queue_timeout_s=0.1, state=shared, lease_ttl_s=0.3)
+    lease = ctl.acquire(user_id=1)
+    time.sleep(0.8)
+    assert ctl.stats()["cluster_in_flight"] == 1
+    with pytest.raises(AdmissionRejected):
+        ctl.acquire(user_id=2)
+    lease.release()
+    ctl.stop()
+    assert ctl.stats()["cluster_in_flight"] == 0
@@ -0,0 +1,122 @@
+import pytest
+from sqlalchemy.orm import Session
+from app.db.repository.chatRepo import ChatSessionRepository, MessageRepository
+from app.db.schema.chat import ChatSessionInCreate, MessageInCreate
+from app.service.titleGenerator import (
+    TitleGenerator,
+    build_title_payload,
+    extractive_title,
+    parse_titles,
+)
+from app.service import titleGenerator
+
+def _untitled_session(db_session, content):
+    chat = ChatSessionRepository(session=db_session).create_session(ChatSessionInCreate(user_id=1))
+    MessageRepository(session=db_session).create_message(
+        MessageInCreate(session_id=chat.id, role="user", content=content), auto_title=False
+    )
+    return chat.id
+
+def _generator(db_session, complete_fn, mode="llm"):
+    return TitleGenerator(
+        mode=mode,
+        batch_size=8,
+        batch_wait_s=60,
+        complete_fn=complete_fn,
+        model_fn=lambda: "test-model",
+        session_factory=lambda: Session(bind=db_session.connection()),
+    )
+
+@pytest.mark.parametrize("text,title", [
+    ("Hi! Can you explain how docker compose networks work? I keep failing.", "Explain how docker compose networks work"),
+    ("please **fix** this:\n```python\nprint(1)\n```", "Fix this"),
+    ("What's the capital of Japan", "What's the capital of Japan"),
+    ("", ""),
+])
+def test_extractive_title(text, title):
+    """
+    Tests that filler, markup and code are dropped and the first sentence is kept short.
+    """
+    assert extractive_title(text) == title
+
+def test_parse_titles_ignores_noise():
+    """
+    Tests parsing of numbered answer lines, thinking blocks and out-of-range numbers.
+    """
+    content = "<think>hmm</think>\n1: \"Docker networking.\"\n2) Pasta recipe\n7: nope\nnot a title"
+    assert parse_titles(content, 2) == {1: "Docker networking", 2: "Pasta recipe"}
+
+def test_one_completion_titles_the_whole_batch(db_session):
+    """
+    Tests that several sessions are titled by a single model call.
+    """
+    first = _untitled_session(db_session, "docker compose network is down")
+    second = _untitled_session(db_session, "best pasta with tomatoes")
+    calls = []
+
+    def complete(payload):
+        calls.append(payload)
+        return {"choices": [{"message": {"content": "1: Docker network outage\n2: Tomato pasta"}}]}
+
+    assert _generator(db_session, complete).generate([first, second]) == 2
+
+    assert len(calls) == 1
+    assert "1. docker compose network is down" in calls[0]["messages"][1]["content"]
+    repo = ChatSessionRepository(session=db_session)
+    assert repo.get_session_by_id(first).name == "Docker network outage"
+    assert repo.get_session_by_id(second).name == "Tomato pasta"
+
+def test_falls_back_to_extractive_titles(db_session):
+    """
+    Tests that model failures and missing lines fall back to extractive titles.
+    """
+    first = _untitled_session(db_session, "Hello, how do I reset my password?")
+    second = _untitled_session(db_session, "Summarize this article for me")
+
+    partial = _generator(db_session, lambda payload: {"choices": [{"message": {"content": "2: Article summary"}}]})
+    assert partial.generate([first, second]) == 2
+    repo = ChatSessionRepository(session=db_session)
+    assert repo.get_session_by_id(first).name == "How do I reset my password"
+    assert repo.get_session_by_id(second).name == "Article summary"
+
+    def down(payload):
+        raise RuntimeError("no backend")
+
+    third = _untitled_session(db_session, "Plan a trip to Lisbon")
+    failing = _generator(db_session, down)
+    assert failing.generate([third]) == 1
+    assert repo.get_session_by_id(third).name == "Plan a trip to Lisbon"
+    assert failing.stats()["extractive_titles_total"] == 1
+
+def test_extractive_mode_never_calls_the_model(db_session):
+    """
+    Tests that extractive mode titles without a completion.
+    """
+    chat_id = _untitled_session(db_session, "Write a haiku about autumn")
+    def fail(payload):
+        raise AssertionError("model called")
+    assert _generator(db_session, fail, mode="extractive").generate([chat_id]) == 1
+
+def test_request_batches_until_flush(db_session, mocker):
+    """
+    Tests that requests are collected and handed over together when flushed.
+    """
+    generator = _generator(db_session, lambda payload: {})
+    generate = mocker.patch.object(generator, "generate")
+    mocker.patch.object(titleGenerator.job_queue, "submit", return_value=False)
+    for session_id in (1, 2, 2, 3):
+        generator.request(session_id)
+    assert generator.stats()["pending"] == 3
+
+    generator.stop()
+    generate.assert_called_once_with([1, 2, 3])
+    assert generator.stats()["pending"] == 0
+
+def test_build_title_payload_disables_thinking():
+    """
+    Tests the completion payload: no thinking, short output, trimmed inputs.
+    """
+    payload = build_title_payload("m", ["x" * 1000])
+    assert payload["chat_template_kwargs"] == {"enable_thinking": False}
+    assert payload["max_tokens"] == 24
+    assert len(payload["messages"][1]["content"]) < 400
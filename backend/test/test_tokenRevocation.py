@@ -0,0 +1,51 @@
+import time
+from app.core.security.tokenRevocation import RevocationList
+from app.core.sharedState import MemoryState
+from app.db.repository.tokenRepo import TokenRepository
+from app.db.models.user import User
+
+def test_revocations_load_once_and_stay_in_memory():
+    """
+    Tests that the table is read on first use only and later revocations are tracked in memory.
+    """
+    loads = []
+    def loader():
+        loads.append(1)
+        return [("old", int(time.time()) + 60)]
+    revoked = RevocationList(loader=loader)
+
+    assert revoked.is_revoked("old")
+    assert not revoked.is_revoked("new")
+    revoked.add("new", int(time.time()) + 60)
+    assert revoked.is_revoked("new")
+    assert len(loads) == 1
+
+def test_revocations_are_shared_between_workers():
+    """
+    Tests that a revocation made in one worker is seen by another through shared state.
+    """
+    state = MemoryState()
+    a = RevocationList(loader=list, state=state)
+    b = RevocationList(loader=list, state=state)
+    b.is_revoked("warm-up")  # b loaded its (empty) set before the revocation
+
+    a.add("jti-1", int(time.time()) + 60)
+    assert b.is_revoked("jti-1")
+
+def test_token_repository_revoke_is_a_one_time_claim(db_session):
+    """
+    Tests that revoking the same jti twice reports the second as a duplicate,
+    and that expired rows are purged.
+    """
+    user = User(username="t", email="t@example.com", password="x")
+    db_session.add(user)
+    db_session.commit()
+    repo = TokenRepository(session=db_session)
+
+    assert repo.revoke("jti-1", user.id, int(time.time()) + 60)
+    assert not repo.revoke("jti-1", user.id, int(time.time()) + 60)
+    assert repo.revoke("jti-2", user.id, int(time.time()) - 60)
+    assert repo.is_revoked("jti-1")
+    assert [jti for jti, _ in repo.active_revocations()] == ["jti-1"]
+    assert repo.purge_expired() == 1
+    assert not repo.is_revoked("jti-2")
@@ -0,0 +1,92 @@
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from app.core.tracing import Tracer, JsonLinesExporter, NOOP_SPAN, build_tracer
+from app.service.chatService import ChatSessionService
+from app.service import chatService
+
+def _read_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_disabled_tracer_returns_noop_span():
+    """
+    Tests that a tracer without exporter hands out the shared no-op span.
+    """
+    tracer = build_tracer("none")
+    assert not tracer.enabled
+    with tracer.span("anything", foo=1) as span:
+        span.set_attribute("bar", 2)
+    assert span is NOOP_SPAN
+
+def test_child_span_shares_trace_and_points_to_parent(tmp_path):
+    """
+    Tests that child spans inherit the trace id and reference the parent span id.
+    """
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(JsonLinesExporter(str(path)))
+    root = tracer.start_span("root", session_id=7)
+    with tracer.span("child", parent=root) as child:
+        child.set_attribute("rows", 3)
+    root.end()
+    root.end()  # idempotent
+
+    spans = {s["name"]: s for s in _read_spans(path)}
+    assert len(spans) == 2
+    assert len(spans["root"]["trace_id"]) == 32
+    assert spans["child"]["trace_id"] == spans["root"]["trace_id"]
+    assert spans["child"]["parent_span_id"] == spans["root"]["span_id"]
+    assert spans["root"]["parent_span_id"] is None
+    assert spans["root"]["attributes"] == {"session_id": 7}
+    assert spans["child"]["attributes"] == {"rows": 3}
+    assert spans["child"]["duration_ms"] >= 0
+
+def test_exception_marks_span_as_error(tmp_path):
+    """
+    Tests that an exception escaping a span is recorded and sets an ERROR status.
+    """
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(JsonLinesExporter(str(path)))
+    with pytest.raises(ValueError):
+        with tracer.span("boom"):
+            raise ValueError("bad")
+    span = _read_spans(path)[0]
+    assert span["status"] == "ERROR"
+    assert span["events"][0]["attributes"] == {"type": "ValueError", "message": "bad"}
+
+def test_stream_emits_turn_and_stage_spans(tmp_path, mocker):
+    """
+    Tests that a streamed chat turn produces a root span with TTFT and child spans per stage.
+    """
+    path = tmp_path / "traces.jsonl"
+    mocker.patch.object(chatService, 'tracer', Tracer(JsonLinesExporter(str(path))))
+
+    def fake_stream_robot(self, payload, mode=0, user_id=None):
+        yield "Hello"
+        yield " world"
+
+    mocker.patch.object(ChatSessionService, '_stream_robot', fake_stream_robot)
+    service = ChatSessionService(session=MagicMock())
+    mocker.patch.object(service._sessions, 'session_exists', return_value=True)
+    mocker.patch.object(service._sessions, 'get_message_counters', return_value=MagicMock(message_count=0, last_message_at=None))
+    mocker.patch.object(service._messages, 'list_messages_by_session', return_value=[SimpleNamespace(role="user", content="hi")])
+    mocker.patch.object(service._messages, 'create_message')
+
+    frames = list(service.stream_user_and_robot_message(session_id=1, user_text="hi", mode=0, user_id=5))
+    assert frames[-1] == "event:done\ndata:ok\n\n"
+
+    spans = {s["name"]: s for s in _read_spans(path)}
+    assert set(spans) == {
+        "chat.turn", "db.save_user_message", "db.load_history", "llm.generate", "db.persist_robot_message",
+    }
+    turn = spans["chat.turn"]
+    assert turn["attributes"]["session_id"] == 1
+    assert turn["attributes"]["user_id"] == 5
+    assert "client_ttft_ms" in turn["attributes"]
+    for name, span in spans.items():
+        if name != "chat.turn":
+            assert span["parent_span_id"] == turn["span_id"]
+            assert span["trace_id"] == turn["trace_id"]
+    assert spans["llm.generate"]["attributes"]["tokens"] == 2
+    assert "upstream_first_byte_ms" in spans["llm.generate"]["attributes"]
@@ -22,6 +22,7 @@ def mock_hash_helper(mocker):
 @pytest.fixture
 def mock_auth_handler(mocker):
     mocker.patch.object(AuthHandler, 'sign_jwt')
+    mocker.patch.object(AuthHandler, 'sign_refresh_token', return_value="mock_refresh_token")
     return AuthHandler
 
 @pytest.fixture
@@ -75,7 +76,7 @@ def test_login_success(user_service, mock_user_repo, mock_hash_helper, mock_auth
     """
     # Set up mock behavior
     mock_user_repo.user_exist_by_email.return_value = True
-    user_output = MagicMock(id=1, email="test@example.com", password="hashed_password")
+    user_output = MagicMock(id=1, username="tester", email="test@example.com", password="hashed_password")
     mock_user_repo.get_user_by_email.return_value = user_output
     mock_hash_helper.verify_password.return_value = True
     mock_auth_handler.sign_jwt.return_value = "mock_jwt_token"
@@ -88,8 +89,9 @@ def test_login_success(user_service, mock_user_repo, mock_hash_helper, mock_auth
     mock_user_repo.user_exist_by_email.assert_called_once()
     mock_user_repo.get_user_by_email.assert_called_once_with(email="test@example.com")
     mock_hash_helper.verify_password.assert_called_once_with(plain_password="password123", hashed_password="hashed_password")
-    mock_auth_handler.sign_jwt.assert_called_once_with(user_id=1)
+    mock_auth_handler.sign_jwt.assert_called_once_with(user_id=1, username="tester", email="test@example.com")
     assert result.token == "mock_jwt_token"
+    assert result.refresh_token == "mock_refresh_token"
 
 def test_login_wrong_credentials(user_service, mock_user_repo, mock_hash_helper):
     """
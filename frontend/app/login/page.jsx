@@ -26,6 +26,7 @@ const Login = () => {
                 } else {
                     setToken(data.token);
                     localStorage.setItem('token', data.token);
+                    localStorage.setItem('refresh_token', data.refresh_token);
                     router.push('/');
                 }
             }
@@ -7,7 +7,7 @@ import { useAppContext } from '@/context/AppContext';
 const PromptBox = ({ isLoading, setIsLoading, selectedChat, setMessages }) => {
     const [prompt, setPrompt] = useState('');
     const [mode, setMode] = useState(0);
-    const { user } = useAppContext();
+    const { user, token, refreshAccessToken } = useAppContext();
 
     const handleSubmit = async (e) => {
         e.preventDefault();
@@ -28,15 +28,20 @@ const PromptBox = ({ isLoading, setIsLoading, selectedChat, setMessages }) => {
 
             // 3. stream messages from backend
             // cannot use axios, Fetch (with res.body.getReader()) is the only browser-native way today to consume a streaming body. - by chatgpt
-            const res = await fetch(`http://127.0.0.1:8000/chat/${selectedChat.id}/messages/stream`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    // If you use JWT:
-                    // ...(user?.token ? { Authorization: `Bearer ${user.token}` } : {}),
-                },
-                body: JSON.stringify({ content: promptCopy, mode: mode }),
-            });
+            const send = (accessToken) =>
+                fetch(`http://127.0.0.1:8000/chat/${selectedChat.id}/messages/stream`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        Authorization: `Bearer ${accessToken}`,
+                    },
+                    body: JSON.stringify({ content: promptCopy, mode: mode }),
+                });
+            let res = await send(token);
+            // fetch bypasses the axios interceptor: refresh the expired access token and retry once
+            if (res.status === 401) {
+                res = await send(await refreshAccessToken());
+            }
             if (!res.ok || !res.body) {
                 throw new Error(`HTTP ${res.status}`);
             }
@@ -8,11 +8,16 @@ import toast from 'react-hot-toast';
 
 const Sidebar = () => {
     const [expand, setExpand] = useState(true);
-    const { user, chats, setSelectedChat, createNewChat, token, setToken } = useAppContext();
+    const { user, chats, setSelectedChat, createNewChat, token, setToken, axios } = useAppContext();
     const [search, setSearch] = useState('');
 
     const handleLogout = () => {
+        const refreshToken = localStorage.getItem('refresh_token');
+        if (refreshToken) {
+            axios.post('/auth/logout', { refresh_token: refreshToken }).catch(() => {});
+        }
         localStorage.removeItem('token');
+        localStorage.removeItem('refresh_token');
         setToken(null);
         toast.success('Logged out successfully');
     };
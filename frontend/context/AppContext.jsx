@@ -7,6 +7,33 @@ axios.defaults.baseURL = 'http://127.0.0.1:8000/';
 
 const AppContext = createContext();
 
+let refreshing = null;
+
+// Swaps the stored refresh token for a new pair and resolves to the new access token.
+// Concurrent callers share one refresh: the old refresh token only works once.
+const refreshTokens = () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) return Promise.reject(new Error('Not logged in'));
+    if (!refreshing) {
+        refreshing = axios
+            .post('/auth/refresh', { refresh_token: refreshToken })
+            .then(({ data }) => {
+                localStorage.setItem('token', data.token);
+                localStorage.setItem('refresh_token', data.refresh_token);
+                return data.token;
+            })
+            .catch((error) => {
+                localStorage.removeItem('token');
+                localStorage.removeItem('refresh_token');
+                throw error;
+            })
+            .finally(() => {
+                refreshing = null;
+            });
+    }
+    return refreshing;
+};
+
 export const AppContextProvider = ({ children }) => {
     const [user, setUser] = useState(null);
     const [chats, setChats] = useState([]);
@@ -14,6 +41,38 @@ export const AppContextProvider = ({ children }) => {
     const [token, setToken] = useState(null);
     const [isLoadingUser, setIsLoadingUser] = useState(true);
 
+    // For requests the axios interceptor doesn't see (e.g. the fetch-based chat stream)
+    const refreshAccessToken = async () => {
+        try {
+            const newToken = await refreshTokens();
+            setToken(newToken);
+            return newToken;
+        } catch (error) {
+            setToken(null);
+            throw error;
+        }
+    };
+
+    useEffect(() => {
+        // Access tokens are short-lived: on a 401, swap the refresh token for a new pair and retry once
+        const interceptor = axios.interceptors.response.use(null, async (error) => {
+            const original = error.config;
+            const refreshToken = localStorage.getItem('refresh_token');
+            if (error.response?.status !== 401 || !refreshToken || original._retried || original.url === '/auth/refresh') {
+                return Promise.reject(error);
+            }
+            original._retried = true;
+            try {
+                const newToken = await refreshAccessToken();
+                original.headers.Authorization = `Bearer ${newToken}`;
+                return axios(original);
+            } catch (refreshError) {
+                return Promise.reject(error);
+            }
+        });
+        return () => axios.interceptors.response.eject(interceptor);
+    }, []);
+
     const fetchUser = async () => {
         try {
             const { data } = await axios.get('/protected', { headers: { Authorization: `Bearer ${token}` } });
@@ -69,6 +128,12 @@ export const AppContextProvider = ({ children }) => {
     }, [user]);
 
     useEffect(() => {
+        // Chat routes act as the logged-in user, so every request carries the token
+        if (token) {
+            axios.defaults.headers.common.Authorization = `Bearer ${token}`;
+        } else {
+            delete axios.defaults.headers.common.Authorization;
+        }
         if (token) {
             fetchUser();
         } else {
@@ -96,6 +161,7 @@ export const AppContextProvider = ({ children }) => {
         createNewChat,
         token,
         setToken,
+        refreshAccessToken,
         isLoadingUser,
         fetchUsersChats,
         axios,